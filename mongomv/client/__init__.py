@@ -1 +1,3 @@
+from .loader import BatchLoader
 from .sync_client import MongoMVClient
+from .transfers import TransferFuture, TransferManager
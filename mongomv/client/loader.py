@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from mongomv.utils import MissingIdsError
+
+
+class BatchLoader:
+    """Coalesces concurrent single-key loads into batched fetches (DataLoader pattern).
+
+    `fetch` gets a list of unique keys and returns found values by key.
+    Threads calling `load` within `window` seconds share one fetch,
+    asyncio tasks awaiting `aload` share one fetch per event loop iteration.
+    A batch is fetched at once when it reaches `max_batch_size` keys.
+    Missing keys raise `MissingIdsError`. Values are not cached between batches.
+    Async loads of a loader must run in a single event loop.
+
+    Example:
+    >>> loader = client.loader("models")
+    >>> with ThreadPoolExecutor(max_workers=32) as pool:
+    ...     models = list(pool.map(loader.load, model_ids))
+    >>> models = await asyncio.gather(*(loader.aload(el) for el in model_ids))
+    >>> loader.batches
+    ... 2
+    """
+
+    def __init__(self,
+                 fetch: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                 window: float = 0.002,
+                 max_batch_size: int = 1000,
+                 key: Callable[[Any], Hashable] = lambda el: el):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.key = key
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Future] = {}
+        self._generation = 0
+        self._async_pending: Dict[Hashable, asyncio.Future] = {}
+        self._async_scheduled = False
+
+
+    def _take(self) -> Dict[Hashable, Future]:
+        """Detach the pending batch, must be called under the lock."""
+        batch, self._pending = self._pending, {}
+        self._generation += 1
+        return batch
+
+
+    def _resolve(self, batch: Dict[Hashable, Any],
+                 found: Optional[Dict[Hashable, Any]] = None,
+                 error: Optional[Exception] = None) -> None:
+        """Set results of futures of a batch, an error of a fetch is raised by every load of the batch."""
+        for key, el in batch.items():
+            if el.done():
+                continue
+            if error is not None:
+                el.set_exception(error)
+            elif key in found:
+                el.set_result(found[key])
+            else:
+                el.set_exception(MissingIdsError([key]))
+
+
+    def _fetch(self, batch: Dict[Hashable, Future]) -> None:
+        self.batches += 1
+        try:
+            found = self.fetch(list(batch))
+        except Exception as exc:
+            self._resolve(batch, error=exc)
+            return
+        self._resolve(batch, found)
+
+
+    def load(self, key: Any) -> Any:
+        """Load a value, the first caller of a batch waits `window` seconds for others and fetches it."""
+        key = self.key(key)
+        with self._lock:
+            leader = not self._pending
+            generation = self._generation
+            future = self._pending.setdefault(key, Future())
+            batch = self._take() if len(self._pending) >= self.max_batch_size else None
+        if batch is None and leader:
+            time.sleep(self.window)
+            with self._lock:
+                if self._generation == generation:
+                    batch = self._take()
+        if batch:
+            self._fetch(batch)
+        return future.result()
+
+
+    def load_many(self, keys: List[Any]) -> List[Any]:
+        """Load values in order with as few fetches as possible, joining batches of other callers."""
+        keys = [self.key(el) for el in keys]
+        with self._lock:
+            batches = [self._take()] if self._pending else []
+            futures = [self._pending.setdefault(el, Future()) for el in keys]
+            batches.append(self._take())
+        for batch in batches:
+            items = list(batch.items())
+            for start in range(0, len(items), self.max_batch_size):
+                self._fetch(dict(items[start:start + self.max_batch_size]))
+        return [el.result() for el in futures]
+
+
+    def _dispatch_async(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._async_scheduled = False
+        batch, self._async_pending = self._async_pending, {}
+        if batch:
+            loop.create_task(self._resolve_async(batch))
+
+
+    async def _resolve_async(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            found = await asyncio.to_thread(self.fetch, list(batch))
+        except Exception as exc:
+            self._resolve(batch, error=exc)
+            return
+        self._resolve(batch, found)
+
+
+    async def aload(self, key: Any) -> Any:
+        """Load a value, loads awaited in the same event loop iteration share one fetch in a worker thread."""
+        key = self.key(key)
+        loop = asyncio.get_running_loop()
+        future = self._async_pending.get(key)
+        if future is None:
+            future = self._async_pending[key] = loop.create_future()
+        if len(self._async_pending) >= self.max_batch_size:
+            self._dispatch_async(loop)
+        elif not self._async_scheduled:
+            self._async_scheduled = True
+            loop.call_soon(self._dispatch_async, loop)
+        return await asyncio.shield(future)
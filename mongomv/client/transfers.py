@@ -0,0 +1,180 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Optional, Set
+
+from mongomv.schemas import ModelEntity
+from mongomv.utils import TransferCancelled, observe_transfer
+
+Progress = Callable[[int, Optional[int]], None]
+
+
+class _TokenBucket:
+    """Bandwidth limit shared by all workers, transfers sleep off their debt."""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def consume(self, size: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate) - size
+            self.updated = now
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class TransferFuture(Future):
+    """Future of a background transfer.
+
+    `cancel` cancels a queued transfer; a running one is interrupted
+    at the next block and finishes with `TransferCancelled`.
+    An interrupted GridFS upload is resumed by the next `dump_model`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cancel_requested = threading.Event()
+
+
+    def cancel(self) -> bool:
+        if super().cancel():
+            return True
+        if not self.done():
+            self.cancel_requested.set()
+        return False
+
+
+class TransferManager:
+    """Runs `dump_model`/`load_model` jobs in a bounded thread pool.
+
+    At most `max_workers` transfers run concurrently, at most `max_queue`
+    wait for a worker (`submit` blocks when the queue is full).
+    `bandwidth_limit` (bytes per second) is shared by all transfers.
+    Pending transfers are flushed when the interpreter exits.
+
+    Example:
+    >>> future = client.transfers.dump_model(md, "/tmp/ckpt_10.pt", "ckpt_10.pt", progress=print)
+    >>> train_next_epoch()
+    >>> future.result()
+    ... "Model successfully serialized"
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, bandwidth_limit: Optional[int] = None):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._bucket = _TokenBucket(bandwidth_limit) if bandwidth_limit else None
+        self._futures: Set[TransferFuture] = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mongomv-transfer")
+                atexit.register(self.shutdown)
+            return self._executor
+
+
+    def _run(self, future: TransferFuture, func: Callable, total: Optional[int], progress: Optional[Progress]) -> None:
+        transferred = 0
+
+        def observer(size: int) -> None:
+            nonlocal transferred
+            if future.cancel_requested.is_set():
+                raise TransferCancelled("Transfer was cancelled")
+            if self._bucket is not None:
+                self._bucket.consume(size)
+            transferred += size
+            if progress is not None:
+                progress(transferred, total)
+
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                with observe_transfer(observer):
+                    result = func()
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+        finally:
+            with self._lock:
+                self._futures.discard(future)
+            self._slots.release()
+
+
+    def submit(self,
+               func: Callable[[], Any],
+               total: Optional[int] = None,
+               progress: Optional[Progress] = None) -> TransferFuture:
+        """Run `func` in the pool, `progress(transferred, total)` is called from the worker thread."""
+        executor = self._get_executor()
+        self._slots.acquire()
+        future = TransferFuture()
+        with self._lock:
+            self._futures.add(future)
+        try:
+            executor.submit(self._run, future, func, total, progress)
+        except BaseException:
+            with self._lock:
+                self._futures.discard(future)
+            self._slots.release()
+            raise
+        return future
+
+
+    def dump_model(self,
+                   model: ModelEntity,
+                   model_path: Path | str,
+                   filename: str,
+                   progress: Optional[Progress] = None,
+                   **kwargs) -> TransferFuture:
+        """Upload in background, look `ModelEntity.dump_model`."""
+        path = Path(model_path)
+        if path.is_dir():
+            total = sum(el.stat().st_size for el in path.rglob("*") if el.is_file())
+        else:
+            total = path.stat().st_size
+        return self.submit(lambda: model.dump_model(model_path=path, filename=filename, **kwargs), total, progress)
+
+
+    def load_model(self,
+                   model: ModelEntity,
+                   model_path: Optional[Path | str] = None,
+                   progress: Optional[Progress] = None,
+                   **kwargs) -> TransferFuture:
+        """Download in background, look `ModelEntity.load_model`."""
+        total = model.serialized_model.length if model.serialized_model is not None else None
+        return self.submit(lambda: model.load_model(model_path=model_path, **kwargs), total, progress)
+
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """Wait for all submitted transfers, return `True` if all of them are done."""
+        with self._lock:
+            futures = set(self._futures)
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+
+    def shutdown(self, wait: bool = True, cancel: bool = False) -> None:
+        """Stop the pool. By default waits for queued and running transfers."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futures = set(self._futures)
+        if executor is None:
+            return
+        atexit.unregister(self.shutdown)
+        if cancel:
+            for future in futures:
+                future.cancel()
+        executor.shutdown(wait=wait)
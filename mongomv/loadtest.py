@@ -0,0 +1,416 @@
+"""Multi-process load generator of registry workloads.
+
+Spawns populations of processes, every process calls the public
+`MongoMVClient` API with its own client (and connection pool), e.g.
+64 trainers logging metrics and dumping checkpoints while 200 readers
+resolve and load models. A scenario is a JSON file:
+
+    {
+        "duration": 60,
+        "interval": 5,
+        "seed_models": 20,
+        "artifact_size": 1048576,
+        "populations": [
+            {"name": "trainers", "processes": 64, "rate": 2,
+             "mix": {"log_metric": 9, "dump_checkpoint": 1}},
+            {"name": "readers", "processes": 200, "rate": 5,
+             "mix": {"get_model": 8, "load_bytes": 2}}
+        ]
+    }
+
+`rate` is operations per second of every process (0 - as fast as possible),
+`mix` maps operations (look `OPERATIONS`) to weights, `client` might
+hold `MongoMVClient` keyword arguments of a population.
+Readers use `seed_models` models with `artifact_size` bytes artifacts,
+created before the run. Operations are scheduled at a fixed rate and latency
+is measured from the scheduled start, so a stalled server shows up
+as latency instead of a lower request rate.
+Throughput, latency percentiles and error rates of every operation
+and server operation counters (`serverStatus`) are printed every `interval`
+seconds and summarized at the end. Models created by the run are deleted.
+
+Run with `python -m mongomv.loadtest scenario.json --uri mongodb://...`
+or `mongomv loadtest scenario.json`.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from mongomv.client import MongoMVClient
+from mongomv.schemas import ModelEntity, ModelMetrics, Q
+
+SERVER_COUNTERS = ["insert", "query", "update", "delete", "getmore", "command"]
+
+
+class Worker:
+    """State of a load process: its client, random generator and models."""
+
+    def __init__(self,
+                 client: MongoMVClient,
+                 name: str,
+                 seed_names: List[str],
+                 artifact: Optional[Path],
+                 rng: random.Random):
+        self.client = client
+        self.name = name
+        self.seed_names = seed_names
+        self.artifact = artifact
+        self.rng = rng
+        self._model: Optional[ModelEntity] = None
+
+
+    @property
+    def model(self) -> ModelEntity:
+        """Own model of the process, created by the first write."""
+        if self._model is None:
+            self._model = self.client.create_model(name=self.name, tags=["loadtest"])
+        return self._model
+
+
+    def seed_name(self) -> str:
+        if not self.seed_names:
+            raise ValueError("Scenario has no seed models, set `seed_models`")
+        return self.rng.choice(self.seed_names)
+
+
+def _dump_checkpoint(worker: Worker) -> None:
+    if worker.artifact is None:
+        raise ValueError("Scenario has no artifacts, set `artifact_size`")
+    md = worker.client.create_model(name=worker.name, tags=["loadtest", "checkpoint"])
+    md.dump_model(model_path=worker.artifact, filename="checkpoint.bin")
+
+
+OPERATIONS: Dict[str, Callable[[Worker], Any]] = {
+    "create_model": lambda worker: worker.client.create_model(name=worker.name, tags=["loadtest"]),
+    "log_metric": lambda worker: worker.model.add_metric(ModelMetrics(metric="loss", value=worker.rng.random())),
+    "add_tag": lambda worker: worker.model.add_tag([f"tag_{worker.rng.randrange(100)}"]),
+    "dump_checkpoint": _dump_checkpoint,
+    "get_model": lambda worker: worker.client.get_model(name=worker.seed_name()),
+    "load_bytes": lambda worker: worker.client.get_model(name=worker.seed_name()).load_bytes(),
+    "find_models": lambda worker: worker.client.find_models((Q.name == worker.seed_name()).limit(10)),
+    "list_of_models": lambda worker: worker.client.list_of_models(num=10),
+}
+
+
+def load_scenario(scenario: Path | str | Dict) -> Dict:
+    """Read a scenario file (or validate a dict), fill defaults. Raise `ValueError` if it is invalid."""
+    if not isinstance(scenario, dict):
+        scenario = json.loads(Path(scenario).read_text())
+    scenario = {"duration": 60, "interval": 5, "seed_models": 10, "artifact_size": 1024 * 1024, **scenario}
+    if scenario["duration"] <= 0 or scenario["interval"] <= 0:
+        raise ValueError("`duration` and `interval` must be positive")
+    if not scenario.get("populations"):
+        raise ValueError("Scenario must have `populations`")
+    names = set()
+    for el in scenario["populations"]:
+        if not el.get("name") or el["name"] in names:
+            raise ValueError(f"Every population must have a unique `name`, got {el.get('name')!r}")
+        names.add(el["name"])
+        el.setdefault("processes", 1)
+        el.setdefault("rate", 0)
+        el.setdefault("client", {})
+        if el["processes"] < 1 or el["rate"] < 0:
+            raise ValueError(f"Population {el['name']} must have positive `processes` and non-negative `rate`")
+        if not el.get("mix") or any(weight < 0 for weight in el["mix"].values()):
+            raise ValueError(f"Population {el['name']} must have `mix` with non-negative weights")
+        unknown = set(el["mix"]) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operations {sorted(unknown)}, available: {sorted(OPERATIONS)}")
+    return scenario
+
+
+def _run_worker(uri: str,
+                scenario: Dict,
+                population: Dict,
+                index: int,
+                prefix: str,
+                seed_names: List[str],
+                messages,
+                start,
+                start_at) -> None:
+    """Body of a load process, sends `ready`, `stats` of every interval and `done` to `messages`."""
+    name = population["name"]
+    artifact = None
+    try:
+        client = MongoMVClient(uri=uri, **population["client"])
+        if scenario["artifact_size"] and "dump_checkpoint" in population["mix"]:
+            fd, artifact = tempfile.mkstemp(prefix="mongomv-loadtest-")
+            os.write(fd, os.urandom(scenario["artifact_size"]))
+            os.close(fd)
+            artifact = Path(artifact)
+        rng = random.Random(f"{prefix}{name}{index}")
+        worker = Worker(client, f"{prefix}{name}_{index}", seed_names, artifact, rng)
+    except Exception as exc:
+        messages.put(("failed", name, index, f"{type(exc).__name__}: {exc}"))
+        return
+    messages.put(("ready", name, index, None))
+    start.wait()
+
+    began = start_at.value
+    deadline = began + scenario["duration"]
+    operations, weights = list(population["mix"]), list(population["mix"].values())
+    period = 1 / population["rate"] if population["rate"] else 0.0
+    stats: Dict[str, Dict] = {}
+    current = 0
+
+    def flush():
+        if stats:
+            messages.put(("stats", name, current, dict(stats)))
+            stats.clear()
+
+    scheduled = began + rng.random() * period
+    try:
+        while scheduled < deadline:
+            now = time.time()
+            if now < scheduled:
+                time.sleep(scheduled - now)
+            started = scheduled if period else time.time()
+            interval = int((started - began) // scenario["interval"])
+            if interval != current:
+                flush()
+                current = interval
+            operation = rng.choices(operations, weights)[0]
+            error = None
+            try:
+                OPERATIONS[operation](worker)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            latency = time.time() - started
+            el = stats.setdefault(operation, {"latencies": [], "errors": 0, "error": None})
+            el["latencies"].append(latency)
+            if error is not None:
+                el["errors"] += 1
+                el["error"] = error
+            scheduled = scheduled + period if period else time.time()
+        flush()
+    finally:
+        if artifact is not None:
+            artifact.unlink(missing_ok=True)
+        messages.put(("done", name, index, None))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+def _summary(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "error_rate": errors / len(latencies) if latencies else 0.0,
+        "throughput": len(latencies) / seconds,
+        "p50": _percentile(latencies, 50),
+        "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+class _ServerCounters:
+    """Deltas of `serverStatus` operation counters, `None` if the user may not run it."""
+
+    def __init__(self, uri: str):
+        self.client = MongoClient(uri)
+        self.previous = self._read()
+
+
+    def _read(self) -> Optional[Dict[str, int]]:
+        try:
+            status = self.client.admin.command("serverStatus")
+        except PyMongoError:
+            return None
+        counters = {el: status["opcounters"].get(el, 0) for el in SERVER_COUNTERS}
+        counters["connections"] = status.get("connections", {}).get("current", 0)
+        return counters
+
+
+    def sample(self) -> Optional[Dict[str, int]]:
+        current = self._read()
+        if current is None or self.previous is None:
+            self.previous = current
+            return None
+        delta = {el: current[el] - self.previous[el] for el in SERVER_COUNTERS}
+        delta["connections"] = current["connections"]
+        self.previous = current
+        return delta
+
+
+def _print_interval(out: TextIO, index: int, report: Dict, interval: float) -> None:
+    print(f"[{index * interval:>5.0f}s]", file=out)
+    for key, el in sorted(report["operations"].items()):
+        print(
+            f"    {key:<32} {el['throughput']:>9.1f} ops/s  p50 {el['p50'] * 1000:>8.1f} ms"
+            f"  p99 {el['p99'] * 1000:>8.1f} ms  errors {el['error_rate']:>6.1%}",
+            file=out
+        )
+    if report["server"] is not None:
+        counters = "  ".join(f"{el} {report['server'][el] / interval:.0f}/s" for el in SERVER_COUNTERS)
+        print(f"    {'server':<32} {counters}  connections {report['server']['connections']}", file=out)
+
+
+def run_scenario(scenario: Path | str | Dict,
+                 uri: str,
+                 output: Optional[Path | str] = None,
+                 keep: bool = False,
+                 out: TextIO = sys.stderr) -> Dict[str, Any]:
+    """Run a load scenario (look the module docstring), return its report.
+
+    Report has `intervals` (operations and server counters of every interval)
+    and `summary` of every `<population>.<operation>` over the whole run,
+    latencies are in seconds. It is also written to `output` as JSON if it is set.
+    Models of the run (names start with the `prefix` of the report) are deleted unless `keep` is `True`.
+    """
+    scenario = load_scenario(scenario)
+    prefix = f"loadtest_{uuid.uuid4().hex[:8]}_"
+    client = MongoMVClient(uri=uri)
+    processes: List[multiprocessing.Process] = []
+    try:
+        seed_names = []
+        if scenario["seed_models"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                artifact = Path(tmp, "seed.bin")
+                artifact.write_bytes(os.urandom(scenario["artifact_size"]))
+                for i in range(scenario["seed_models"]):
+                    md = client.create_model(name=f"{prefix}seed_{i}", tags=["loadtest"])
+                    if scenario["artifact_size"]:
+                        md.dump_model(model_path=artifact, filename="seed.bin")
+                    seed_names.append(md.name)
+
+        context = multiprocessing.get_context("spawn")
+        messages, start, start_at = context.Queue(), context.Event(), context.Value("d", 0.0)
+        for population in scenario["populations"]:
+            for index in range(population["processes"]):
+                process = context.Process(
+                    target=_run_worker,
+                    args=(uri, scenario, population, index, prefix, seed_names, messages, start, start_at),
+                    daemon=True
+                )
+                process.start()
+                processes.append(process)
+
+        failed = []
+        for _ in processes:
+            kind, name, index, error = messages.get(timeout=120)
+            if kind == "failed":
+                failed.append(f"{name}[{index}]: {error}")
+        if failed:
+            raise RuntimeError(f"{len(failed)} load processes failed to start: {failed[0]}")
+        print(f"mongomv loadtest: {len(processes)} processes, {scenario['duration']}s", file=out)
+
+        counters = _ServerCounters(uri)
+        interval = scenario["interval"]
+        intervals: Dict[int, Dict] = {}
+        server: Dict[int, Optional[Dict]] = {}
+        start_at.value = time.time() + 0.5
+        start.set()
+
+        done, printed, tick = 0, 0, 1
+        give_up = start_at.value + scenario["duration"] + max(60, 2 * interval)
+        while done < len(processes) and time.time() < give_up:
+            try:
+                kind, name, index, data = messages.get(timeout=0.2)
+            except queue.Empty:
+                kind = None
+            if kind == "done":
+                done += 1
+            elif kind == "stats":
+                bucket = intervals.setdefault(index, {})
+                for operation, el in data.items():
+                    merged = bucket.setdefault(f"{name}.{operation}", {"latencies": [], "errors": 0, "error": None})
+                    merged["latencies"].extend(el["latencies"])
+                    merged["errors"] += el["errors"]
+                    merged["error"] = el["error"] or merged["error"]
+            while time.time() >= start_at.value + tick * interval:
+                server[tick - 1] = counters.sample()
+                tick += 1
+            while printed < tick - 2:
+                _print_interval(out, printed, _interval_report(intervals, server, printed, interval), interval)
+                printed += 1
+
+        last = max([*intervals, *server, -1])
+        report_intervals = [_interval_report(intervals, server, i, interval) for i in range(last + 1)]
+        for i in range(printed, last + 1):
+            _print_interval(out, i, report_intervals[i], interval)
+        report = {
+            "prefix": prefix,
+            "scenario": scenario,
+            "intervals": report_intervals,
+            "summary": _total_summary(intervals, scenario["duration"]),
+        }
+        print("summary", file=out)
+        for key, el in sorted(report["summary"].items()):
+            print(
+                f"    {key:<32} {el['count']:>8} ops {el['throughput']:>9.1f} ops/s"
+                f"  p50 {el['p50'] * 1000:.1f} ms  p90 {el['p90'] * 1000:.1f} ms  p99 {el['p99'] * 1000:.1f} ms"
+                f"  max {el['max'] * 1000:.1f} ms  errors {el['errors']}",
+                file=out
+            )
+            if el["error"]:
+                print(f"        last error: {el['error']}", file=out)
+        if output is not None:
+            Path(output).write_text(json.dumps(report, indent=2))
+        return report
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if not keep:
+            client.delete_models({"name": {"$regex": f"^{prefix}"}})
+
+
+def _interval_report(intervals: Dict[int, Dict], server: Dict[int, Optional[Dict]], index: int, seconds: float):
+    return {
+        "start": index * seconds,
+        "operations": {
+            key: _summary(el["latencies"], el["errors"], seconds) for key, el in intervals.get(index, {}).items()
+        },
+        "server": server.get(index),
+    }
+
+
+def _total_summary(intervals: Dict[int, Dict], seconds: float) -> Dict[str, Dict]:
+    merged: Dict[str, Dict] = {}
+    for bucket in intervals.values():
+        for key, el in bucket.items():
+            total = merged.setdefault(key, {"latencies": [], "errors": 0, "error": None})
+            total["latencies"].extend(el["latencies"])
+            total["errors"] += el["errors"]
+            total["error"] = el["error"] or total["error"]
+    return {
+        key: {**_summary(el["latencies"], el["errors"], seconds), "error": el["error"]} for key, el in merged.items()
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="mongomv-loadtest", description="Run a multi-process registry workload.")
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("--uri", default=os.environ.get("MONGOMV_URI"), help="MongoDB URI, default is $MONGOMV_URI")
+    parser.add_argument("-o", "--output", help="write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="do not delete models of the run")
+    args = parser.parse_args(argv)
+    if not args.uri:
+        parser.error("`--uri` or MONGOMV_URI is required")
+    report = run_scenario(args.scenario, args.uri, output=args.output, keep=args.keep)
+    return 1 if any(el["errors"] for el in report["summary"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
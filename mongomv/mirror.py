@@ -0,0 +1,302 @@
+"""Incremental mirroring of a registry to a second cluster.
+
+A read-only copy of the registry (e.g. on an edge cluster) is kept
+up to date by copying only what changed since the last run:
+
+    - experiments and models with `updated_at` after the watermark
+      are upserted with batched `bulk_write`s;
+    - serialized models referenced by copied models are copied before
+      the models, if the target has no complete copy of them: GridFS
+      chunks, deduplicated chunks and cold frames are copied by
+      parallel workers, a GridFS files document is written last;
+    - tombstones of deleted documents and artifacts are applied
+      if the key is still absent in the source.
+
+Every run starts `overlap` before the watermark (clocks of clients
+and servers differ, writes might be in flight), repeated upserts
+are harmless. The watermark is stored in the target (`mongomv.mirror_state`),
+so a restarted mirror continues where it stopped; a mirror, which
+has not run for longer than tombstones live (look `TombstonesRepository`),
+should be synchronized from scratch with `reset`.
+Artifacts of other stores (e.g. `FileSystemStore`) are not copied.
+
+Run with `python -m mongomv.mirror --source mongodb://... --target mongodb://... --interval 60`
+or `mongomv mirror mongodb://target...`.
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import MongoClient, ReplaceOne
+from pymongo.collection import Collection
+
+from mongomv.repository import UnitOfWork
+from mongomv.repository.repo import (
+    ColdRepository,
+    DedupRepository,
+    ExperimentsRepository,
+    GridFSRepository,
+    ModelsRepository,
+    TombstonesRepository,
+)
+
+DOCUMENTS = {
+    "experiments": (ExperimentsRepository.database_name, ExperimentsRepository.collection),
+    "models": (ModelsRepository.database_name, ModelsRepository.collection),
+}
+GRIDFS_FILES = (GridFSRepository.database, f"{GridFSRepository.collection}.files")
+GRIDFS_CHUNKS = (GridFSRepository.database, f"{GridFSRepository.collection}.chunks")
+DEDUP_CHUNKS = (DedupRepository.database, DedupRepository.collection)
+COLD_FRAMES = (ColdRepository.database, ColdRepository.collection)
+TOMBSTONES = (TombstonesRepository.database_name, TombstonesRepository.collection)
+STATE = (ModelsRepository.database_name, "mirror_state")
+
+
+class RegistryMirror:
+    """Copies changes of the `source` registry to the `target` one.
+
+    Example:
+    >>> mirror = RegistryMirror("mongodb://prod:27017", "mongodb://edge:27017")
+    >>> mirror.sync()
+    ... {'tombstones': 2, 'deleted': 2, 'experiments': 1, 'models': 14, 'artifacts': 3, 'artifact_bytes': 52428800}
+    """
+
+    def __init__(self,
+                 source_uri: str,
+                 target_uri: str,
+                 name: str = "default",
+                 batch_size: int = 500,
+                 workers: int = 4,
+                 chunks_per_task: int = 16,
+                 overlap: timedelta = timedelta(minutes=1),
+                 **kwargs):
+        self.source = MongoClient(source_uri, **kwargs)
+        self.target = MongoClient(target_uri, **kwargs)
+        self.name = name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.chunks_per_task = chunks_per_task
+        self.overlap = overlap
+        self._indexes_ensured = False
+        self._stopped = threading.Event()
+
+
+    def _source(self, namespace: Tuple[str, str]) -> Collection:
+        return self.source.get_database(namespace[0]).get_collection(namespace[1])
+
+
+    def _target(self, namespace: Tuple[str, str]) -> Collection:
+        return self.target.get_database(namespace[0]).get_collection(namespace[1])
+
+
+    @property
+    def _state(self) -> Collection:
+        return self._target(STATE)
+
+
+    def watermark(self) -> Optional[datetime]:
+        state = self._state.find_one({"_id": self.name}) or {}
+        return state.get("watermark")
+
+
+    def reset(self) -> None:
+        """Forget the watermark, the next run copies the whole registry."""
+        self._state.delete_one({"_id": self.name})
+
+
+    def _ensure_indexes(self) -> None:
+        """Create registry indexes in the target, so it serves reads like the source."""
+        if self._indexes_ensured:
+            return
+        uow = UnitOfWork(self.target)
+        with uow:
+            uow.experiments.ensure_indexes()
+            uow.models.ensure_indexes()
+            uow.cold.ensure_indexes()
+            uow.gridfs.ensure_indexes()
+        self._indexes_ensured = True
+
+
+    def _apply_tombstones(self, since: datetime, report: Dict[str, int]) -> None:
+        """Delete keys from the target, which are deleted from the source."""
+        exists: Dict[str, Tuple[Collection, str]] = {
+            "gridfs": (self._source(GRIDFS_FILES), "_id"),
+            "dedup": (self._source(DEDUP_CHUNKS), "_id"),
+            "cold": (self._source(COLD_FRAMES), "artifact"),
+            **{key: (self._source(value), "_id") for key, value in DOCUMENTS.items()}
+        }
+        cursor = self._source(TOMBSTONES).find(
+            {"deleted_at": {"$gte": since}},
+            projection={"collection": 1, "key": 1}
+        )
+        while batch := list(islice(cursor, self.batch_size)):
+            report["tombstones"] += len(batch)
+            keys: Dict[str, List[Any]] = {}
+            for el in batch:
+                if el["collection"] in exists:
+                    keys.setdefault(el["collection"], []).append(el["key"])
+            for collection, deleted in keys.items():
+                source, field = exists[collection]
+                alive = set(source.distinct(field, {field: {"$in": deleted}}))
+                deleted = [el for el in dict.fromkeys(deleted) if el not in alive]
+                if deleted:
+                    report["deleted"] += self._delete(collection, deleted)
+
+
+    def _delete(self, collection: str, keys: List[Any]) -> int:
+        if collection in DOCUMENTS:
+            return self._target(DOCUMENTS[collection]).delete_many({"_id": {"$in": keys}}).deleted_count
+        if collection == "gridfs":
+            self._target(GRIDFS_CHUNKS).delete_many({"files_id": {"$in": keys}})
+            return self._target(GRIDFS_FILES).delete_many({"_id": {"$in": keys}}).deleted_count
+        if collection == "dedup":
+            return self._target(DEDUP_CHUNKS).delete_many({"_id": {"$in": keys}}).deleted_count
+        self._target(COLD_FRAMES).delete_many({"artifact": {"$in": keys}})
+        return len(keys)
+
+
+    @staticmethod
+    def _upsert(target: Collection, docs: List[Dict]) -> None:
+        if docs:
+            target.bulk_write([ReplaceOne({"_id": el["_id"]}, el, upsert=True) for el in docs], ordered=False)
+
+
+    def _copy(self, source: Collection, target: Collection, query: Dict) -> int:
+        """Upsert documents matching `query` by `_id`, return number of copied data bytes."""
+        docs = list(source.find(query))
+        self._upsert(target, docs)
+        return sum(len(el.get("data", b"")) for el in docs)
+
+
+    def _artifact_tasks(self, artifacts: List[Dict]) -> Tuple[List[Callable[[], int]], List[Dict], int]:
+        """Return copy tasks of artifacts missing in the target, GridFS files documents
+        to write after the tasks, and number of artifacts to copy."""
+        tasks: List[Callable[[], int]] = []
+        by_store: Dict[str, List[Dict]] = {}
+        for el in artifacts:
+            by_store.setdefault(el.get("storage", "gridfs"), []).append(el)
+
+        source_chunks, target_chunks = self._source(GRIDFS_CHUNKS), self._target(GRIDFS_CHUNKS)
+        obj_ids = [el["_id"] for el in by_store.get("gridfs", [])]
+        copied = set(self._target(GRIDFS_FILES).distinct("_id", {"_id": {"$in": obj_ids}}))
+        files = list(self._source(GRIDFS_FILES).find({"_id": {"$in": [el for el in obj_ids if el not in copied]}}))
+        for file in files:
+            count = math.ceil(file["length"] / file["chunkSize"]) if file["length"] else 0
+            for start in range(0, count, self.chunks_per_task):
+                query = {"files_id": file["_id"], "n": {"$gte": start, "$lt": start + self.chunks_per_task}}
+                tasks.append(lambda query=query: self._copy(source_chunks, target_chunks, query))
+
+        source_dedup, target_dedup = self._source(DEDUP_CHUNKS), self._target(DEDUP_CHUNKS)
+        dedup = by_store.get("dedup", [])
+        hashes = list(dict.fromkeys(chunk["hash"] for el in dedup for chunk in el.get("chunks") or []))
+        present = set()
+        for start in range(0, len(hashes), self.batch_size):
+            present |= set(target_dedup.distinct("_id", {"_id": {"$in": hashes[start:start + self.batch_size]}}))
+        missing = [el for el in hashes if el not in present]
+        for start in range(0, len(missing), self.chunks_per_task):
+            query = {"_id": {"$in": missing[start:start + self.chunks_per_task]}}
+            tasks.append(lambda query=query: self._copy(source_dedup, target_dedup, query))
+        missing = set(missing)
+        dedup_copied = sum(1 for el in dedup if any(chunk["hash"] in missing for chunk in el.get("chunks") or []))
+
+        source_frames, target_frames = self._source(COLD_FRAMES), self._target(COLD_FRAMES)
+        cold = by_store.get("cold", [])
+        frames = {
+            el["_id"]: el["count"] for el in target_frames.aggregate([
+                {"$match": {"artifact": {"$in": [el["_id"] for el in cold]}}},
+                {"$group": {"_id": "$artifact", "count": {"$sum": 1}}},
+            ])
+        }
+        cold = [el for el in cold if frames.get(el["_id"], 0) != math.ceil(el["length"] / el["frame_size"])]
+        for el in cold:
+            tasks.append(lambda artifact=el["_id"]: self._copy(source_frames, target_frames, {"artifact": artifact}))
+        return tasks, files, len(files) + dedup_copied + len(cold)
+
+
+    def _copy_models(self, batch: List[Dict], executor: ThreadPoolExecutor, report: Dict[str, int]) -> None:
+        artifacts = [el["serialized_model"] for el in batch if el.get("serialized_model")]
+        tasks, files, count = self._artifact_tasks(artifacts)
+        report["artifact_bytes"] += sum(el.result() for el in [executor.submit(task) for task in tasks])
+        self._upsert(self._target(GRIDFS_FILES), files)
+        report["artifacts"] += count
+
+
+    def sync(self) -> Dict[str, int]:
+        """Copy changes since the watermark once, return numbers of copied and deleted items."""
+        self._ensure_indexes()
+        started = datetime.now(timezone.utc)
+        watermark = self.watermark()
+        since = watermark - self.overlap if watermark is not None else None
+        report = dict.fromkeys(["tombstones", "deleted", *DOCUMENTS, "artifacts", "artifact_bytes"], 0)
+        if since is not None:
+            self._apply_tombstones(since, report)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for name, namespace in DOCUMENTS.items():
+                query = {"updated_at": {"$gte": since}} if since is not None else {}
+                cursor = self._source(namespace).find(query, batch_size=self.batch_size)
+                target = self._target(namespace)
+                while batch := list(islice(cursor, self.batch_size)):
+                    if name == "models":
+                        # artifacts first, so the target never references a missing artifact
+                        self._copy_models(batch, executor, report)
+                    self._upsert(target, batch)
+                    report[name] += len(batch)
+
+        self._state.replace_one(
+            {"_id": self.name},
+            {"_id": self.name, "watermark": started, "report": report},
+            upsert=True
+        )
+        return report
+
+
+    def run_forever(self, interval: float = 60.0, out=sys.stderr) -> None:
+        """Sync every `interval` seconds until `stop`, errors of a run are printed and the run is retried."""
+        while not self._stopped.is_set():
+            try:
+                report = self.sync()
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} mirrored {report}", file=out, flush=True)
+            except Exception as exc:
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} mirror failed: {exc!r}", file=out, flush=True)
+            self._stopped.wait(interval)
+
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="mongomv-mirror", description="Mirror a registry to a second cluster.")
+    parser.add_argument("--source", default=os.environ.get("MONGOMV_URI"), help="default is $MONGOMV_URI")
+    parser.add_argument("--target", required=True, help="MongoDB URI of the mirror")
+    parser.add_argument("--name", default="default", help="name of the watermark, one per source")
+    parser.add_argument("--interval", type=float, help="sync every INTERVAL seconds, default is once")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("-w", "--workers", type=int, default=4, help="parallel artifact copies")
+    parser.add_argument("--reset", action="store_true", help="copy the whole registry")
+    args = parser.parse_args(argv)
+    if not args.source:
+        parser.error("`--source` or MONGOMV_URI is required")
+    mirror = RegistryMirror(args.source, args.target, name=args.name, batch_size=args.batch_size, workers=args.workers)
+    if args.reset:
+        mirror.reset()
+    if args.interval is None:
+        print(mirror.sync(), file=sys.stderr)
+        return 0
+    try:
+        mirror.run_forever(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
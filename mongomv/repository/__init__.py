@@ -1 +1,3 @@
+from .readers import ArtifactReader, FileArtifactReader
+from .stores import ArtifactStore, ColdStore, DedupStore, FileSystemStore, GridFSStore
 from .unit_of_work import UnitOfWork
@@ -0,0 +1,115 @@
+import hashlib
+import shutil
+import tarfile
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import BinaryIO, Dict, List, Optional
+
+
+class _HashingReader:
+    """File wrapper, which computes sha256 of all bytes read through it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.sha256.update(data)
+        return data
+
+
+class _LimitedReader:
+    """File wrapper, which reads no more than `size` bytes."""
+
+    def __init__(self, file, size: int):
+        self.file = file
+        self.remaining = size
+
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class _NullWriter:
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+def pack_directory(dir_path: Path, fileobj: BinaryIO) -> List[Dict]:
+    """Stream a directory into writable `fileobj` as an uncompressed tar archive.
+
+    Files are packed on the fly, without a temporary archive on disk.
+    Return the manifest: relative path, size, data offset inside
+    the archive and sha256 of every packed file.
+    """
+    manifest = []
+    with tarfile.open(fileobj=fileobj, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for path in sorted(dir_path.rglob("*")):
+            if not path.is_file():
+                continue
+            tarinfo = tar.gettarinfo(name=path, arcname=path.relative_to(dir_path).as_posix())
+            offset = tar.offset + len(tarinfo.tobuf(tar.format, tar.encoding, tar.errors))
+            with open(file=path, mode="rb") as file:
+                reader = _HashingReader(file)
+                tar.addfile(tarinfo, reader)
+            manifest.append({
+                "path": tarinfo.name,
+                "size": tarinfo.size,
+                "offset": offset,
+                "sha256": reader.sha256.hexdigest()
+            })
+    return manifest
+
+
+def _safe_path(dir_path: Path, name: str) -> Path:
+    """Resolve an archive member path inside `dir_path`, reject absolute paths and `..` components."""
+    member = PurePosixPath(name)
+    if member.is_absolute() or PureWindowsPath(name).is_absolute() or ".." in member.parts:
+        raise ValueError(f"Archive member {name} is outside of the directory")
+    return dir_path.joinpath(*member.parts)
+
+
+def unpack_directory(fileobj: BinaryIO, dir_path: Path, manifest: Optional[List[Dict]] = None) -> bool:
+    """Unpack a tar archive from readable `fileobj` while streaming it.
+
+    If `manifest` is set, only listed files are fetched: seekable
+    file objects jump straight to their offsets, other ones skip
+    the bytes in between. Members with absolute paths or `..`
+    components raise `ValueError`, so an archive can't write outside `dir_path`.
+    """
+    if manifest is None:
+        if dir_path.exists() and any(dir_path.iterdir()):
+            raise FileExistsError("Directory is already exists and is not empty")
+        dir_path.mkdir(parents=True, exist_ok=True)
+        with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+            for member in tar:
+                _safe_path(dir_path, member.name)
+                if not (member.isfile() or member.isdir()):
+                    raise ValueError(f"Archive member {member.name} is not a regular file or directory")
+                if hasattr(tarfile, "data_filter"):
+                    tar.extract(member, path=dir_path, filter="data")
+                else:
+                    tar.extract(member, path=dir_path)
+        return True
+
+    position = 0
+    for entry in sorted(manifest, key=lambda el: el["offset"]):
+        path = _safe_path(dir_path, entry["path"])
+        if path.exists():
+            raise FileExistsError(f"File {path} is already exists")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fileobj.seekable():
+            fileobj.seek(entry["offset"])
+        else:
+            shutil.copyfileobj(_LimitedReader(fileobj, entry["offset"] - position), _NullWriter())
+        with open(path, "wb") as file:
+            shutil.copyfileobj(_LimitedReader(fileobj, entry["size"]), file)
+        position = entry["offset"] + entry["size"]
+    return True
+
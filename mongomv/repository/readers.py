@@ -0,0 +1,310 @@
+import io
+import lzma
+import os
+from abc import abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from gridfs.errors import CorruptGridFile, NoFile
+from pymongo.collection import Collection
+
+
+class ArtifactReader(io.RawIOBase):
+    """Seekable read-only binary file object over a chunked artifact.
+
+    Only chunks, which cover requested byte range, are fetched.
+    Fetched chunks are kept in a small LRU cache; sequential reads
+    grow a read-ahead window (up to `max_read_ahead` chunks fetched
+    with a single query), random reads switch it off.
+    Reader might be a window over the artifact (`offset`, `length`),
+    e.g. a single file inside a directory archive.
+    Subclasses implement chunk lookup and fetching.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # io classes don't check abstract methods on instantiation as `ABC` does
+        if cls.__abstractmethods__:
+            raise TypeError(f"Can't instantiate abstract class {cls.__name__} "
+                            f"with abstract methods {', '.join(sorted(cls.__abstractmethods__))}")
+        return super().__new__(cls)
+
+
+    def __init__(self, length: int, offset: int = 0, cache_size: int = 16, max_read_ahead: int = 8):
+        super().__init__()
+        self._offset = offset
+        self._length = length
+        self._position = 0
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+        self._cache_size = max(cache_size, max_read_ahead + 1)
+        self._max_read_ahead = max_read_ahead
+        self._read_ahead = 0
+        self._last_index = None
+        self.fetched_chunks = 0
+
+
+    @abstractmethod
+    def _chunk_count(self) -> int:
+        ...
+
+
+    @abstractmethod
+    def _chunk_start(self, index: int) -> int:
+        """Offset of the chunk in the artifact."""
+
+
+    @abstractmethod
+    def _chunk_index(self, position: int) -> int:
+        """Index of the chunk, which contains the artifact offset."""
+
+
+    @abstractmethod
+    def _fetch(self, indices: List[int]) -> Dict[int, bytes]:
+        """Fetch chunks by their indices, missing chunks might be omitted."""
+
+
+    def _get_chunks(self, first: int, last: int) -> Dict[int, bytes]:
+        if self._last_index is not None and first in (self._last_index, self._last_index + 1):
+            self._read_ahead = min(max(1, self._read_ahead * 2), self._max_read_ahead)
+        else:
+            self._read_ahead = 0
+        self._last_index = last
+
+        chunks = {}
+        for index in range(first, last + 1):
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                chunks[index] = self._cache[index]
+        if len(chunks) == last - first + 1:
+            return chunks
+
+        end = min(last + self._read_ahead, self._chunk_count() - 1)
+        fetched = self._fetch([el for el in range(first, end + 1) if el not in self._cache])
+        self.fetched_chunks += len(fetched)
+        for index in range(first, end + 1):
+            if index in fetched:
+                self._cache[index] = fetched[index]
+                self._cache.move_to_end(index)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        chunks.update((el, fetched[el]) for el in range(first, last + 1) if el in fetched)
+        return chunks
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def seekable(self) -> bool:
+        return True
+
+
+    def tell(self) -> int:
+        return self._position
+
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._length + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        size = min(len(view), self._length - self._position)
+        if size <= 0:
+            return 0
+        start = self._offset + self._position
+        first, last = self._chunk_index(start), self._chunk_index(start + size - 1)
+        chunks = self._get_chunks(first, last)
+
+        written = 0
+        for index in range(first, last + 1):
+            data = chunks[index]
+            begin = start + written - self._chunk_start(index)
+            piece = min(len(data) - begin, size - written)
+            view[written:written + piece] = data[begin:begin + piece]
+            written += piece
+        self._position += written
+        return written
+
+
+    def readall(self) -> bytes:
+        buffer = bytearray(max(0, self._length - self._position))
+        size = self.readinto(buffer)
+        return bytes(buffer[:size])
+
+
+class GridFSArtifactReader(ArtifactReader):
+    """Artifact reader over GridFS chunks, fetched by `files_id` and `n` index."""
+
+    def __init__(self,
+                 root_collection: Collection,
+                 file_id: ObjectId,
+                 offset: int = 0,
+                 length: Optional[int] = None,
+                 **kwargs):
+        file = root_collection.files.find_one({"_id": file_id}, projection={"length": 1, "chunkSize": 1})
+        if file is None:
+            raise NoFile(f"There is no file with id {file_id}")
+        self._chunks_collection = root_collection.chunks
+        self._file_id = file_id
+        self._chunk_size = file["chunkSize"]
+        self._total_length = file["length"]
+        super().__init__(length=self._total_length - offset if length is None else length, offset=offset, **kwargs)
+
+
+    def _chunk_count(self) -> int:
+        return -(-self._total_length // self._chunk_size)
+
+
+    def _chunk_start(self, index: int) -> int:
+        return index * self._chunk_size
+
+
+    def _chunk_index(self, position: int) -> int:
+        return position // self._chunk_size
+
+
+    def _fetch(self, indices: List[int]) -> Dict[int, bytes]:
+        result = {
+            el["n"]: el["data"]
+            for el in self._chunks_collection.find(
+                {"files_id": self._file_id, "n": {"$in": indices}},
+                projection={"n": 1, "data": 1}
+            )
+        }
+        if len(result) != len(indices):
+            raise CorruptGridFile(f"Missing chunks of file {self._file_id}")
+        return result
+
+
+class DedupArtifactReader(ArtifactReader):
+    """Artifact reader over content-addressed chunks, located by their cumulative offsets."""
+
+    def __init__(self,
+                 chunks_collection: Collection,
+                 chunks: List[Dict],
+                 offset: int = 0,
+                 length: Optional[int] = None,
+                 **kwargs):
+        self._chunks_collection = chunks_collection
+        self._hashes = [el["hash"] for el in chunks]
+        self._starts = [0, *accumulate(el["length"] for el in chunks)]
+        total_length = self._starts.pop()
+        super().__init__(length=total_length - offset if length is None else length, offset=offset, **kwargs)
+
+
+    def _chunk_count(self) -> int:
+        return len(self._hashes)
+
+
+    def _chunk_start(self, index: int) -> int:
+        return self._starts[index]
+
+
+    def _chunk_index(self, position: int) -> int:
+        return bisect_right(self._starts, position) - 1
+
+
+    def _fetch(self, indices: List[int]) -> Dict[int, bytes]:
+        hashes = {self._hashes[el] for el in indices}
+        found = {
+            el["_id"]: el["data"]
+            for el in self._chunks_collection.find({"_id": {"$in": list(hashes)}}, projection={"data": 1})
+        }
+        if len(found) != len(hashes):
+            raise KeyError(f"Chunks {sorted(hashes - set(found))} are missing in chunk storage")
+        return {el: found[self._hashes[el]] for el in indices}
+
+
+class FileArtifactReader(ArtifactReader):
+    """Artifact reader over a local or network file, read in fixed size blocks with `os.pread`."""
+
+    def __init__(self,
+                 path: Path,
+                 offset: int = 0,
+                 length: Optional[int] = None,
+                 block_size: int = 1024 * 1024,
+                 **kwargs):
+        self._fd = os.open(path, os.O_RDONLY)
+        self._block_size = block_size
+        self._total_length = os.fstat(self._fd).st_size
+        super().__init__(length=self._total_length - offset if length is None else length, offset=offset, **kwargs)
+
+
+    def _chunk_count(self) -> int:
+        return -(-self._total_length // self._block_size)
+
+
+    def _chunk_start(self, index: int) -> int:
+        return index * self._block_size
+
+
+    def _chunk_index(self, position: int) -> int:
+        return position // self._block_size
+
+
+    def _fetch(self, indices: List[int]) -> Dict[int, bytes]:
+        return {el: os.pread(self._fd, self._block_size, el * self._block_size) for el in indices}
+
+
+    def close(self) -> None:
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+class ColdArtifactReader(ArtifactReader):
+    """Artifact reader over independently compressed frames of the cold tier, decompressed on fetch."""
+
+    def __init__(self,
+                 frames_collection: Collection,
+                 artifact_id: ObjectId,
+                 total_length: int,
+                 frame_size: int,
+                 offset: int = 0,
+                 length: Optional[int] = None,
+                 **kwargs):
+        self._frames_collection = frames_collection
+        self._artifact_id = artifact_id
+        self._total_length = total_length
+        self._frame_size = frame_size
+        super().__init__(length=total_length - offset if length is None else length, offset=offset, **kwargs)
+
+
+    def _chunk_count(self) -> int:
+        return -(-self._total_length // self._frame_size)
+
+
+    def _chunk_start(self, index: int) -> int:
+        return index * self._frame_size
+
+
+    def _chunk_index(self, position: int) -> int:
+        return position // self._frame_size
+
+
+    def _fetch(self, indices: List[int]) -> Dict[int, bytes]:
+        result = {
+            el["n"]: lzma.decompress(el["data"])
+            for el in self._frames_collection.find(
+                {"artifact": self._artifact_id, "n": {"$in": indices}},
+                projection={"n": 1, "data": 1}
+            )
+        }
+        if len(result) != len(indices):
+            raise KeyError(f"Missing cold frames of artifact {self._artifact_id}")
+        return result
@@ -1,17 +1,70 @@
+import hashlib
+import lzma
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Set, Tuple
 
 from bson import ObjectId
-from gridfs import GridIn, GridOut
+from gridfs import GridOut
+from gridfs.errors import CorruptGridFile, NoFile
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument, UpdateOne
 from pymongo.client_session import ClientSession
+from pymongo.collection import Collection
+from pymongo.command_cursor import CommandCursor
 from pymongo.cursor import Cursor
-from pymongo.results import DeleteResult, InsertOneResult, UpdateResult
+from pymongo.results import BulkWriteResult, DeleteResult, InsertOneResult, UpdateResult
+
+from mongomv.utils import ContentDefinedChunker, ObservedReader, report_transfer
+
+from .packing import pack_directory, unpack_directory
+from .readers import ColdArtifactReader, DedupArtifactReader, GridFSArtifactReader
+
+_BOUNDED_OPERATORS = {"$eq", "$in", "$gt", "$gte", "$lt", "$lte", "$all", "$elemMatch"}
+
+
+def _bounded_fields(query: Dict) -> Set[str]:
+    """Fields, whose conditions might bound an index scan (equality, range, `$in`, anchored regex)."""
+    fields = set()
+    for key, value in query.items():
+        if key == "$and":
+            for el in value:
+                fields |= _bounded_fields(el)
+        elif key.startswith("$"):
+            continue
+        elif not isinstance(value, dict) or not any(el.startswith("$") for el in value):
+            fields.add(key)
+        elif set(value) & _BOUNDED_OPERATORS:
+            fields.add(key)
+        elif isinstance(value.get("$regex"), str) and value["$regex"].startswith("^"):
+            fields.add(key)
+    return fields
+
+
+def _query_uses_index(query: Dict, first_keys: Set[str], text: bool) -> bool:
+    if "$text" in query:
+        return text
+    if _bounded_fields(query) & first_keys:
+        return True
+    branches = [query["$or"]] if "$or" in query else []
+    branches += [el["$or"] for el in query.get("$and", []) if "$or" in el]
+    return any(all(_query_uses_index(el, first_keys, text) for el in branch) for branch in branches)
 
 
 class PymongoRepository:
+    """Collection of documents.
+
+    Writes of a `tracked` collection maintain `updated_at` (updates use
+    the server clock with `$currentDate`) and deletes leave tombstones,
+    so changes might be read incrementally (look `mongomv.mirror`).
+    """
 
     database_name: str = "mongomv"
     collection: str = None
+    indexes: List[IndexModel] = []
+    tracked: bool = False
 
 
     def __init__(self, session: ClientSession):
@@ -20,23 +73,39 @@ class PymongoRepository:
         self.collection = self.db.get_collection(name=self.collection)
 
 
+    def _touch(self, update_query: Dict) -> Dict:
+        if not self.tracked:
+            return update_query
+        return {**update_query, "$currentDate": {**update_query.get("$currentDate", {}), "updated_at": True}}
+
+
+    def _bury(self, obj_ids: List[Any]) -> None:
+        if self.tracked and obj_ids:
+            TombstonesRepository(self.session).record(self.collection.name, obj_ids)
+
+
     def save_one(self, data: Dict) -> bool:
+        if self.tracked:
+            data = {**data, "updated_at": datetime.now(timezone.utc)}
         result: InsertOneResult = self.collection.insert_one(data, session=self.session)
         return result.acknowledged
 
 
-    def get_many(self, get_by: Dict, projection: Dict = {}) -> Cursor:
+    def get_many(self, get_by: Dict, projection: Dict = {}, sort: Optional[List] = None, limit: int = 0) -> Cursor:
         return self.collection.find(
             get_by,
             projection=projection,
+            sort=sort,
+            limit=limit,
             session=self.session
         )
 
 
-    def get_one(self, get_by: Dict, projection: Dict = {}) -> Dict[Any, Any]:
+    def get_one(self, get_by: Dict, projection: Dict = {}, sort: Optional[List] = None) -> Dict[Any, Any]:
         return self.collection.find_one(
             get_by,
             projection=projection,
+            sort=sort,
             session=self.session
         )
 
@@ -44,66 +113,1139 @@ class PymongoRepository:
     def update_by_object_id(self, obj_id: ObjectId, update_query: Dict) -> int:
         result: UpdateResult = self.collection.update_one(
             {"_id": obj_id},
-            update=update_query,
+            update=self._touch(update_query),
             session=self.session
         )
         return result.modified_count
 
 
+    def update_many(self, query: Dict, update_query: Dict) -> int:
+        result: UpdateResult = self.collection.update_many(
+            query,
+            update=self._touch(update_query),
+            session=self.session
+        )
+        return result.modified_count
+
+
+    def update_with_revision(self, obj_id: ObjectId, rev: int, update_queries: List[Dict]) -> int:
+        """Apply update queries in order if the document is still at revision `rev`.
+
+        Every query increments `rev`. Several queries are sent with one ordered
+        `bulk_write`: the first one matches by revision and sets a save token,
+        the following ones match by this token, so nothing is applied
+        after a conflict. Return number of matched queries.
+        """
+        query = {"_id": obj_id, "rev": rev if rev else {"$in": [0, None]}}
+        if len(update_queries) == 1:
+            result: UpdateResult = self.collection.update_one(
+                query,
+                update=self._touch({**update_queries[0], "$inc": {"rev": 1}}),
+                session=self.session
+            )
+            return result.matched_count
+
+        token = ObjectId()
+        requests = []
+        for index, update_query in enumerate(update_queries):
+            update_query = {**update_query, "$inc": {"rev": 1}}
+            if index == 0:
+                update_query["$set"] = {**update_query.get("$set", {}), "_save_token": token}
+            else:
+                query = {"_id": obj_id, "_save_token": token}
+            if index == len(update_queries) - 1:
+                update_query["$unset"] = {"_save_token": ""}
+            requests.append(UpdateOne(query, self._touch(update_query)))
+        return self.collection.bulk_write(requests, ordered=True, session=self.session).matched_count
+
+
+    def bulk_write(self, requests: List, ordered: bool = True) -> BulkWriteResult:
+        return self.collection.bulk_write(requests, ordered=ordered, session=self.session)
+
+
     def delete(self, obj_id: ObjectId) -> int:
         result: DeleteResult = self.collection.delete_one(
             {"_id": obj_id},
             session=self.session
         )
+        if result.deleted_count:
+            self._bury([obj_id])
+        return result.deleted_count
+
+
+    def find_one_and_update(self, obj_id: ObjectId, update_query: Dict, projection: Dict = {}) -> Optional[Dict]:
+        """Update document, return its state before the update."""
+        return self.collection.find_one_and_update(
+            {"_id": obj_id},
+            self._touch(update_query),
+            projection=projection,
+            return_document=ReturnDocument.BEFORE,
+            session=self.session
+        )
+
+
+    def find_one_and_delete(self, obj_id: ObjectId, projection: Dict = {}) -> Optional[Dict]:
+        result = self.collection.find_one_and_delete({"_id": obj_id}, projection=projection, session=self.session)
+        if result is not None:
+            self._bury([obj_id])
+        return result
+
+
+    def delete_many(self, query: Dict) -> int:
+        if self.tracked:
+            obj_ids = [el["_id"] for el in self.collection.find(query, projection={"_id": 1}, session=self.session)]
+            query = {"_id": {"$in": obj_ids}}
+        result: DeleteResult = self.collection.delete_many(query, session=self.session)
+        if self.tracked:
+            self._bury(obj_ids)
         return result.deleted_count
 
 
+    def aggregate(self, pipeline: List[Dict]) -> CommandCursor:
+        return self.collection.aggregate(pipeline, allowDiskUse=True, session=self.session)
+
+
+    def uses_index(self, query: Dict, sort: Optional[List] = None) -> bool:
+        """Whether `query` or `sort` might use `_id` or one of declared indexes.
+
+        Only the first key of every index is considered, like the query
+        planner does for a single field condition; `$or` uses indexes
+        if every branch does. An empty query is always fine.
+        """
+        if not query and not sort:
+            return True
+        keys = [el.document["key"] for el in self.indexes]
+        first_keys = {"_id", *(next(iter(el)) for el in keys if "text" not in el.values())}
+        if sort and sort[0][0] in first_keys:
+            return True
+        return _query_uses_index(query, first_keys, text=any("text" in el.values() for el in keys))
+
+
+    def ensure_indexes(self) -> List[str]:
+        if not self.indexes:
+            return []
+        return self.collection.create_indexes(self.indexes, session=self.session)
+
+
 class ExperimentsRepository(PymongoRepository):
     collection = "experiments"
+    tracked = True
+    indexes = [
+        IndexModel([("models", ASCENDING)], name="models"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ]
 
 
 class ModelsRepository(PymongoRepository):
     collection = "models"
+    tracked = True
+    indexes = [
+        IndexModel(
+            [("name", ASCENDING), ("version", DESCENDING)],
+            name="name_version",
+            unique=True,
+            partialFilterExpression={"version": {"$type": "number"}}
+        ),
+        # an alias belongs to a single version of a name, models without aliases are not indexed
+        IndexModel(
+            [("name", ASCENDING), ("aliases", ASCENDING)],
+            name="name_aliases",
+            unique=True,
+            partialFilterExpression={"aliases": {"$type": "string"}}
+        ),
+        IndexModel([("serialized_model._id", ASCENDING)], name="serialized_model_id", sparse=True),
+        IndexModel([("experiment_id", ASCENDING)], name="experiment_id"),
+        IndexModel([("parents.model_id", ASCENDING)], name="parents_model_id", sparse=True),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel(
+            [("name", TEXT), ("description", TEXT), ("tags", TEXT)],
+            name="text_search",
+            weights={"name": 10, "tags": 5, "description": 1}
+        ),
+    ]
+
+
+    @staticmethod
+    def _lineage_fields(prefix: str) -> Dict:
+        return {
+            "_id": f"{prefix}_id",
+            "name": f"{prefix}name",
+            "version": f"{prefix}version",
+            "tags": f"{prefix}tags",
+            "aliases": f"{prefix}aliases",
+            "parents": f"{prefix}parents",
+            "artifact_id": f"{prefix}serialized_model._id",
+        }
+
+
+    def lineage(self,
+                obj_id: ObjectId,
+                direction: Literal["ancestors", "descendants"],
+                max_depth: Optional[int] = None) -> Optional[Dict]:
+        """Traverse parent links with one `$graphLookup`, return the projected
+        model with related models in `lineage` (`depth` starts with 1).
+
+        Ancestors are matched by `_id`, descendants by the `parents_model_id` index.
+        """
+        if direction == "ancestors":
+            lookup = {"startWith": "$parents.model_id", "connectFromField": "parents.model_id", "connectToField": "_id"}
+        else:
+            lookup = {"startWith": "$_id", "connectFromField": "_id", "connectToField": "parents.model_id"}
+        if max_depth is not None:
+            lookup["maxDepth"] = max_depth - 1
+        node = {**self._lineage_fields("$$this."), "depth": {"$add": ["$$this.depth", 1]}}
+        result = self.aggregate([
+            {"$match": {"_id": obj_id}},
+            {"$graphLookup": {"from": self.collection.name, **lookup, "as": "lineage", "depthField": "depth"}},
+            {
+                "$project": {
+                    **self._lineage_fields("$"),
+                    "lineage": {"$map": {"input": "$lineage", "in": node}}
+                }
+            },
+        ])
+        return next(result, None)
+
+
+    def merge_artifact_references(self, database: str, artifacts_references: str, chunks_references: str) -> None:
+        """Write ids of all referenced artifacts and deduplicated chunks
+        into collections of the artifacts database, server side.
+
+        Artifact ids are written whatever the storage, so frames of an artifact
+        being moved to the cold tier are referenced before the model is switched to `cold`.
+        """
+        self.collection.aggregate(
+            [
+                {"$match": {"serialized_model._id": {"$exists": True}}},
+                {"$project": {"_id": "$serialized_model._id"}},
+                {"$merge": {"into": {"db": database, "coll": artifacts_references}, "whenMatched": "keepExisting"}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+        self.collection.aggregate(
+            [
+                {"$match": {"serialized_model.storage": "dedup"}},
+                {"$unwind": "$serialized_model.chunks"},
+                {"$group": {"_id": "$serialized_model.chunks.hash"}},
+                {"$merge": {"into": {"db": database, "coll": chunks_references}, "whenMatched": "keepExisting"}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+
+
+class TagFacetsRepository(PymongoRepository):
+    """Materialized number of documents per tag, maintained with `$inc`."""
+
+    collection = "tag_facets"
+    indexes = [
+        IndexModel([("collection", ASCENDING), ("count", DESCENDING)], name="collection_count"),
+    ]
+
+
+    def increment(self, collection: str, tags: Dict[str, int]) -> None:
+        tags = {tag: count for tag, count in tags.items() if count}
+        if not tags:
+            return
+        self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": f"{collection}:{tag}"},
+                    {"$inc": {"count": count}, "$setOnInsert": {"collection": collection, "tag": tag}},
+                    upsert=True
+                )
+                for tag, count in tags.items()
+            ],
+            ordered=False,
+            session=self.session
+        )
+        self.collection.delete_many(
+            {"_id": {"$in": [f"{collection}:{tag}" for tag in tags]}, "count": {"$lte": 0}},
+            session=self.session
+        )
+
+
+    def get(self, collection: str) -> Dict[str, int]:
+        return {
+            el["tag"]: el["count"]
+            for el in self.collection.find(
+                {"collection": collection, "count": {"$gt": 0}},
+                projection={"tag": 1, "count": 1},
+                sort=[("count", DESCENDING)],
+                session=self.session
+            )
+        }
+
+
+    def replace(self, collection: str, tags: Dict[str, int]) -> None:
+        self.collection.delete_many({"collection": collection}, session=self.session)
+        if tags:
+            self.collection.insert_many(
+                [
+                    {"_id": f"{collection}:{tag}", "collection": collection, "tag": tag, "count": count}
+                    for tag, count in tags.items()
+                ],
+                session=self.session
+            )
+
+
+class CountersRepository(PymongoRepository):
+    collection = "counters"
 
 
+    def next_value(self, key: str) -> int:
+        """Atomically increment and return the counter, create it if needed."""
+        result = self.collection.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=self.session
+        )
+        return result["seq"]
+
+
+
+class TombstonesRepository(PymongoRepository):
+    """Keys of deleted documents (`experiments`, `models`) and artifacts (`gridfs`, `dedup`, `cold`).
+
+    Tombstones expire after `ttl` seconds, a mirror which falls
+    behind further must be synchronized from scratch.
+    """
+
+    collection = "tombstones"
+    ttl = 30 * 24 * 3600
+    indexes = [IndexModel([("deleted_at", ASCENDING)], name="deleted_at", expireAfterSeconds=ttl)]
+
+
+    def record(self, collection: str, keys: List[Any]) -> None:
+        now = datetime.now(timezone.utc)
+        self.collection.insert_many(
+            [{"collection": collection, "key": el, "deleted_at": now} for el in keys],
+            session=self.session
+        )
+
+
+    def deleted_since(self, deleted_after: datetime) -> Cursor:
+        return self.collection.find(
+            {"deleted_at": {"$gte": deleted_after}},
+            projection={"collection": 1, "key": 1},
+            sort=[("deleted_at", ASCENDING)],
+            session=self.session
+        )
+
 
 class GridFSRepository:
 
     database = "serialized"
     collection = "models"
+    uploads_collection = "models.uploads"
 
     def __init__(self, session: ClientSession):
         self.session = session
         self.db = self.session.client.get_database(name=self.database)
         self.root_collection = self.db.get_collection(name=self.collection)
-        self.gridin = GridIn
+        self.uploads = self.db.get_collection(name=self.uploads_collection)
         self.gridout = GridOut
 
 
-    def put(self, model_path: Path, data: Dict) -> Optional[bool]:
-        with open(file=model_path, mode="rb") as file:
-            if file.readable():
-                with self.gridin(root_collection=self.root_collection, session=self.session, **data) as gridin:
-                    if gridin.writeable():
-                        if gridin.write(data=file.read()) is None:
-                            return True
-            else:
-                raise FileExistsError("File not readable")
+    def ensure_indexes(self) -> List[str]:
+        """Indexes GridFS drivers create on the first upload, chunks are written here directly."""
+        return [
+            self.root_collection.chunks.create_index(
+                [("files_id", ASCENDING), ("n", ASCENDING)], unique=True, session=self.session
+            ),
+            self.root_collection.files.create_index(
+                [("filename", ASCENDING), ("uploadDate", ASCENDING)], session=self.session
+            ),
+        ]
+
+
+    def _start_upload(self, upload_id: ObjectId, files_id: ObjectId, chunk_size: int) -> Dict:
+        """Return the upload session of `upload_id`, start a new one if there is none."""
+        upload = self.uploads.find_one({"_id": upload_id}, session=self.session)
+        if upload is not None and upload["chunk_size"] == chunk_size:
+            return upload
+        if upload is not None:
+            self.root_collection.chunks.delete_many({"files_id": upload["files_id"]}, session=self.session)
+        now = datetime.now(timezone.utc)
+        upload = {
+            "_id": upload_id,
+            "files_id": files_id,
+            "chunk_size": chunk_size,
+            "chunks": 0,
+            "length": 0,
+            "sha256": hashlib.sha256().hexdigest(),
+            "started": now,
+            "updated": now
+        }
+        self.uploads.replace_one({"_id": upload_id}, upload, upsert=True, session=self.session)
+        return upload
+
+
+    def put_resumable(self, upload_id: ObjectId, data: Dict, write: Callable[[Any], Any]) -> Tuple[ObjectId, Any]:
+        """Upload a file, resuming an interrupted upload with the same `upload_id`.
+
+        `write` is called with a writable file object and must write
+        the whole source into it (e.g. `shutil.copyfileobj`). If the source
+        differs from already committed bytes, the upload restarts from zero.
+        Files document becomes visible only when all chunks are present.
+        Return files id (taken from the interrupted upload if resumed)
+        and the result of `write`.
+        """
+        chunk_size = data.get("chunkSize", 255 * 1024)
+        for _ in range(2):
+            upload = self._start_upload(upload_id, data["_id"], chunk_size)
+            writer = _ResumableGridWriter(self.root_collection, self.uploads, self.session, upload, data)
+            try:
+                result = write(writer)
+                writer.close()
+                return writer.files_id, result
+            except _ResumeMismatch:
+                self.root_collection.chunks.delete_many({"files_id": upload["files_id"]}, session=self.session)
+                self.uploads.delete_one({"_id": upload_id}, session=self.session)
+        raise RuntimeError(f"Upload {upload_id} can not be resumed")
+
+
+    def stale_uploads(self, updated_before: datetime) -> List[Dict]:
+        return list(self.uploads.find(
+            {"updated": {"$lt": updated_before}},
+            projection={"files_id": 1},
+            session=self.session
+        ))
+
+
+    def delete_uploads(self, upload_ids: List[ObjectId]) -> int:
+        result: DeleteResult = self.uploads.delete_many({"_id": {"$in": upload_ids}}, session=self.session)
+        return result.deleted_count
+
+
+    def put(self, model_path: Path, data: Dict) -> ObjectId:
+        """Upload a file, resuming an interrupted upload of the same model. Return files id."""
+        def write(writer: _ResumableGridWriter) -> None:
+            with open(file=model_path, mode="rb") as file:
+                shutil.copyfileobj(file, writer, 1024 * 1024)
+
+        files_id, _ = self.put_resumable(upload_id=data["entity_id"], data=data, write=write)
+        return files_id
+
+
+    def put_directory(self, dir_path: Path, data: Dict) -> Tuple[ObjectId, List[Dict]]:
+        """Stream a directory into GridFS as a single tar archive, return files id and manifest."""
+        return self.put_resumable(
+            upload_id=data["entity_id"],
+            data=data,
+            write=lambda writer: pack_directory(dir_path, writer)
+        )
+
+
+    def get_directory(self,
+                      obj_id: ObjectId,
+                      dir_path: Path,
+                      manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        """Unpack a directory archive from GridFS while streaming it.
+
+        If `manifest` is set, only listed files are fetched:
+        GridFS seeks straight to their offsets, other chunks are not read.
+        """
+        with self.gridout(root_collection=self.root_collection, session=self.session, file_id=obj_id) as gridout:
+            return unpack_directory(ObservedReader(gridout), dir_path, manifest)
 
 
     def get(self, obj_id: ObjectId, model_path: Optional[Path] = None) -> Optional[bool]:
         with self.gridout(root_collection=self.root_collection, session=self.session, file_id=obj_id) as gridout:
-            path: Path = model_path if model_path else gridout.serialized_model_path
+            path: Path = Path(model_path if model_path else gridout.serialized_model_path)
             if path.exists():
                 raise FileExistsError("File is already exists")
             if gridout.readable():
                 with open(path, "wb") as md:
-                    md.write(gridout.read())
+                    shutil.copyfileobj(ObservedReader(gridout), md, 1024 * 1024)
                     return True
 
 
+    def length(self, obj_id: ObjectId) -> int:
+        file = self.root_collection.files.find_one({"_id": obj_id}, projection={"length": 1}, session=self.session)
+        if file is None:
+            raise NoFile(f"There is no file with id {obj_id}")
+        return file["length"]
+
+
+    def get_into(self, obj_id: ObjectId, buffer) -> int:
+        """Copy GridFS chunks straight into a preallocated writable buffer, return number of bytes."""
+        view = memoryview(buffer).cast("B")
+        file = self.root_collection.files.find_one(
+            {"_id": obj_id},
+            projection={"length": 1, "chunkSize": 1},
+            session=self.session
+        )
+        if file is None:
+            raise NoFile(f"There is no file with id {obj_id}")
+        if len(view) < file["length"]:
+            raise ValueError(f"Buffer is too small: {len(view)} bytes, artifact has {file['length']} bytes")
+
+        written = 0
+        for chunk in self.root_collection.chunks.find(
+            {"files_id": obj_id},
+            projection={"n": 1, "data": 1},
+            session=self.session
+        ):
+            start = chunk["n"] * file["chunkSize"]
+            view[start:start + len(chunk["data"])] = chunk["data"]
+            written += len(chunk["data"])
+        if written != file["length"]:
+            raise CorruptGridFile(f"Missing chunks of file {obj_id}")
+        return written
+
+
+    def orphaned_files(self, references: str, uploaded_before: datetime) -> CommandCursor:
+        """Anti-join files with `references` collection, return ids and lengths of unreferenced files."""
+        return self.root_collection.files.aggregate(
+            [
+                {"$match": {"uploadDate": {"$lt": uploaded_before}}},
+                {"$lookup": {"from": references, "localField": "_id", "foreignField": "_id", "as": "references"}},
+                {"$match": {"references": {"$size": 0}}},
+                {"$project": {"length": 1}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+
+
+    def orphaned_chunks(self, created_before: datetime) -> CommandCursor:
+        """Return `files_id` of chunks without a files document (interrupted uploads).
+
+        Chunks of resumable uploads, which were active after `created_before`, are kept.
+        """
+        return self.root_collection.chunks.aggregate(
+            [
+                {"$match": {"files_id": {"$lt": ObjectId.from_datetime(created_before)}}},
+                {"$group": {"_id": "$files_id"}},
+                {
+                    "$lookup": {
+                        "from": f"{self.collection}.files",
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "files"
+                    }
+                },
+                {"$match": {"files": {"$size": 0}}},
+                {
+                    "$lookup": {
+                        "from": self.uploads_collection,
+                        "localField": "_id",
+                        "foreignField": "files_id",
+                        "as": "uploads"
+                    }
+                },
+                {"$match": {"uploads.updated": {"$not": {"$gte": created_before}}}},
+                {"$project": {"_id": 1}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+
+
+    def chunks_size(self, obj_ids: List[ObjectId]) -> int:
+        result = list(self.root_collection.chunks.aggregate(
+            [
+                {"$match": {"files_id": {"$in": obj_ids}}},
+                {"$group": {"_id": None, "size": {"$sum": {"$binarySize": "$data"}}}},
+            ],
+            session=self.session
+        ))
+        return result[0]["size"] if result else 0
+
+
+    def delete_many(self, obj_ids: List[ObjectId]) -> int:
+        """Delete files and their chunks with `$in` queries, return number of deleted files."""
+        result = self.root_collection.files.delete_many({"_id": {"$in": obj_ids}}, session=self.session)
+        self.root_collection.chunks.delete_many({"files_id": {"$in": obj_ids}}, session=self.session)
+        if result.deleted_count:
+            TombstonesRepository(self.session).record("gridfs", obj_ids)
+        return result.deleted_count
+
+
+    def open(self, obj_id: ObjectId, **kwargs) -> GridFSArtifactReader:
+        """Open seekable reader, which is not bound to the session of this unit of work."""
+        return GridFSArtifactReader(self.root_collection, obj_id, **kwargs)
+
+
     def delete(self, obj_id: ObjectId):
         result = self.root_collection.files.delete_one({"_id": obj_id}, session=self.session)
         result_ = self.root_collection.chunks.delete_many({"files_id": obj_id}, session=self.session)
+        if result.deleted_count:
+            TombstonesRepository(self.session).record("gridfs", [obj_id])
         if result.deleted_count != 0 and result_.deleted_count != 0:
             return True
+
+
+class _ResumeMismatch(Exception):
+    """Source differs from the bytes committed by the interrupted upload."""
+
+
+class _ResumableGridWriter:
+    """Writable file object, which uploads GridFS chunks and records progress in an upload session.
+
+    Chunks are upserted by `files_id` and `n` in batches, after every batch
+    the session stores number of committed chunks and sha256 of committed bytes.
+    On resume bytes of committed chunks are only hashed; if their hash
+    differs from the stored one, `_ResumeMismatch` is raised.
+    Files document is inserted by `close`, when all chunks are present.
+    """
+
+    def __init__(self,
+                 root_collection: Collection,
+                 uploads: Collection,
+                 session: ClientSession,
+                 upload: Dict,
+                 data: Dict,
+                 batch_size: int = 16):
+        self.root_collection = root_collection
+        self.uploads = uploads
+        self.session = session
+        self.upload = upload
+        self.data = data
+        self.batch_size = batch_size
+        self.chunk_size = upload["chunk_size"]
+        self.files_id = upload["files_id"]
+        self.length = 0
+        self.resumed_bytes = upload["length"]
+        self._skip = upload["length"]
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._pending: List[bytes] = []
+        self._n = upload["chunks"]
+        self._closed = False
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+    def write(self, data: bytes) -> int:
+        size = len(data)
+        self.length += size
+        view = memoryview(data)
+        if self._skip:
+            prefix, view = view[:self._skip], view[self._skip:]
+            self._sha256.update(prefix)
+            self._skip -= len(prefix)
+            if not self._skip and self._sha256.hexdigest() != self.upload["sha256"]:
+                raise _ResumeMismatch(f"Source of upload {self.upload['_id']} was changed")
+        self._buffer += view
+        while len(self._buffer) >= self.chunk_size:
+            self._add_chunk(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        if len(self._pending) >= self.batch_size:
+            self._commit()
+        return size
+
+
+    def _add_chunk(self, chunk: bytes) -> None:
+        self._sha256.update(chunk)
+        self._pending.append(chunk)
+
+
+    def _commit(self) -> None:
+        if not self._pending:
+            return
+        first = self._n
+        self.root_collection.chunks.bulk_write(
+            [
+                UpdateOne(
+                    {"files_id": self.files_id, "n": first + i},
+                    {"$set": {"data": chunk}},
+                    upsert=True
+                )
+                for i, chunk in enumerate(self._pending)
+            ],
+            ordered=False,
+            session=self.session
+        )
+        self._n += len(self._pending)
+        pending, self._pending = self._pending, []
+        self.uploads.update_one(
+            {"_id": self.upload["_id"]},
+            {
+                "$set": {"chunks": self._n, "sha256": self._sha256.hexdigest(), "updated": datetime.now(timezone.utc)},
+                "$inc": {"length": sum(len(el) for el in pending)}
+            },
+            session=self.session
+        )
+        # progress counts committed bytes, a cancelled upload resumes right after them
+        for chunk in pending:
+            report_transfer(len(chunk))
+
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        if self._skip:
+            raise _ResumeMismatch(f"Source of upload {self.upload['_id']} is shorter than committed bytes")
+        if self._buffer:
+            self._add_chunk(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._commit()
+        # chunks beyond the end were left by a longer source of an interrupted upload
+        self.root_collection.chunks.delete_many(
+            {"files_id": self.files_id, "n": {"$gte": self._n}},
+            session=self.session
+        )
+        now = datetime.now(timezone.utc)
+        self.root_collection.files.insert_one(
+            {
+                **self.data,
+                "_id": self.files_id,
+                "length": self.length,
+                "chunkSize": self.chunk_size,
+                "uploadDate": now,
+                "updated_at": now
+            },
+            session=self.session
+        )
+        self.uploads.delete_one({"_id": self.upload["_id"]}, session=self.session)
+        self._closed = True
+
+
+class _DedupWriter:
+    """Writable file object, which stores every unique content-defined chunk once."""
+
+    def __init__(self, collection: Collection, session: ClientSession, batch_size: int = 64, **chunker_kwargs):
+        self.collection = collection
+        self.session = session
+        self.batch_size = batch_size
+        self.chunker = ContentDefinedChunker(**chunker_kwargs)
+        self.chunks: List[Dict] = []
+        self.uploaded_bytes = 0
+        self.uploaded_chunks = 0
+        self._pending: List[bytes] = []
+        self._started = time.perf_counter()
+        self._seconds = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+    def write(self, data: bytes) -> int:
+        self._pending.extend(self.chunker.update(data))
+        if len(self._pending) >= self.batch_size:
+            self._store()
+        return len(data)
+
+
+    def close(self) -> None:
+        if self._seconds is None:
+            self._pending.extend(self.chunker.flush())
+            self._store()
+            self._seconds = time.perf_counter() - self._started
+
+
+    def _store(self) -> None:
+        if not self._pending:
+            return
+        hashes = [hashlib.sha256(el).hexdigest() for el in self._pending]
+        counts = Counter(hashes)
+        unique = dict(zip(hashes, self._pending, strict=True))
+        now = datetime.now(timezone.utc)
+        # a single upsert per chunk, so a concurrent upload of the same chunk only counts a reference
+        result = self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": chunk_hash},
+                    {
+                        "$setOnInsert": {"data": data, "length": len(data)},
+                        "$inc": {"refs": counts[chunk_hash]},
+                        "$set": {"last_used": now}
+                    },
+                    upsert=True
+                )
+                for chunk_hash, data in unique.items()
+            ],
+            ordered=False,
+            session=self.session
+        )
+        upserted = set(result.upserted_ids.values())
+        self.uploaded_chunks += len(upserted)
+        self.uploaded_bytes += sum(len(unique[el]) for el in upserted)
+        self.chunks.extend(
+            {"hash": chunk_hash, "length": len(data)} for chunk_hash, data in zip(hashes, self._pending, strict=True)
+        )
+        pending, self._pending = self._pending, []
+        for chunk in pending:
+            report_transfer(len(chunk))
+
+
+    def result(self) -> Dict:
+        return {
+            "chunks": self.chunks,
+            "stats": {
+                "total_bytes": sum(el["length"] for el in self.chunks),
+                "uploaded_bytes": self.uploaded_bytes,
+                "total_chunks": len(self.chunks),
+                "uploaded_chunks": self.uploaded_chunks,
+                "seconds": self._seconds
+            }
+        }
+
+
+class _DedupReader:
+    """Sequential readable file object over an ordered list of chunk references."""
+
+    def __init__(self, collection: Collection, session: ClientSession, chunks: List[Dict], batch_size: int = 64):
+        self._data = self.iter_chunks(collection, session, [el["hash"] for el in chunks], batch_size)
+        self._buffer = b""
+
+
+    @staticmethod
+    def iter_chunks(collection: Collection,
+                    session: ClientSession,
+                    hashes: List[str],
+                    batch_size: int = 64) -> Iterator[bytes]:
+        for i in range(0, len(hashes), batch_size):
+            batch = hashes[i:i + batch_size]
+            found = {
+                el["_id"]: el["data"]
+                for el in collection.find({"_id": {"$in": batch}}, projection={"data": 1}, session=session)
+            }
+            for chunk_hash in batch:
+                if chunk_hash not in found:
+                    raise KeyError(f"Chunk {chunk_hash} is missing in chunk storage")
+                yield found[chunk_hash]
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def seekable(self) -> bool:
+        return False
+
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            data = self._buffer + b"".join(self._data)
+            self._buffer = b""
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._data, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class DedupRepository:
+    """Content-addressed chunk storage.
+
+    Artifacts are split with content-defined chunking, every unique chunk
+    is stored once keyed by its sha256 with a reference counter,
+    and an artifact is an ordered list of chunk references.
+    """
+
+    database = "serialized"
+    collection = "dedup_chunks"
+
+    def __init__(self, session: ClientSession):
+        self.session = session
+        self.db = self.session.client.get_database(name=self.database)
+        self.chunks_collection = self.db.get_collection(name=self.collection)
+
+
+    def put(self, model_path: Path) -> Dict:
+        """Store file chunks, return chunk references and upload stats."""
+        with open(file=model_path, mode="rb") as file:
+            with _DedupWriter(self.chunks_collection, self.session) as writer:
+                shutil.copyfileobj(file, writer, 1024 * 1024)
+        return writer.result()
+
+
+    def put_directory(self, dir_path: Path) -> Dict:
+        """Store directory as a tar archive, return chunk references, upload stats and manifest."""
+        with _DedupWriter(self.chunks_collection, self.session) as writer:
+            manifest = pack_directory(dir_path, writer)
+        return {"manifest": manifest, **writer.result()}
+
+
+    def get(self, chunks: List[Dict], model_path: Path) -> Optional[bool]:
+        path = Path(model_path)
+        if path.exists():
+            raise FileExistsError("File is already exists")
+        with open(path, "wb") as md:
+            shutil.copyfileobj(ObservedReader(_DedupReader(self.chunks_collection, self.session, chunks)), md)
+        return True
+
+
+    def get_directory(self,
+                      chunks: List[Dict],
+                      dir_path: Path,
+                      manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        return unpack_directory(
+            ObservedReader(_DedupReader(self.chunks_collection, self.session, chunks)), dir_path, manifest
+        )
+
+
+    def get_into(self, chunks: List[Dict], buffer) -> int:
+        """Copy chunks straight into a preallocated writable buffer, return number of bytes."""
+        view = memoryview(buffer).cast("B")
+        length = sum(el["length"] for el in chunks)
+        if len(view) < length:
+            raise ValueError(f"Buffer is too small: {len(view)} bytes, artifact has {length} bytes")
+        position = 0
+        for data in _DedupReader.iter_chunks(self.chunks_collection, self.session, [el["hash"] for el in chunks]):
+            view[position:position + len(data)] = data
+            position += len(data)
+        return position
+
+
+    def orphaned_chunks(self, references: str, used_before: datetime) -> CommandCursor:
+        """Anti-join chunks with `references` collection, return hashes and lengths of unreferenced chunks."""
+        return self.chunks_collection.aggregate(
+            [
+                {"$match": {"last_used": {"$lt": used_before}}},
+                {"$lookup": {"from": references, "localField": "_id", "foreignField": "_id", "as": "references"}},
+                {"$match": {"references": {"$size": 0}}},
+                {"$project": {"length": 1}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+
+
+    def delete_many(self, hashes: List[str], used_before: Optional[datetime] = None) -> int:
+        """Delete chunks, only ones not used since `used_before` if it is set.
+
+        Writers update `last_used` of every chunk they reference, so the condition
+        keeps chunks referenced again after they were found orphaned.
+        """
+        query = {"_id": {"$in": hashes}}
+        if used_before is not None:
+            query["last_used"] = {"$lt": used_before}
+        found = [el["_id"] for el in self.chunks_collection.find(query, projection={"_id": 1}, session=self.session)]
+        query["_id"] = {"$in": found}
+        result = self.chunks_collection.delete_many(query, session=self.session)
+        if result.deleted_count < len(found):
+            # a chunk used again between the lookup and the delete is kept, it is not tombstoned
+            kept = self.chunks_collection.find({"_id": {"$in": found}}, projection={"_id": 1}, session=self.session)
+            kept = {el["_id"] for el in kept}
+            found = [el for el in found if el not in kept]
+        if found:
+            TombstonesRepository(self.session).record("dedup", found)
+        return result.deleted_count
+
+
+    def open(self, chunks: List[Dict], **kwargs) -> DedupArtifactReader:
+        """Open seekable reader, which is not bound to the session of this unit of work."""
+        return DedupArtifactReader(self.chunks_collection, chunks, **kwargs)
+
+
+    def delete(self, chunks: List[Dict]) -> Optional[bool]:
+        """Release chunk references, remove chunks which are not referenced anymore."""
+        counts = Counter(el["hash"] for el in chunks)
+        if not counts:
+            return True
+        self.chunks_collection.bulk_write(
+            [UpdateOne({"_id": chunk_hash}, {"$inc": {"refs": -count}}) for chunk_hash, count in counts.items()],
+            ordered=False,
+            session=self.session
+        )
+        query = {"_id": {"$in": list(counts)}, "refs": {"$lte": 0}}
+        released = [el["_id"] for el in self.chunks_collection.find(query, projection={"_id": 1}, session=self.session)]
+        if released and self.chunks_collection.delete_many(query, session=self.session).deleted_count:
+            # a chunk referenced again meanwhile stays, its tombstone is ignored by a mirror
+            TombstonesRepository(self.session).record("dedup", released)
+        return True
+
+
+class _ColdWriter:
+    """Writable file object, which compresses every `frame_size` bytes into a separate frame document."""
+
+    def __init__(self,
+                 collection: Collection,
+                 session: ClientSession,
+                 artifact_id: ObjectId,
+                 frame_size: int,
+                 preset: int):
+        self.collection = collection
+        self.session = session
+        self.artifact_id = artifact_id
+        self.frame_size = frame_size
+        # dictionary is not larger than a frame, so compression memory does not grow with the preset
+        self.filters = [{"id": lzma.FILTER_LZMA2, "preset": preset, "dict_size": max(frame_size, 4096)}]
+        self.length = 0
+        self.compressed_length = 0
+        self._frames = 0
+        self._buffer = bytearray()
+        self._closed = False
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+    def write(self, data: bytes) -> int:
+        report_transfer(len(data))
+        self._buffer += data
+        while len(self._buffer) >= self.frame_size:
+            self._store(self._buffer[:self.frame_size])
+            del self._buffer[:self.frame_size]
+        return len(data)
+
+
+    def close(self) -> None:
+        if not self._closed:
+            if self._buffer:
+                self._store(self._buffer)
+                self._buffer = bytearray()
+            self._closed = True
+
+
+    def _store(self, frame: bytes) -> None:
+        data = lzma.compress(bytes(frame), filters=self.filters)
+        self.collection.insert_one(
+            {"artifact": self.artifact_id, "n": self._frames, "length": len(frame), "data": data},
+            session=self.session
+        )
+        self._frames += 1
+        self.length += len(frame)
+        self.compressed_length += len(data)
+
+
+    def result(self) -> Dict:
+        return {"length": self.length, "frame_size": self.frame_size, "compressed_length": self.compressed_length}
+
+
+class ColdRepository:
+    """Compressed cold tier of rarely loaded artifacts.
+
+    Artifact bytes are split into `frame_size` frames, every frame
+    is compressed with LZMA (xz) on its own and stored as a document
+    of a separate collection, so a reader decompresses only frames
+    covering the requested range.
+    """
+
+    database = "serialized"
+    collection = "cold_frames"
+    indexes = [IndexModel([("artifact", ASCENDING), ("n", ASCENDING)], unique=True, name="artifact_n")]
+
+    def __init__(self, session: ClientSession, frame_size: int = 4 * 1024 * 1024, preset: int = 9):
+        self.session = session
+        self.db = self.session.client.get_database(name=self.database)
+        self.frames_collection = self.db.get_collection(name=self.collection)
+        self.frame_size = frame_size
+        self.preset = preset
+
+
+    def ensure_indexes(self) -> List[str]:
+        return self.frames_collection.create_indexes(self.indexes, session=self.session)
+
+
+    def put_stream(self, artifact_id: ObjectId, reader) -> Dict:
+        """Compress a readable file object, return `length`, `frame_size` and `compressed_length`.
+
+        Frames of a previous attempt are replaced.
+        """
+        self.delete(artifact_id)
+        with _ColdWriter(self.frames_collection, self.session, artifact_id, self.frame_size, self.preset) as writer:
+            shutil.copyfileobj(reader, writer, self.frame_size)
+        return writer.result()
+
+
+    def put(self, model_path: Path, artifact_id: ObjectId) -> Dict:
+        with open(file=model_path, mode="rb") as file:
+            return self.put_stream(artifact_id, file)
+
+
+    def put_directory(self, dir_path: Path, artifact_id: ObjectId) -> Dict:
+        """Compress directory as a tar archive, return sizes and manifest."""
+        self.delete(artifact_id)
+        with _ColdWriter(self.frames_collection, self.session, artifact_id, self.frame_size, self.preset) as writer:
+            manifest = pack_directory(dir_path, writer)
+        return {"manifest": manifest, **writer.result()}
+
+
+    def open(self, artifact_id: ObjectId, length: int, frame_size: int, **kwargs) -> ColdArtifactReader:
+        """Open seekable reader, which is not bound to the session of this unit of work."""
+        return ColdArtifactReader(self.frames_collection, artifact_id, length, frame_size, **kwargs)
+
+
+    def get(self, artifact_id: ObjectId, length: int, frame_size: int, model_path: Path) -> Optional[bool]:
+        path = Path(model_path)
+        if path.exists():
+            raise FileExistsError("File is already exists")
+        with self.open(artifact_id, length, frame_size) as reader, open(path, "wb") as md:
+            shutil.copyfileobj(ObservedReader(reader), md, frame_size)
+        return True
+
+
+    def get_directory(self,
+                      artifact_id: ObjectId,
+                      length: int,
+                      frame_size: int,
+                      dir_path: Path,
+                      manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        with self.open(artifact_id, length, frame_size) as reader:
+            return unpack_directory(ObservedReader(reader), dir_path, manifest)
+
+
+    def get_into(self, artifact_id: ObjectId, length: int, frame_size: int, buffer) -> int:
+        """Decompress frames straight into a preallocated writable buffer, return number of bytes."""
+        view = memoryview(buffer).cast("B")
+        if len(view) < length:
+            raise ValueError(f"Buffer is too small: {len(view)} bytes, artifact has {length} bytes")
+        position = 0
+        for el in self.frames_collection.find({"artifact": artifact_id}, sort=[("n", ASCENDING)], session=self.session):
+            data = lzma.decompress(el["data"])
+            view[position:position + len(data)] = data
+            position += len(data)
+            report_transfer(len(data))
+        if position != length:
+            raise KeyError(f"Missing cold frames of artifact {artifact_id}")
+        return position
+
+
+    def orphaned_artifacts(self, references: str, created_before: datetime) -> CommandCursor:
+        """Anti-join frames with `references` collection, return ids and lengths of unreferenced artifacts.
+
+        Frames have no upload date, so the age of an artifact is the time of its `ObjectId`.
+        """
+        return self.frames_collection.aggregate(
+            [
+                {"$match": {"artifact": {"$lt": ObjectId.from_datetime(created_before)}}},
+                {"$group": {"_id": "$artifact", "length": {"$sum": "$length"}}},
+                {"$lookup": {"from": references, "localField": "_id", "foreignField": "_id", "as": "references"}},
+                {"$match": {"references": {"$size": 0}}},
+                {"$project": {"length": 1}},
+            ],
+            allowDiskUse=True,
+            session=self.session
+        )
+
+
+    def delete(self, artifact_id: ObjectId) -> Optional[bool]:
+        self.delete_many([artifact_id])
+        return True
+
+
+    def delete_many(self, artifact_ids: List[ObjectId]) -> int:
+        result = self.frames_collection.delete_many({"artifact": {"$in": artifact_ids}}, session=self.session)
+        if result.deleted_count:
+            TombstonesRepository(self.session).record("cold", artifact_ids)
+        return len(artifact_ids)
@@ -0,0 +1,311 @@
+import errno
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from mongomv.utils import ObservedReader, ObservedWriter, report_transfer
+
+from .packing import pack_directory, unpack_directory
+from .readers import ArtifactReader, FileArtifactReader
+from .repo import ColdRepository, DedupRepository, GridFSRepository
+
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+class ArtifactStore(ABC):
+    """Storage of serialized model bytes.
+
+    Every method gets the serialized model document
+    (`SerializedModelEntity.model_dump(by_alias=True)`), its `storage`
+    field is the name the store is registered with (look `UnitOfWork`).
+    Directories are stored as a single tar archive (look `pack_directory`).
+    """
+
+    @abstractmethod
+    def put(self, model_path: Path, data: Dict) -> Dict:
+        """Store a file or a directory, return fields of the serialized model to update."""
+
+
+    @abstractmethod
+    def get(self, data: Dict, model_path: Path, manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        """Load a file, or unpack a directory (only `manifest` files if it is set) into `model_path`."""
+
+
+    @abstractmethod
+    def get_into(self, data: Dict, buffer) -> int:
+        """Copy bytes into a preallocated writable buffer, return number of bytes."""
+
+
+    @abstractmethod
+    def length(self, data: Dict) -> int:
+        ...
+
+
+    @abstractmethod
+    def open(self, data: Dict, **kwargs) -> ArtifactReader:
+        """Open seekable reader, `kwargs` are passed to `ArtifactReader`."""
+
+
+    @abstractmethod
+    def delete(self, data: Dict) -> Optional[bool]:
+        ...
+
+
+    def delete_many(self, data: List[Dict]) -> int:
+        return sum(1 for el in data if self.delete(el))
+
+
+class GridFSStore(ArtifactStore):
+    """Artifacts in GridFS, look `GridFSRepository`."""
+
+    def __init__(self, repository: GridFSRepository):
+        self.repository = repository
+
+
+    def put(self, model_path: Path, data: Dict) -> Dict:
+        if model_path.is_dir():
+            files_id, manifest = self.repository.put_directory(model_path, data)
+            return {"_id": files_id, "manifest": manifest}
+        return {"_id": self.repository.put(model_path, data)}
+
+
+    def get(self, data: Dict, model_path: Path, manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        if data.get("manifest") is not None:
+            return self.repository.get_directory(data["_id"], model_path, manifest)
+        return self.repository.get(data["_id"], model_path)
+
+
+    def get_into(self, data: Dict, buffer) -> int:
+        return self.repository.get_into(data["_id"], buffer)
+
+
+    def length(self, data: Dict) -> int:
+        return data["length"] if data.get("length") is not None else self.repository.length(data["_id"])
+
+
+    def open(self, data: Dict, **kwargs) -> ArtifactReader:
+        return self.repository.open(data["_id"], **kwargs)
+
+
+    def delete(self, data: Dict) -> Optional[bool]:
+        return self.repository.delete(obj_id=data["_id"])
+
+
+    def delete_many(self, data: List[Dict]) -> int:
+        return self.repository.delete_many([el["_id"] for el in data])
+
+
+class DedupStore(ArtifactStore):
+    """Content-defined chunks shared by artifacts, look `DedupRepository`."""
+
+    def __init__(self, repository: DedupRepository):
+        self.repository = repository
+
+
+    def put(self, model_path: Path, data: Dict) -> Dict:
+        if model_path.is_dir():
+            stored = self.repository.put_directory(model_path)
+        else:
+            stored = self.repository.put(model_path)
+        return {**stored, "length": stored["stats"]["total_bytes"]}
+
+
+    def get(self, data: Dict, model_path: Path, manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        if data.get("manifest") is not None:
+            return self.repository.get_directory(data["chunks"], model_path, manifest)
+        return self.repository.get(data["chunks"], model_path)
+
+
+    def get_into(self, data: Dict, buffer) -> int:
+        return self.repository.get_into(data["chunks"], buffer)
+
+
+    def length(self, data: Dict) -> int:
+        return sum(el["length"] for el in data["chunks"])
+
+
+    def open(self, data: Dict, **kwargs) -> ArtifactReader:
+        return self.repository.open(data["chunks"], **kwargs)
+
+
+    def delete(self, data: Dict) -> Optional[bool]:
+        return self.repository.delete(data["chunks"])
+
+
+    def delete_many(self, data: List[Dict]) -> int:
+        self.repository.delete([chunk for el in data for chunk in el["chunks"]])
+        return len(data)
+
+
+class ColdStore(ArtifactStore):
+    """Independently compressed frames of the cold tier, look `ColdRepository`."""
+
+    def __init__(self, repository: ColdRepository):
+        self.repository = repository
+
+
+    def put(self, model_path: Path, data: Dict) -> Dict:
+        if model_path.is_dir():
+            return self.repository.put_directory(model_path, data["_id"])
+        return self.repository.put(model_path, data["_id"])
+
+
+    def put_stream(self, reader, data: Dict) -> Dict:
+        """Compress bytes of a readable file object, e.g. an artifact of another store (look `open`)."""
+        return self.repository.put_stream(data["_id"], reader)
+
+
+    def get(self, data: Dict, model_path: Path, manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        if data.get("manifest") is not None:
+            return self.repository.get_directory(data["_id"], data["length"], data["frame_size"], model_path, manifest)
+        return self.repository.get(data["_id"], data["length"], data["frame_size"], model_path)
+
+
+    def get_into(self, data: Dict, buffer) -> int:
+        return self.repository.get_into(data["_id"], data["length"], data["frame_size"], buffer)
+
+
+    def length(self, data: Dict) -> int:
+        return data["length"]
+
+
+    def open(self, data: Dict, **kwargs) -> ArtifactReader:
+        return self.repository.open(data["_id"], data["length"], data["frame_size"], **kwargs)
+
+
+    def delete(self, data: Dict) -> Optional[bool]:
+        return self.repository.delete(data["_id"])
+
+
+    def delete_many(self, data: List[Dict]) -> int:
+        return self.repository.delete_many([el["_id"] for el in data])
+
+
+def _buffered_copy(source: int, target: int, size: int) -> int:
+    data = os.read(source, size)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(target, view):]
+    return len(data)
+
+
+def copy_fd(source: int, target: int, count: int, block_size: int = 8 * 1024 * 1024) -> int:
+    """Copy `count` bytes from the current position of `source` file descriptor to `target`.
+
+    Bytes do not pass through user space: `copy_file_range` (a reflink
+    on XFS/Btrfs, a server side copy on NFS 4.2), then `sendfile`,
+    then a buffered copy if the kernel does not support both for these files.
+    Every block is reported to the transfer observer. Return number of copied bytes.
+    """
+    methods: List[Callable[[int], int]] = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(lambda size: os.copy_file_range(source, target, size))
+    if hasattr(os, "sendfile"):
+        methods.append(lambda size: os.sendfile(target, source, None, size))
+    methods.append(lambda size: _buffered_copy(source, target, size))
+
+    copied = 0
+    while copied < count:
+        try:
+            size = methods[0](min(block_size, count - copied))
+        except OSError as exc:
+            if len(methods) == 1 or exc.errno not in _UNSUPPORTED:
+                raise
+            methods.pop(0)
+            continue
+        if size == 0:
+            break
+        report_transfer(size)
+        copied += size
+    return copied
+
+
+class FileSystemStore(ArtifactStore):
+    """Artifacts as plain files on a local disk or a shared mount (NFS, CephFS, Lustre).
+
+    Model bytes do not go through MongoDB at all, so large transfers
+    do not compete with metadata queries and do not inflate the oplog.
+    Every artifact is a file `root/<last 2 id chars>/<id>`, written
+    to a temporary file and renamed, so readers never see partial files.
+    Files are copied with `copy_file_range`/`sendfile` (look `copy_fd`).
+
+    Example:
+    >>> from mongomv.repository import FileSystemStore
+    >>> client = MongoMVClient(uri, artifact_stores={"nfs": FileSystemStore("/mnt/models")}, default_store="nfs")
+    """
+
+    def __init__(self, root: Path | str, fsync: bool = True):
+        self.root = Path(root)
+        self.fsync = fsync
+
+
+    def path(self, data: Dict) -> Path:
+        name = str(data["_id"])
+        return self.root / name[-2:] / name
+
+
+    def put(self, model_path: Path, data: Dict) -> Dict:
+        path = self.path(data)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.part")
+        result = {}
+        try:
+            with open(tmp_path, "wb") as target:
+                if model_path.is_dir():
+                    result["manifest"] = pack_directory(model_path, ObservedWriter(target))
+                else:
+                    with open(model_path, "rb") as source:
+                        copy_fd(source.fileno(), target.fileno(), os.fstat(source.fileno()).st_size)
+                target.flush()
+                if self.fsync:
+                    os.fsync(target.fileno())
+                result["length"] = os.fstat(target.fileno()).st_size
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return result
+
+
+    def get(self, data: Dict, model_path: Path, manifest: Optional[List[Dict]] = None) -> Optional[bool]:
+        with open(self.path(data), "rb") as source:
+            if data.get("manifest") is not None:
+                return unpack_directory(ObservedReader(source), Path(model_path), manifest)
+            if Path(model_path).exists():
+                raise FileExistsError("File is already exists")
+            with open(model_path, "wb") as target:
+                copy_fd(source.fileno(), target.fileno(), os.fstat(source.fileno()).st_size)
+        return True
+
+
+    def get_into(self, data: Dict, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        with open(self.path(data), "rb", buffering=0) as source:
+            length = os.fstat(source.fileno()).st_size
+            if len(view) < length:
+                raise ValueError(f"Buffer is too small: {len(view)} bytes, artifact has {length} bytes")
+            position = 0
+            while position < length:
+                size = source.readinto(view[position:min(length, position + 8 * 1024 * 1024)])
+                if not size:
+                    break
+                report_transfer(size)
+                position += size
+        return position
+
+
+    def length(self, data: Dict) -> int:
+        return self.path(data).stat().st_size
+
+
+    def open(self, data: Dict, **kwargs) -> ArtifactReader:
+        return FileArtifactReader(self.path(data), **kwargs)
+
+
+    def delete(self, data: Dict) -> Optional[bool]:
+        try:
+            self.path(data).unlink()
+        except FileNotFoundError:
+            return None
+        return True
@@ -1,28 +1,139 @@
-from typing import Type
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
 
 from pymongo import MongoClient
+from pymongo.client_session import ClientSession
 
-from .repo import ExperimentsRepository, GridFSRepository, ModelsRepository
+from .repo import (
+    ColdRepository,
+    CountersRepository,
+    DedupRepository,
+    ExperimentsRepository,
+    GridFSRepository,
+    ModelsRepository,
+    TagFacetsRepository,
+    TombstonesRepository,
+)
+from .stores import ArtifactStore, ColdStore, DedupStore, GridFSStore
+
+
+class _Repositories:
+    """Session and repositories of a single `with` block."""
+
+    def __init__(self, session: ClientSession):
+        self.session = session
+        self.experiments = ExperimentsRepository(session=session)
+        self.models = ModelsRepository(session=session)
+        self.counters = CountersRepository(session=session)
+        self.tag_facets = TagFacetsRepository(session=session)
+        self.tombstones = TombstonesRepository(session=session)
+        self.gridfs = GridFSRepository(session=session)
+        self.dedup = DedupRepository(session=session)
+        self.cold = ColdRepository(session=session)
+        self.stores = {
+            "gridfs": GridFSStore(self.gridfs),
+            "dedup": DedupStore(self.dedup),
+            "cold": ColdStore(self.cold),
+        }
 
 
 class UnitOfWork:
+    """Session scope over repositories.
+
+    Every `with` block starts its own session. Session and repositories
+    are kept in a context variable, so threads and asyncio tasks sharing
+    one `UnitOfWork` (and one connection pool) never see each other's
+    session, and `with` blocks might be nested.
+    Besides `gridfs`, `dedup` and `cold` (compressed tier) stores,
+    `artifact_stores` might register stores, which do not depend on a session (e.g. `FileSystemStore`),
+    `default_store` is used by `ModelEntity.dump_model`.
+    """
 
-    experiments: Type[ExperimentsRepository]
-    models: Type[ModelsRepository]
+    builtin_stores = ("gridfs", "dedup", "cold")
 
-    def __init__(self, mongo_client: MongoClient):
+    def __init__(self,
+                 mongo_client: MongoClient,
+                 artifact_stores: Optional[Dict[str, ArtifactStore]] = None,
+                 default_store: str = "gridfs"):
         self.client = mongo_client
+        self.artifact_stores = dict(artifact_stores or {})
+        reserved = set(self.artifact_stores) & set(self.builtin_stores)
+        if reserved:
+            raise ValueError(f"Artifact store names {sorted(reserved)} are reserved")
+        if default_store not in (*self.builtin_stores, *self.artifact_stores):
+            raise ValueError(f"There is no artifact store {default_store}")
+        self.default_store = default_store
+        self._scopes: ContextVar[Tuple[_Repositories, ...]] = ContextVar(f"uow_{id(self)}", default=())
+
+
+    def _current(self) -> _Repositories:
+        scopes = self._scopes.get()
+        if not scopes:
+            raise RuntimeError("Repositories are available only inside `with uow:` block")
+        return scopes[-1]
+
+
+    @property
+    def session(self) -> ClientSession:
+        return self._current().session
+
+
+    @property
+    def experiments(self) -> ExperimentsRepository:
+        return self._current().experiments
+
+
+    @property
+    def models(self) -> ModelsRepository:
+        return self._current().models
+
+
+    @property
+    def counters(self) -> CountersRepository:
+        return self._current().counters
 
-    def __enter__(self):
-        self.session = self.client.start_session()
 
-        self.experiments = ExperimentsRepository(session=self.session)
-        self.models = ModelsRepository(session=self.session)
-        self.gridfs = GridFSRepository(session=self.session)
+    @property
+    def tag_facets(self) -> TagFacetsRepository:
+        return self._current().tag_facets
+
+
+    @property
+    def tombstones(self) -> TombstonesRepository:
+        return self._current().tombstones
+
+
+    @property
+    def gridfs(self) -> GridFSRepository:
+        return self._current().gridfs
+
+
+    @property
+    def dedup(self) -> DedupRepository:
+        return self._current().dedup
+
+
+    @property
+    def cold(self) -> ColdRepository:
+        return self._current().cold
+
+
+    def store(self, name: str) -> ArtifactStore:
+        """Artifact store by the name recorded in `SerializedModelEntity.storage`."""
+        stores = self._current().stores
+        if name in stores:
+            return stores[name]
+        if name in self.artifact_stores:
+            return self.artifact_stores[name]
+        raise KeyError(f"There is no artifact store {name}")
+
+
+    def __enter__(self):
+        self._scopes.set((*self._scopes.get(), _Repositories(self.client.start_session())))
         return self
 
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is not None:
-            raise exc_val
-        else:
-            self.session.end_session()
+        *scopes, current = self._scopes.get()
+        self._scopes.set(tuple(scopes))
+        current.session.end_session()
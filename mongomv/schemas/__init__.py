@@ -1,2 +1,21 @@
 from .enums import Collections, FindBy, Instance, UpdateExperiment, UpdateModel, UpdateModelBase
-from .models import ExperimentEntity, MetaEntity, ModelEntity, ModelMetrics, ModelParams
+from .models import (
+    ChunkRef,
+    DeleteReport,
+    ExperimentEntity,
+    GCReport,
+    Lineage,
+    LineageNode,
+    ManifestEntry,
+    MetaEntity,
+    ModelEntity,
+    ModelMetrics,
+    ModelParams,
+    ModelParent,
+    ModelSearchResult,
+    RetentionPolicy,
+    RetentionReport,
+    SerializedModelEntity,
+    UploadStats,
+)
+from .query import Condition, Q, Query, as_query
@@ -1,11 +1,15 @@
-from datetime import datetime
+import mmap
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime, timedelta
 from pathlib import Path, PosixPath
-from typing import Any, List, Optional, TypeVar
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, TypeVar
 
 from bson import ObjectId
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
+from pymongo.errors import DuplicateKeyError
 
-from mongomv.utils import not_none_return
+from mongomv.utils import MissingIdsError, RevisionConflictError, merge_updates, not_none_return
 
 from .enums import Collections
 
@@ -21,6 +25,106 @@ class MetaEntity(BaseModel):
     name: str
     tags: list[str] = Field(default_factory=list)
     date: datetime = Field(default_factory=datetime.now, frozen=True)
+    rev: int = 0
+
+    _deferred: bool = PrivateAttr(default=False)
+    _changes: List[Dict] = PrivateAttr(default_factory=list)
+    _snapshot: Optional[Dict] = PrivateAttr(default=None)
+
+
+    def _update(self, update: str, value: Any, immediate: bool = False) -> int:
+        """Update document now, or record the change until `save` in deferred mode."""
+        if self._deferred and not immediate:
+            if not self._changes:
+                self._snapshot = self._fields()
+            self._changes.append({update: value})
+            return 1
+        result = self.service.update(
+            instance=self.collection.name,
+            obj_id=self.id,
+            update=update,
+            value=value
+        )
+        if result == 1:
+            self.rev += 1
+        return result
+
+
+    def _fields(self) -> Dict[str, Any]:
+        """Copy of fields, which mutators change locally."""
+        return {
+            name: deepcopy(getattr(self, name))
+            for name, field in type(self).model_fields.items()
+            if not field.frozen and name not in ("service", "collection", "rev")
+        }
+
+
+    def _discard(self) -> None:
+        """Drop recorded changes and restore fields changed by them."""
+        if self._snapshot is not None:
+            for name, value in self._snapshot.items():
+                setattr(self, name, value)
+        self._changes = []
+        self._snapshot = None
+
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._changes)
+
+
+    @contextmanager
+    def deferred(self) -> Iterator["MetaEntity"]:
+        """Record changes of mutators and save them with one round trip on exit.
+
+        Changes are discarded and fields are restored if an exception
+        is raised inside the block.
+
+        Example:
+        >>> with model.deferred():
+        ...     model.rename("new_name")
+        ...     model.add_tag(["prod"])
+        ...     for el in params:
+        ...         model.add_param(el)
+        """
+        self._deferred = True
+        try:
+            yield self
+        except BaseException:
+            self._discard()
+            raise
+        finally:
+            self._deferred = False
+        self.save()
+
+
+    @not_none_return
+    def save(self) -> Optional[str]:
+        """Save recorded changes.
+
+        Changes are compiled into one update document, or into an ordered
+        `bulk_write` if they conflict (e.g. a param is pushed and pulled).
+        Raises `RevisionConflictError` if the document was changed
+        by another writer since the entity was read, in this case nothing
+        is saved, changes are discarded and fields are restored,
+        so the entity should be read again to retry.
+        """
+        if not self._changes:
+            return "Nothing to save"
+        count = len(self._changes)
+        try:
+            self.rev = self.service.save(
+                instance=self.collection.name,
+                obj_id=self.id,
+                rev=self.rev,
+                updates=merge_updates(self._changes)
+            )
+        except RevisionConflictError:
+            self._discard()
+            raise
+        self._changes = []
+        self._snapshot = None
+        return f"Model successfully saved, changes: {count}"
 
 
     @not_none_return
@@ -29,9 +133,7 @@ class MetaEntity(BaseModel):
             if not isinstance(el, str):
                 raise TypeError(f"Tags must be `list[str]`, not `list[{type(el)}]`")
 
-        result = self.service.update(
-            instance=self.collection.name,
-            obj_id=self.id,
+        result = self._update(
             update="$addToSet",
             value={"tags": {"$each": tags}}
         )
@@ -45,9 +147,7 @@ class MetaEntity(BaseModel):
         for el in tags:
             if not isinstance(el, str):
                 raise TypeError(f"Tags must be `list[str]`, not `list[{type(el)}]`")
-        result = self.service.update(
-            instance=self.collection.name,
-            obj_id=self.id,
+        result = self._update(
             update="$pull",
             value={"tags": {"$in": tags}}
         )
@@ -58,9 +158,7 @@ class MetaEntity(BaseModel):
 
     @not_none_return
     def rename(self, new_name: str) -> Optional[str]:
-        result = self.service.update(
-            instance=self.collection.name,
-            obj_id=self.id,
+        result = self._update(
             update="$set",
             value={"name": new_name}
         )
@@ -87,6 +185,140 @@ class ModelMetrics(BaseModel):
     value: Any
 
 
+class ManifestEntry(BaseModel):
+    path: str
+    size: int
+    offset: int
+    sha256: str
+
+
+class ChunkRef(BaseModel):
+    hash: str
+    length: int
+
+
+class UploadStats(BaseModel):
+    total_bytes: int
+    uploaded_bytes: int
+    total_chunks: int
+    uploaded_chunks: int
+    seconds: float
+
+
+class ModelSearchResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    id: ObjectId = Field(alias="_id")
+    name: str
+    version: Optional[int] = None
+    tags: List[str] = Field(default_factory=list)
+    description: Optional[str] = None
+    score: Optional[float] = None
+
+
+class ModelParent(BaseModel):
+    """Link to a model, which this model is derived from.
+
+    `artifact_id` is the serialized model of the parent at the moment
+    of linking, so provenance survives a new dump of the parent.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True, protected_namespaces=())
+
+    model_id: ObjectId
+    relation: str = "derived"
+    artifact_id: Optional[ObjectId] = None
+
+
+class LineageNode(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    id: ObjectId = Field(alias="_id")
+    name: str
+    version: Optional[int] = None
+    tags: List[str] = Field(default_factory=list)
+    aliases: List[str] = Field(default_factory=list)
+    parents: List[ModelParent] = Field(default_factory=list)
+    artifact_id: Optional[ObjectId] = None
+    depth: int = 0
+
+
+class Lineage(BaseModel):
+    """Projected lineage graph of a model, look `ModelEntity.ancestors`.
+
+    `nodes` start with the model itself (depth 0) and are sorted by depth.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    direction: Literal["ancestors", "descendants"]
+    nodes: List[LineageNode]
+
+
+    @property
+    def root(self) -> LineageNode:
+        return self.nodes[0]
+
+
+    @property
+    def edges(self) -> List[Tuple[ObjectId, ObjectId, str]]:
+        """Return `(parent id, child id, relation)` of links between nodes."""
+        ids = {el.id for el in self.nodes}
+        return [(p.model_id, el.id, p.relation) for el in self.nodes for p in el.parents if p.model_id in ids]
+
+
+class GCReport(BaseModel):
+    dry_run: bool
+    files: int
+    orphaned_chunks: int
+    dedup_chunks: int
+    cold_artifacts: int
+    reclaimed_bytes: int
+
+
+class RetentionPolicy(BaseModel):
+    """Declarative retention of serialized models, look `MongoMVClient.apply_retention`.
+
+    Artifacts of models tagged with any of `keep_tags` or having an alias
+    (if `keep_aliased`) are always kept. Other artifacts expire if they are
+    not among the last `keep_last` versions of their model name and
+    were uploaded more than `expire_after` ago (either rule might be unset).
+    Kept artifacts uploaded more than `cold_after` ago are moved to the
+    compressed `cold` store. `query` limits the policy to matching models.
+    """
+
+    keep_last: Optional[int] = Field(default=None, ge=0)
+    keep_tags: List[str] = Field(default_factory=lambda: ["production"])
+    keep_aliased: bool = True
+    expire_after: Optional[timedelta] = None
+    cold_after: Optional[timedelta] = None
+    delete_models: bool = False
+    query: Dict[str, Any] = Field(default_factory=dict)
+
+
+    @model_validator(mode="after")
+    def _has_rules(self):
+        if self.keep_last is None and self.expire_after is None and self.cold_after is None:
+            raise ValueError("Policy must set `keep_last`, `expire_after` or `cold_after`")
+        return self
+
+
+class RetentionReport(BaseModel):
+    dry_run: bool
+    expired: int = 0
+    expired_bytes: int = 0
+    models_deleted: int = 0
+    tiered: int = 0
+    tiered_bytes: int = 0
+    cold_bytes: int = 0
+
+
+class DeleteReport(BaseModel):
+    models: int = 0
+    artifacts: int = 0
+    experiments_updated: int = 0
+    experiments_deleted: int = 0
+    unlinked_models: int = 0
+
+
 class SerializedModelEntity(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -97,6 +329,13 @@ class SerializedModelEntity(BaseModel):
     chunkSize: int = Field(default=261120, frozen=True)
     length: Optional[int] = None
     uploadDate: datetime = Field(default_factory=datetime.now, frozen=True)
+    manifest: Optional[List[ManifestEntry]] = None
+    storage: str = "gridfs"
+    chunks: Optional[List[ChunkRef]] = None
+    stats: Optional[UploadStats] = None
+    sha256: Optional[str] = None
+    frame_size: Optional[int] = None
+    compressed_length: Optional[int] = None
 
 
 class ModelEntity(MetaEntity):
@@ -107,13 +346,14 @@ class ModelEntity(MetaEntity):
     description: Optional[str] = None
     experiment_id: Optional[ObjectId] = None
     serialized_model: Optional[SerializedModelEntity] = None
+    version: Optional[int] = None
+    aliases: List[str] = Field(default_factory=list)
+    parents: List[ModelParent] = Field(default_factory=list)
 
 
     @not_none_return
     def _set_experiment_id(self, experiment_id: ObjectId | None) -> Optional[bool]:
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$set",
             value={"experiment_id": experiment_id}
         )
@@ -126,9 +366,7 @@ class ModelEntity(MetaEntity):
     def add_param(self, params: ModelParams) -> Optional[str]:
         assert type(params) == ModelParams, "params must be `ModelParams` type"
 
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$push",
             value={"params": params.model_dump()}
         )
@@ -146,9 +384,7 @@ class ModelEntity(MetaEntity):
         if index is None:
             raise KeyError(f"There is no parameter with {param_name} name.")
 
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$pull",
             value={"params": {"parameter": {"$in": [param_name]}}}
         )
@@ -161,9 +397,7 @@ class ModelEntity(MetaEntity):
     def add_metric(self, metrics: ModelMetrics):
         assert type(metrics) == ModelMetrics, "metrics must be `ModelMetrics` type"
 
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$push",
             value={"metrics": metrics.model_dump()}
         )
@@ -181,9 +415,7 @@ class ModelEntity(MetaEntity):
         if index is None:
             raise KeyError(f"There is no parameter with {metric_name} name.")
 
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$pull",
             value={"metrics": {"metric": {"$in": [metric_name]}}}
         )
@@ -194,9 +426,7 @@ class ModelEntity(MetaEntity):
 
     @not_none_return
     def set_description(self, description: str):
-        result = self.service.update(
-            instance="models",
-            obj_id=self.id,
+        result = self._update(
             update="$set",
             value={"description": description}
         )
@@ -206,15 +436,179 @@ class ModelEntity(MetaEntity):
 
 
     @not_none_return
-    def dump_model(self, model_path, filename) -> str:
-        """Dump model to MongoDB file storage using GridFS.
+    def rename(self, new_name: str) -> Optional[str]:
+        """Move the model to another name as its next version.
+
+        Aliases belong to versions of the old name and are removed.
+        In journal mode versions are assigned at replay only, so the renamed model has no version.
+        """
+        if new_name == self.name:
+            return f"Model successfully updated, new name: {new_name}"
+        version = self.service.next_version(new_name)
+        result = self._update(
+            update="$set",
+            value={"name": new_name, "version": version, "aliases": []}
+        )
+        if result == 1:
+            self.name, self.version, self.aliases = new_name, version, []
+            return f"Model successfully updated, new name: {new_name}, version: {version}"
+
+
+    @not_none_return
+    def set_alias(self, alias: str, retries: int = 5) -> Optional[str]:
+        """Move alias (e.g. `production`, `staging`) to this model version.
+
+        Alias is removed from other versions with the same name,
+        so `client.get_model(name, version=alias)` resolves to this model.
+        The unique `name_aliases` index keeps an alias on a single version,
+        concurrent calls are retried and the last one wins.
+        """
+        if not isinstance(alias, str) or alias == "latest":
+            raise ValueError("Alias must be `str` and must not be `latest`")
+
+        for attempt in range(retries):
+            self.service.update_many(
+                instance="models",
+                query={"name": self.name, "aliases": alias, "_id": {"$ne": self.id}},
+                update="$pull",
+                value={"aliases": alias}
+            )
+            try:
+                self._update(
+                    update="$addToSet",
+                    value={"aliases": alias},
+                    immediate=True
+                )
+                break
+            except DuplicateKeyError:
+                # another version got the alias between the two updates
+                if attempt == retries - 1:
+                    raise
+        if alias not in self.aliases:
+            self.aliases.append(alias)
+        if self._snapshot is not None and alias not in self._snapshot["aliases"]:
+            # the alias is already saved, keep it if deferred changes are discarded
+            self._snapshot["aliases"].append(alias)
+        return f"Alias {alias} successfully set to version {self.version}"
+
+
+    @not_none_return
+    def remove_alias(self, alias: str) -> Optional[str]:
+        if alias not in self.aliases:
+            raise KeyError(f"There is no alias {alias}")
+
+        result = self._update(
+            update="$pull",
+            value={"aliases": alias}
+        )
+        if result == 1:
+            self.aliases.remove(alias)
+            return f"Alias {alias} successfully removed"
+
+
+    @not_none_return
+    def add_parent(self, model: "ModelEntity", relation: str = "derived") -> Optional[str]:
+        """Link a model, which this one is derived from, e.g. `fine-tuned` or `distilled`.
+
+        The current serialized model of the parent is recorded as provenance.
+        A link, which would make a cycle, raises `ValueError`.
+        """
+        assert isinstance(model, ModelEntity)
+        if any(el.model_id == model.id for el in self.parents):
+            raise ValueError(f"Model {model.id} is already a parent")
+        if model.id == self.id or model.id in {el.id for el in self.descendants().nodes}:
+            raise ValueError(f"Model {model.id} is derived from this model")
+
+        parent = ModelParent(
+            model_id=model.id,
+            relation=relation,
+            artifact_id=model.serialized_model.id if model.serialized_model is not None else None
+        )
+        result = self._update(
+            update="$push",
+            value={"parents": parent.model_dump()}
+        )
+        if result == 1:
+            self.parents.append(parent)
+            return f"Model {model.name} successfully added to parents"
+
+
+    @not_none_return
+    def remove_parent(self, model_id: ObjectId) -> Optional[str]:
+        if all(el.model_id != model_id for el in self.parents):
+            raise KeyError(f"There is no parent {model_id}")
+
+        result = self._update(
+            update="$pull",
+            value={"parents": {"model_id": model_id}}
+        )
+        if result == 1:
+            self.parents = [el for el in self.parents if el.model_id != model_id]
+            return "Parent successfully removed"
+
+
+    def _lineage(self, direction: Literal["ancestors", "descendants"], depth: Optional[int]) -> Lineage:
+        if depth is not None and depth < 1:
+            raise ValueError("Depth must be positive or `None` (unlimited)")
+        doc = self.service.lineage(obj_id=self.id, direction=direction, depth=depth)
+        if doc is None:
+            raise KeyError(f"There is no model with id {self.id}")
+        nodes = sorted(doc.pop("lineage"), key=lambda el: el["depth"])
+        return Lineage(direction=direction, nodes=[doc, *nodes])
+
+
+    def ancestors(self, depth: Optional[int] = None) -> Lineage:
+        """Return models, which this model is derived from, up to `depth` links away.
+
+        The graph is traversed by MongoDB with one `$graphLookup` aggregation.
+        Example:
+        >>> lineage = md.ancestors(depth=2)
+        >>> [(el.name, el.version, el.depth) for el in lineage.nodes]
+        >>> lineage.edges
+        ... [(ObjectId('...'), ObjectId('...'), 'fine-tuned')]
+        """
+        return self._lineage("ancestors", depth)
+
+
+    def descendants(self, depth: Optional[int] = None) -> Lineage:
+        """Return models derived from this model, up to `depth` links away, look `ancestors`."""
+        return self._lineage("descendants", depth)
+
+
+    @not_none_return
+    def dump_model(self,
+                   model_path,
+                   filename,
+                   dedup: bool = False,
+                   sha256: Optional[str] = None,
+                   store: Optional[str] = None) -> str:
+        """Dump model to an artifact store, GridFS by default.
 
         Requires serialized model path and filename.
+        Model path might be a directory (TensorFlow SavedModel,
+        HuggingFace checkpoint, sharded safetensors): it is streamed
+        into the store as a single tar archive, and a manifest of packed files
+        is stored in `serialized_model.manifest`.
+        If `dedup` is `True`, model is split with content-defined chunking
+        and only chunks, which are not stored yet, are uploaded:
+        successive checkpoints share most of their chunks.
+        Upload stats are stored in `serialized_model.stats`.
+        GridFS uploads are resumable: if an upload was interrupted,
+        calling `dump_model` again continues from the last committed chunk
+        (when already uploaded bytes are unchanged). `serialized_model`
+        is set only when the upload is complete.
+        Name of the store is recorded in `serialized_model.storage`.
+        In journal mode pending writes are replayed first (the model document must exist).
         Return `str`: "Model successfully serialized"
 
         :param:
             - model_path: might be `Path` or `str` type
             - filename: str
+            - dedup: bool, default value is `False`, same as `store="dedup"`
+            - sha256: Optional digest of model path (look `mongomv.utils.path_digest`),
+                      stored to skip unchanged uploads and downloads
+            - store: Optional name of an artifact store registered
+                     in the client (look `MongoMVClient`), default is the client `default_store`
 
         Keras example:
         >>> filename = "cv_v01.keras"
@@ -231,53 +625,174 @@ class ModelEntity(MetaEntity):
         assert type(model_path) == PosixPath, "File path must be `pathlib.Path` or `str` type"
         assert model_path.exists(), "File does not exist"
         assert self.serialized_model is None, "There is serialized model, please delete this one"
+        if dedup and store not in (None, "dedup"):
+            raise ValueError("`dedup` might be set only with `dedup` store")
 
-        self.serialized_model = SerializedModelEntity(
+        serialized = SerializedModelEntity(
             entity_id=self.id,
             serialized_model_path=model_path.as_posix(),
-            filename=filename
+            filename=filename,
+            storage="dedup" if dedup else store or self.service.uow.default_store,
+            sha256=sha256
         )
+        self.service.flush()
         with self.service.uow as uow:
-            if uow.gridfs.put(model_path, self.serialized_model.model_dump(by_alias=True)):
-                mod_count = uow.models.update_by_object_id(
-                    obj_id=self.id,
-                    update_query={
-                        "$set": {
-                            "serialized_model": self.serialized_model.model_dump(by_alias=True)
-                        }
-                    }
-                )
-                if mod_count == 1:
-                    return "Model successfully serialized"
+            data = serialized.model_dump(by_alias=True)
+            data.update(uow.store(serialized.storage).put(model_path, data))
+            serialized = SerializedModelEntity(**data)
+            mod_count = uow.models.update_by_object_id(
+                obj_id=self.id,
+                update_query={
+                    "$set": {
+                        "serialized_model": serialized.model_dump(by_alias=True)
+                    },
+                    "$inc": {"rev": 1}
+                }
+            )
+            if mod_count == 1:
+                self.serialized_model = serialized
+                self.rev += 1
+                return "Model successfully serialized"
 
 
     @not_none_return
-    def load_model(self, model_path: Optional[Path | str] = None):
-        """Load model from MongoDB file storage using GridFS.
+    def load_model(self, model_path: Optional[Path | str] = None, files: Optional[List[str]] = None):
+        """Load model from its artifact store.
 
         Requires serialized model id (look `dump_model`)
         and model. If model path not set, then default path is `cwd/tmp/filename`.
+        Directory models are unpacked into `model_path` while streaming;
+        `files` might list manifest paths to fetch only selected files.
+
+        Example:
+        >>> md.load_model(model_path="/tmp/bert", files=["config.json", "tokenizer.json"])
+        ... "Model successfully loaded"
         """
         if self.serialized_model is None:
             raise KeyError("There is no serialized model")
+        manifest = None
+        if files is not None:
+            if self.serialized_model.manifest is None:
+                raise ValueError("`files` might be set only for directory models")
+            entries = {el.path: el for el in self.serialized_model.manifest}
+            missing = set(files) - set(entries)
+            if missing:
+                raise KeyError(f"There are no files {sorted(missing)} in model manifest")
+            manifest = [entries[el].model_dump() for el in files]
+        path = Path(model_path if model_path else self.serialized_model.serialized_model_path)
         with self.service.uow as uow:
-            if uow.gridfs.get(self.serialized_model.id, model_path):
+            is_loaded = uow.store(self.serialized_model.storage).get(
+                self.serialized_model.model_dump(by_alias=True), path, manifest
+            )
+            if is_loaded:
                 self.serialized_model.serialized_model_path = model_path
                 return "Model successfully loaded"
 
 
+    @not_none_return
+    def load_into(self, buffer) -> int:
+        """Load serialized model into a preallocated writable buffer.
+
+        Buffer might be `bytearray`, `memoryview`, `mmap.mmap` or any
+        other writable object supporting the buffer protocol. Chunks are
+        copied straight into it, without a disk round trip.
+        Return number of loaded bytes, raise `ValueError` if buffer is too small.
+
+        Example:
+        >>> buffer = bytearray(md.serialized_model.length)
+        >>> md.load_into(buffer)
+        """
+        if self.serialized_model is None:
+            raise KeyError("There is no serialized model")
+        with self.service.uow as uow:
+            return uow.store(self.serialized_model.storage).get_into(
+                self.serialized_model.model_dump(by_alias=True), buffer
+            )
+
+
+    @not_none_return
+    def load_bytes(self, use_mmap: bool = False) -> bytearray | mmap.mmap:
+        """Load serialized model into memory.
+
+        Return `bytearray`, or an anonymous memory map if `use_mmap` is `True`.
+
+        Example:
+        >>> tokenizer = pickle.loads(md.load_bytes())
+        """
+        if self.serialized_model is None:
+            raise KeyError("There is no serialized model")
+        length = self.serialized_model.length
+        if length is None:
+            with self.service.uow as uow:
+                length = uow.store(self.serialized_model.storage).length(
+                    self.serialized_model.model_dump(by_alias=True)
+                )
+        if use_mmap and length > 0:
+            buffer = mmap.mmap(-1, length)
+        else:
+            buffer = bytearray(length)
+        self.load_into(buffer)
+        return buffer
+
+
+    @not_none_return
+    def open_artifact(self, path: Optional[str] = None, cache_size: int = 16, max_read_ahead: int = 8):
+        """Open serialized model as a seekable read-only binary file object.
+
+        Only chunks, which cover the requested byte range, are fetched,
+        so `seek()` and `read(n)` do not download the whole artifact.
+        For directory models `path` might be set to open a single file
+        from the manifest.
+        Return `mongomv.repository.ArtifactReader`.
+
+        Example:
+        >>> with md.open_artifact() as artifact:
+        ...     header_size = int.from_bytes(artifact.read(8), "little")
+        ...     header = json.loads(artifact.read(header_size))
+        """
+        if self.serialized_model is None:
+            raise KeyError("There is no serialized model")
+        window = {"cache_size": cache_size, "max_read_ahead": max_read_ahead}
+        if path is not None:
+            if self.serialized_model.manifest is None:
+                raise ValueError("`path` might be set only for directory models")
+            entries = {el.path: el for el in self.serialized_model.manifest}
+            if path not in entries:
+                raise KeyError(f"There is no file {path} in model manifest")
+            window.update(offset=entries[path].offset, length=entries[path].size)
+        with self.service.uow as uow:
+            store = uow.store(self.serialized_model.storage)
+            return store.open(self.serialized_model.model_dump(by_alias=True), **window)
+
+
     @not_none_return
     def delete_model(self) -> Optional[str]:
+        """Unset serialized model and delete its artifact.
+
+        The reference is unset only if the document still points to the same
+        artifact, so concurrent calls release the artifact once.
+        """
         assert type(self.serialized_model) == SerializedModelEntity
 
+        self.service.flush()
         with self.service.uow as uow:
-            if uow.gridfs.delete(obj_id=self.serialized_model.id):
-                self.serialized_model = None
-                return "Serialized model successfully deleted from MongoDB file storage"
+            mod_count = uow.models.update_many(
+                query={"_id": self.id, "serialized_model._id": self.serialized_model.id},
+                update_query={"$set": {"serialized_model": None}, "$inc": {"rev": 1}}
+            )
+            if mod_count != 1:
+                raise KeyError("Serialized model was already deleted or replaced, read the model again")
+            serialized, self.serialized_model = self.serialized_model, None
+            self.rev += 1
+            store = uow.store(serialized.storage)
+            if store.delete(serialized.model_dump(by_alias=True)):
+                return "Serialized model successfully deleted from artifact store"
 
 
     def summary(self):
         print(f"Model name:................ {self.name}")
+        print(f"Model version:............. {self.version}")
+        print(f"Model aliases:............. {self.aliases}")
         print(f"Model tags:................ {self.tags}")
         print(f"Model description:......... {self.description}")
         print(f"Model creation date: ...... {self.date}")
@@ -295,9 +810,7 @@ class ExperimentEntity(MetaEntity):
         assert model.experiment_id is None, f"Model is already linked to {model.experiment_id}"
         assert model.service is not None, "There is no service in model"
 
-        result = self.service.update(
-            instance="experiments",
-            obj_id=self.id,
+        result = self._update(
             update="$addToSet",
             value={"models": {"$each": [model.id]}}
         )
@@ -315,9 +828,7 @@ class ExperimentEntity(MetaEntity):
         assert model.experiment_id == self.id, "Model does not linked to experiment"
         assert model.service is not None, "There is not service in model"
 
-        result = self.service.update(
-            instance="experiments",
-            obj_id=self.id,
+        result = self._update(
             update="$pull",
             value={"models": {"$in": [model.id]}}
         )
@@ -326,3 +837,16 @@ class ExperimentEntity(MetaEntity):
                 index = self.models.index(model.id)
                 self.models.pop(index)
                 return f"Model {model.name} successfully removed from experiment"
+
+
+    def get_models(self, strict: bool = True) -> List[Optional[ModelEntity]]:
+        """Get models of the experiment with one `$in` query, in order of `models`.
+
+        Missing models raise `MissingIdsError` or are `None` if `strict` is `False`.
+        """
+        assert self.service is not None, "There is no service in experiment"
+        docs = self.service.read_by_ids(instance="models", obj_ids=self.models)
+        missing = [el for el in self.models if el not in docs]
+        if missing and strict:
+            raise MissingIdsError(missing)
+        return [ModelEntity(service=self.service, **docs[el]) if el in docs else None for el in self.models]
@@ -0,0 +1,347 @@
+import re
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from bson import ObjectId
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+
+Sort = Tuple[str, int]
+
+
+class Condition:
+    """Compiled to a MongoDB filter by `compile`.
+
+    Conditions are combined with `&`, `|` and negated with `~`.
+    Comparisons bind weaker than `&` and `|`, so they must be parenthesized:
+    >>> (Q.name == "bert") & Q.tags.contains("prod")
+    """
+
+    def __init__(self, op: str, path: Optional[str] = None, value: Any = None):
+        self.op = op
+        self.path = path
+        self.value = value
+
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return Condition("$and", value=[self, other])
+
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return Condition("$or", value=[self, other])
+
+
+    def __invert__(self) -> "Condition":
+        return Condition("$nor", value=[self])
+
+
+    def __bool__(self) -> bool:
+        raise TypeError("Conditions are combined with `&`, `|` and `~`, not with `and`, `or` and `not`")
+
+
+    def __repr__(self) -> str:
+        return f"Condition({self.compile()!r})"
+
+
+    def order_by(self, *fields: "str | Field | Sort") -> "Query":
+        return Query(self).order_by(*fields)
+
+
+    def limit(self, limit: int) -> "Query":
+        return Query(self).limit(limit)
+
+
+    def only(self, *fields: "str | Field") -> "Query":
+        return Query(self).only(*fields)
+
+
+    def compile(self, entity: Optional[Type[BaseModel]] = None) -> Dict:
+        """Return MongoDB filter. If `entity` is set, fields and values are validated against its schema."""
+        if self.op in ["$and", "$or", "$nor"]:
+            children = [el.compile(entity) for el in self.value]
+            if self.op == "$and":
+                children = [el for child in children for el in (child["$and"] if list(child) == ["$and"] else [child])]
+                return _merge(children)
+            return {self.op: children}
+
+        path, annotation = _resolve(entity, self.path)
+        if self.op == "$elemMatch":
+            item = _item_type(annotation)
+            item = item if isinstance(item, type) and issubclass(item, BaseModel) else None
+            return {path: {"$elemMatch": self.value.compile(item)}}
+        if self.op in ["$in", "$nin", "$all"]:
+            value = [_validate(annotation, el, path) for el in self.value]
+        elif self.op in ["$exists", "$regex"]:
+            value = self.value
+        else:
+            value = _validate(annotation, self.value, path)
+        if self.op == "$eq":
+            return {path: value}
+        return {path: {self.op: value}}
+
+
+class Field:
+    """Path of a document field, `Q.<name>` creates one, nested fields are attributes.
+
+    Example:
+    >>> Q.version >= 3
+    >>> Q.serialized_model.storage == "gridfs"
+    >>> Q.metrics.matches((Q.metric == "accuracy") & (Q.value > 0.9))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+    def __getattr__(self, name: str) -> "Field":
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Field(f"{self.path}.{name}")
+
+
+    def __eq__(self, value: Any) -> Condition:
+        return Condition("$eq", self.path, value)
+
+
+    def __ne__(self, value: Any) -> Condition:
+        return Condition("$ne", self.path, value)
+
+
+    def __lt__(self, value: Any) -> Condition:
+        return Condition("$lt", self.path, value)
+
+
+    def __le__(self, value: Any) -> Condition:
+        return Condition("$lte", self.path, value)
+
+
+    def __gt__(self, value: Any) -> Condition:
+        return Condition("$gt", self.path, value)
+
+
+    def __ge__(self, value: Any) -> Condition:
+        return Condition("$gte", self.path, value)
+
+
+    __hash__ = None
+
+
+    def between(self, low: Any, high: Any) -> Condition:
+        """`low <= field <= high`."""
+        return (self >= low) & (self <= high)
+
+
+    def is_in(self, values: List[Any]) -> Condition:
+        return Condition("$in", self.path, list(values))
+
+
+    def not_in(self, values: List[Any]) -> Condition:
+        return Condition("$nin", self.path, list(values))
+
+
+    def contains(self, value: Any) -> Condition:
+        """Array field contains `value`."""
+        return Condition("$eq", self.path, value)
+
+
+    def contains_any(self, values: List[Any]) -> Condition:
+        return Condition("$in", self.path, list(values))
+
+
+    def contains_all(self, values: List[Any]) -> Condition:
+        return Condition("$all", self.path, list(values))
+
+
+    def matches(self, condition: Condition) -> Condition:
+        """Some item of an array of subdocuments matches `condition` (fields are relative to the item)."""
+        return Condition("$elemMatch", self.path, condition)
+
+
+    def exists(self, exists: bool = True) -> Condition:
+        return Condition("$exists", self.path, exists)
+
+
+    def startswith(self, prefix: str) -> Condition:
+        """Anchored regex, which might use an index on the field."""
+        return Condition("$regex", self.path, f"^{re.escape(prefix)}")
+
+
+    def asc(self) -> Sort:
+        return (self.path, 1)
+
+
+    def desc(self) -> Sort:
+        return (self.path, -1)
+
+
+class _Root:
+
+    def __getattr__(self, name: str) -> Field:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Field(name)
+
+
+Q = _Root()
+
+
+class Query:
+    """Condition with sort, limit and projection.
+
+    Builder methods return a new query.
+
+    Example:
+    >>> query = (Q.name == "bert") & Q.date.between(start, end)
+    >>> client.find_models(query.order_by(Q.version.desc()).limit(5))
+    >>> client.find("models", Q.tags.contains("prod").only("name", "version"))
+    """
+
+    def __init__(self,
+                 where: Optional[Condition] = None,
+                 sort: Optional[List[Sort]] = None,
+                 limit: int = 0,
+                 projection: Optional[List[str]] = None):
+        self.where = where
+        self.sort = sort
+        self.limit_ = limit
+        self.projection = projection
+
+
+    def _copy(self, **kwargs) -> "Query":
+        params = {"where": self.where, "sort": self.sort, "limit": self.limit_, "projection": self.projection}
+        params.update(kwargs)
+        return Query(**params)
+
+
+    def order_by(self, *fields: "str | Field | Sort") -> "Query":
+        """Fields are `Field`, `(path, direction)` or names, `-name` is descending."""
+        sort = []
+        for el in fields:
+            if isinstance(el, Field):
+                sort.append(el.asc())
+            elif isinstance(el, str):
+                sort.append((el[1:], -1) if el.startswith("-") else (el, 1))
+            else:
+                sort.append(tuple(el))
+        return self._copy(sort=[*(self.sort or []), *sort])
+
+
+    def limit(self, limit: int) -> "Query":
+        return self._copy(limit=limit)
+
+
+    def only(self, *fields: "str | Field") -> "Query":
+        return self._copy(projection=[el.path if isinstance(el, Field) else el for el in fields])
+
+
+    def compile(self, entity: Optional[Type[BaseModel]] = None) -> Dict:
+        """Return `filter`, `sort`, `limit` and `projection` of `find`."""
+        sort = None
+        if self.sort is not None:
+            sort = [(_resolve(entity, path)[0], direction) for path, direction in self.sort]
+        projection = {}
+        if self.projection is not None:
+            projection = {_resolve(entity, el)[0]: 1 for el in self.projection}
+        return {
+            "filter": self.where.compile(entity) if self.where is not None else {},
+            "sort": sort,
+            "limit": self.limit_,
+            "projection": projection
+        }
+
+
+def as_query(query: "Query | Condition | Dict | None") -> Query:
+    """Wrap a condition or a raw MongoDB filter into a `Query`."""
+    if isinstance(query, Query):
+        return query
+    if isinstance(query, Condition):
+        return Query(query)
+    return Query(_Raw(query or {}))
+
+
+class _Raw(Condition):
+    """Raw MongoDB filter, which is not validated."""
+
+    def __init__(self, value: Dict):
+        super().__init__("$raw", value=value)
+
+
+    def compile(self, entity: Optional[Type[BaseModel]] = None) -> Dict:
+        return self.value
+
+
+def _merge(children: List[Dict]) -> Dict:
+    """Merge `$and` children into one filter, keep `$and` if they constrain the same field twice."""
+    result = {}
+    for child in children:
+        for key, value in child.items():
+            if key not in result:
+                result[key] = value
+            elif isinstance(result[key], dict) and isinstance(value, dict) \
+                    and all(el.startswith("$") for el in [*result[key], *value]) \
+                    and not set(result[key]) & set(value):
+                result[key] = {**result[key], **value}
+            else:
+                return {"$and": children}
+    return result
+
+
+def _unwrap(annotation: Any) -> Any:
+    """Strip `Optional` and `Annotated`, keep other unions as they are."""
+    while True:
+        origin = get_origin(annotation)
+        if origin is Annotated:
+            annotation = get_args(annotation)[0]
+        elif origin is Union or type(annotation).__name__ == "UnionType":
+            args = [el for el in get_args(annotation) if el is not type(None)]
+            if len(args) != 1:
+                return annotation
+            annotation = args[0]
+        else:
+            return annotation
+
+
+def _item_type(annotation: Any) -> Any:
+    """Item type of a list annotation, `None` if it is not a list."""
+    if get_origin(annotation) in (list, List):
+        args = get_args(annotation)
+        return _unwrap(args[0]) if args else Any
+    return None
+
+
+def _resolve(entity: Optional[Type[BaseModel]], path: str) -> Tuple[str, Any]:
+    """Map field names to document keys (aliases) and return the annotation of the field."""
+    if entity is None:
+        return ("_id" if path == "id" else path), Any
+    keys, model, annotation = [], entity, Any
+    for name in path.split("."):
+        if model is None:
+            raise ValueError(f"Field {path} of {entity.__name__} has no subfield {name}")
+        fields = {el.alias or key: el for key, el in model.model_fields.items() if not el.exclude}
+        fields.update({key: el for key, el in model.model_fields.items() if not el.exclude})
+        if name not in fields:
+            raise ValueError(f"{entity.__name__} has no field {path}")
+        keys.append(fields[name].alias or name)
+        annotation = _unwrap(fields[name].annotation)
+        nested = _item_type(annotation) or annotation
+        model = nested if isinstance(nested, type) and issubclass(nested, BaseModel) else None
+    return ".".join(keys), annotation
+
+
+@lru_cache(maxsize=256)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation, config=ConfigDict(arbitrary_types_allowed=True))
+
+
+def _validate(annotation: Any, value: Any, path: str) -> Any:
+    """Validate and coerce `value` of a field, an array field might be compared with a single item."""
+    if annotation is Any:
+        return value
+    item = _item_type(annotation)
+    if item is not None and not isinstance(value, list):
+        annotation = item
+    if annotation is ObjectId and isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    try:
+        return _adapter(annotation).validate_python(value)
+    except (ValidationError, TypeError) as exc:
+        raise ValueError(f"Invalid value {value!r} of field {path}: {exc}") from None
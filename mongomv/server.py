@@ -0,0 +1,441 @@
+"""Asyncio HTTP server of serialized models.
+
+Streams artifacts to inference pods, so they do not read GridFS directly:
+
+    GET /models/<model id>
+    GET /models/<name>/<version | alias | latest>
+    GET /models/<name>/<version>/<file path>    # a file of a directory model
+
+`Range` (a single range), `HEAD`, `ETag` with `If-None-Match`
+and `If-Range` are supported. Artifacts are copied once into a bounded
+local LRU cache, concurrent requests for the same artifact wait for the
+same upstream read. Artifacts larger than the cache are streamed
+with a seekable reader, only requested ranges are fetched.
+Artifacts of a `FileSystemStore` are sent straight from the store.
+
+Run with `python -m mongomv.server --uri mongodb://... --port 8080`
+or `mongomv serve`.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from mongomv.client import MongoMVClient
+from mongomv.repository import ArtifactReader, FileArtifactReader, FileSystemStore
+from mongomv.repository.readers import ColdArtifactReader, DedupArtifactReader, GridFSArtifactReader
+from mongomv.repository.repo import ColdRepository, DedupRepository, GridFSRepository
+from mongomv.schemas import ModelEntity
+
+REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: int, message: str = "", headers: Optional[Dict[str, str]] = None):
+        super().__init__(message or REASONS[status])
+        self.status = status
+        self.headers = headers or {}
+
+
+class Artifact(NamedTuple):
+    """Location of a serialized model (or a file of a directory model) in artifact storage."""
+    etag: str
+    length: int
+    filename: str
+    storage: str
+    file_id: ObjectId
+    chunks: Optional[List[Dict]]
+    offset: int
+    path: Optional[Path] = None
+    frames: Optional[Tuple[int, int]] = None
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes` range into inclusive `(start, end)`.
+
+    Return `None` if the header should be ignored (absent, multiple ranges
+    or other units), raise `HTTPError(416)` if the range is not satisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[len("bytes="):].strip().partition("-")
+    if not sep or not (start or end) or not (start or "0").isdigit() or not (end or "0").isdigit():
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise HTTPError(416, headers={"Content-Range": f"bytes */{length}"})
+        return max(0, length - suffix), length - 1
+    first = int(start)
+    last = min(int(end), length - 1) if end else length - 1
+    if first >= length or first > last:
+        raise HTTPError(416, headers={"Content-Range": f"bytes */{length}"})
+    return first, last
+
+
+class ArtifactCache:
+    """Bounded LRU cache of artifacts in a local directory.
+
+    `get` returns an open file of a cached artifact, fetching it once:
+    concurrent calls for the same key wait for the same download.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[Path, int]] = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+    async def get(self, key: str, length: int, fetch) -> BinaryIO:
+        """Return an open file of the cached artifact, the caller closes it.
+
+        The file is opened before `get` returns, so it stays readable
+        if the entry is evicted while it is being sent.
+        """
+        if key in self._pending:
+            self.hits += 1
+            await asyncio.shield(self._pending[key])
+        elif key in self._entries:
+            self.hits += 1
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return open(self._entries[key][0], "rb")
+        if key in self._pending:
+            # a download was started after the entry was evicted
+            return await self.get(key, length, fetch)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        path = self.directory / key
+        try:
+            tmp = path.with_suffix(".part")
+            await asyncio.to_thread(fetch, tmp)
+            tmp.replace(path)
+            file = open(path, "rb")
+            self._entries[key] = (path, length)
+            self.size += length
+            self._evict(keep=key)
+            future.set_result(path)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+        return file
+
+
+    def _evict(self, keep: str) -> None:
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            key, (path, length) = next(iter(self._entries.items()))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self.size -= length
+            # files being sent stay readable after unlink
+            path.unlink(missing_ok=True)
+
+
+class ArtifactServer:
+    """HTTP/1.1 server of serialized models.
+
+    Requires a `MongoMVClient`. Model documents are resolved in a worker
+    thread and kept for `metadata_ttl` seconds, so aliases and `latest`
+    move after at most this delay.
+
+    Example:
+    >>> server = ArtifactServer(MongoMVClient(uri), cache_size=10 * 1024 ** 3)
+    >>> asyncio.run(server.serve_forever(port=8080))
+    """
+
+    def __init__(self,
+                 client: MongoMVClient,
+                 cache_dir: Optional[Path | str] = None,
+                 cache_size: int = 1024 ** 3,
+                 metadata_ttl: float = 5.0,
+                 block_size: int = 1024 * 1024):
+        self.client = client
+        self.cache = ArtifactCache(Path(cache_dir or tempfile.mkdtemp(prefix="mongomv-cache-")), cache_size)
+        self.metadata_ttl = metadata_ttl
+        self.block_size = block_size
+        self._metadata: Dict[Tuple, Tuple[float, Artifact]] = {}
+        mongo = client.crud.uow.client
+        self._root_collection = mongo[GridFSRepository.database][GridFSRepository.collection]
+        self._chunks_collection = mongo[DedupRepository.database][DedupRepository.collection]
+        self._frames_collection = mongo[ColdRepository.database][ColdRepository.collection]
+
+
+    def _find_model(self, parts: List[str]) -> ModelEntity:
+        try:
+            if len(parts) == 1:
+                try:
+                    obj_id = ObjectId(parts[0])
+                except InvalidId:
+                    raise HTTPError(400, f"{parts[0]} is not a model id") from None
+                return ModelEntity(
+                    service=self.client.crud,
+                    **self.client.crud.read(instance="models", find_by={"_id": obj_id})
+                )
+            version = int(parts[1]) if parts[1].isdigit() else parts[1]
+            return self.client.get_model(name=parts[0], version=version)
+        except TypeError:
+            raise HTTPError(404, f"There is no model {'/'.join(parts)}") from None
+
+
+    def _resolve(self, parts: List[str]) -> Artifact:
+        md = self._find_model(parts[:1] if len(parts) == 1 else parts[:2])
+        serialized = md.serialized_model
+        if serialized is None:
+            raise HTTPError(404, f"Model {md.id} has no serialized model")
+        etag = str(serialized.id)
+        offset, length = 0, serialized.length
+        filename = serialized.filename
+        if len(parts) > 2:
+            path = "/".join(parts[2:])
+            entries = {el.path: el for el in serialized.manifest or []}
+            if path not in entries:
+                raise HTTPError(404, f"There is no file {path} in model manifest")
+            offset, length = entries[path].offset, entries[path].size
+            etag = f"{etag}-{entries[path].sha256[:16]}"
+            filename = Path(path).name
+        chunks, path, frames = None, None, None
+        if serialized.storage == "cold":
+            frames = (serialized.length, serialized.frame_size)
+            if length is None:
+                length = serialized.length
+        elif serialized.storage == "dedup":
+            chunks = [el.model_dump() for el in serialized.chunks]
+            if length is None:
+                length = sum(el["length"] for el in chunks)
+        elif serialized.storage != "gridfs":
+            store = self.client.crud.uow.artifact_stores.get(serialized.storage)
+            if not isinstance(store, FileSystemStore):
+                raise HTTPError(500, f"Artifact store {serialized.storage} is not available")
+            path = store.path(serialized.model_dump(by_alias=True))
+            if length is None:
+                length = path.stat().st_size
+        elif length is None:
+            length = self._root_collection.files.find_one({"_id": serialized.id}, projection={"length": 1})["length"]
+        return Artifact(etag, length, filename, serialized.storage, serialized.id, chunks, offset, path, frames)
+
+
+    async def resolve(self, parts: List[str]) -> Artifact:
+        key = tuple(parts)
+        cached = self._metadata.get(key)
+        if cached and time.monotonic() - cached[0] < self.metadata_ttl:
+            return cached[1]
+        artifact = await asyncio.to_thread(self._resolve, parts)
+        self._metadata[key] = (time.monotonic(), artifact)
+        if len(self._metadata) > 10000:
+            self._metadata.clear()
+        return artifact
+
+
+    def open(self, artifact: Artifact) -> ArtifactReader:
+        window = {"offset": artifact.offset, "length": artifact.length}
+        if artifact.path is not None:
+            return FileArtifactReader(artifact.path, **window)
+        if artifact.frames is not None:
+            return ColdArtifactReader(self._frames_collection, artifact.file_id, *artifact.frames, **window)
+        if artifact.storage == "dedup":
+            return DedupArtifactReader(self._chunks_collection, artifact.chunks, **window)
+        return GridFSArtifactReader(self._root_collection, artifact.file_id, **window)
+
+
+    def _fetch(self, artifact: Artifact, path: Path) -> None:
+        with self.open(artifact) as reader, open(path, "wb") as file:
+            shutil.copyfileobj(reader, file, self.block_size)
+
+
+    async def _send_file(self, writer: asyncio.StreamWriter, file: BinaryIO, start: int, count: int) -> None:
+        with file:
+            # zero-copy `os.sendfile` on plain sockets, buffered copy otherwise
+            await asyncio.get_running_loop().sendfile(writer.transport, file, start, count)
+
+
+    async def _send_reader(self, writer: asyncio.StreamWriter, artifact: Artifact, start: int, count: int) -> None:
+        reader = await asyncio.to_thread(self.open, artifact)
+        with reader:
+            reader.seek(start)
+            while count > 0:
+                data = await asyncio.to_thread(reader.read, min(self.block_size, count))
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+                count -= len(data)
+
+
+    async def respond(self, writer: asyncio.StreamWriter, method: str, target: str, headers: Dict[str, str]) -> None:
+        if method not in ["GET", "HEAD"]:
+            raise HTTPError(405)
+        url = urlsplit(target)
+        parts = [unquote(el) for el in url.path.split("/") if el]
+        if url.path == "/healthz":
+            await self._write_head(writer, 200, {"Content-Length": "2"})
+            if method == "GET":
+                writer.write(b"ok")
+            return
+        if len(parts) < 2 or parts[0] != "models":
+            raise HTTPError(404)
+
+        artifact = await self.resolve(parts[1:])
+        etag = f'"{artifact.etag}"'
+        common = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "no-cache",
+            "Content-Disposition": f'attachment; filename="{artifact.filename}"',
+        }
+        if etag in [el.strip() for el in headers.get("if-none-match", "").split(",")]:
+            await self._write_head(writer, 304, common)
+            return
+
+        byte_range = parse_range(headers.get("range"), artifact.length)
+        if byte_range is not None and headers.get("if-range", etag) != etag:
+            byte_range = None
+        if byte_range is None:
+            status, (start, end) = 200, (0, artifact.length - 1)
+        else:
+            status, (start, end) = 206, byte_range
+            common["Content-Range"] = f"bytes {start}-{end}/{artifact.length}"
+        count = max(0, end - start + 1)
+        await self._write_head(
+            writer, status, {**common, "Content-Type": "application/octet-stream", "Content-Length": str(count)}
+        )
+        if method == "HEAD" or count == 0:
+            return
+        if artifact.path is not None:
+            await self._send_file(writer, open(artifact.path, "rb"), artifact.offset + start, count)
+        elif artifact.length <= self.cache.max_bytes:
+            file = await self.cache.get(artifact.etag, artifact.length, lambda tmp: self._fetch(artifact, tmp))
+            await self._send_file(writer, file, start, count)
+        else:
+            await self._send_reader(writer, artifact, start, count)
+
+
+    async def _write_head(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str]) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", *(f"{key}: {value}" for key, value in headers.items())]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    key, sep, value = line.partition(":")
+                    if sep:
+                        headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                try:
+                    await self.respond(writer, method, target, headers)
+                except HTTPError as exc:
+                    body = f"{exc}\n".encode()
+                    await self._write_head(
+                        writer,
+                        exc.status,
+                        {**exc.headers, "Content-Type": "text/plain", "Content-Length": str(len(body))}
+                    )
+                    if method != "HEAD":
+                        writer.write(body)
+                except ConnectionError:
+                    break
+                except Exception as exc:
+                    print(f"Failed {method} {target}: {exc!r}", file=sys.stderr)
+                    break
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+
+    async def start(self, host: str = "0.0.0.0", port: int = 8080) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+    async def serve_forever(self, host: str = "0.0.0.0", port: int = 8080) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="mongomv.server", description="Serve serialized models over HTTP.")
+    parser.add_argument("--uri", default=os.environ.get("MONGOMV_URI"), help="MongoDB URI, default is $MONGOMV_URI")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-dir", help="default is a temporary directory")
+    parser.add_argument("--cache-size", type=int, default=1024, help="cache size in MB")
+    parser.add_argument("--metadata-ttl", type=float, default=5.0, help="seconds to keep resolved model documents")
+    parser.add_argument(
+        "--fs-store", action="append", default=[], metavar="NAME=PATH", help="register a filesystem artifact store"
+    )
+    args = parser.parse_args(argv)
+    if not args.uri:
+        parser.error("`--uri` or MONGOMV_URI is required")
+    stores = {}
+    for el in args.fs_store:
+        name, sep, path = el.partition("=")
+        if not sep or not name or not path:
+            parser.error(f"`--fs-store` must be NAME=PATH, got {el}")
+        stores[name] = FileSystemStore(path)
+    server = ArtifactServer(
+        MongoMVClient(uri=args.uri, artifact_stores=stores),
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size * 1024 * 1024,
+        metadata_ttl=args.metadata_ttl
+    )
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,8 @@
 # from .mongodb_service import PymongoService
 
+from .compare import ComparisonService, ModelComparison
 from .crud import PymongoCRUDService
+from .gc import ArtifactGCService
+from .journal import JournaledCRUDService, WriteJournal
+from .retention import RetentionJob, RetentionService
+from .transfer import RegistryTransferService
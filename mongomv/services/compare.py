@@ -0,0 +1,185 @@
+from typing import Any, Dict, List, Literal, Optional
+
+from bson import ObjectId
+
+from mongomv.repository import UnitOfWork
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _last_value(field: str, key: str, name: str) -> Dict:
+    """Value of the last `field` list item with `key` equal to `name`, `null` if there is no such item."""
+    return {
+        "$arrayElemAt": [
+            {
+                "$map": {
+                    "input": {
+                        "$filter": {"input": {"$ifNull": [f"${field}", []]}, "cond": {"$eq": [f"$$this.{key}", name]}}
+                    },
+                    "in": "$$this.value"
+                }
+            },
+            -1
+        ]
+    }
+
+
+def _column(values: List[Any]) -> "np.ndarray":
+    """Float array if all values are numbers (missing values are `nan`), object array otherwise."""
+    if all(el is None or isinstance(el, (int, float)) for el in values):
+        return np.array([np.nan if el is None else el for el in values], dtype=float)
+    return np.array(values, dtype=object)
+
+
+class ModelComparison:
+    """Columnar view of params and metrics of many models.
+
+    Every column is a NumPy array: `_id`, `name`, `version`,
+    then requested params and metrics by their names.
+    Numeric columns are float arrays, where missing values are `nan`.
+
+    Example:
+    >>> cmp = client.compare({"name": "sweep"}, params=["lr"], metrics=["accuracy", "latency"])
+    >>> cmp["lr"][cmp.rank("accuracy")[:5]]
+    >>> cmp.correlation()
+    >>> cmp.pareto_front({"accuracy": "max", "latency": "min"})
+    """
+
+    def __init__(self, columns: Dict[str, "np.ndarray"], params: List[str], metrics: List[str]):
+        self.columns = columns
+        self.params = params
+        self.metrics = metrics
+
+
+    def __len__(self) -> int:
+        return len(self.columns["_id"])
+
+
+    def __getitem__(self, column: str) -> "np.ndarray":
+        return self.columns[column]
+
+
+    def _numeric(self, column: str) -> "np.ndarray":
+        values = self.columns[column]
+        if values.dtype != float:
+            raise TypeError(f"Column {column} is not numeric")
+        return values
+
+
+    def rank(self, column: str, ascending: bool = False) -> "np.ndarray":
+        """Row indices sorted by `column`, missing values are last."""
+        values = self._numeric(column)
+        return np.argsort(values if ascending else -values, kind="stable")
+
+
+    def correlation(self,
+                    params: Optional[List[str]] = None,
+                    metrics: Optional[List[str]] = None,
+                    method: Literal["pearson", "spearman"] = "pearson") -> Dict[str, Dict[str, float]]:
+        """Correlation of every numeric param with every numeric metric.
+
+        Rows with a missing param or metric are skipped pairwise.
+        Non-numeric params or metrics are left out.
+        """
+        params = [el for el in (params or self.params) if self.columns[el].dtype == float]
+        metrics = [el for el in (metrics or self.metrics) if self.columns[el].dtype == float]
+        result = {}
+        for param in params:
+            result[param] = {}
+            for metric in metrics:
+                x, y = self.columns[param], self.columns[metric]
+                mask = ~(np.isnan(x) | np.isnan(y))
+                x, y = x[mask], y[mask]
+                if method == "spearman":
+                    x, y = x.argsort().argsort().astype(float), y.argsort().argsort().astype(float)
+                if len(x) < 2 or x.std() == 0 or y.std() == 0:
+                    result[param][metric] = float("nan")
+                else:
+                    result[param][metric] = float(np.corrcoef(x, y)[0, 1])
+        return result
+
+
+    def pareto_front(self, objectives: Dict[str, Literal["max", "min"]]) -> "np.ndarray":
+        """Indices of rows, which are not dominated by any other row.
+
+        Requires `objectives` - a column name and a direction for each objective.
+        Rows with missing objectives are left out.
+        """
+        costs = np.column_stack([
+            -self._numeric(column) if direction == "max" else self._numeric(column)
+            for column, direction in objectives.items()
+        ])
+        indices = np.flatnonzero(~np.isnan(costs).any(axis=1))
+        costs = costs[indices]
+        position = 0
+        while position < len(costs):
+            keep = np.any(costs < costs[position], axis=1)
+            keep[position] = True
+            indices, costs = indices[keep], costs[keep]
+            position = int(keep[:position].sum()) + 1
+        return indices
+
+
+    def to_pandas(self):
+        """Return `pandas.DataFrame`, requires pandas."""
+        import pandas as pd
+        return pd.DataFrame({
+            column: values.astype(str) if column == "_id" else values
+            for column, values in self.columns.items()
+        })
+
+
+    def to_arrow(self):
+        """Return `pyarrow.Table`, requires pyarrow."""
+        import pyarrow as pa
+        return pa.table({
+            column: values.astype(str) if column == "_id" else values.tolist() if values.dtype == object else values
+            for column, values in self.columns.items()
+        })
+
+
+class ComparisonService:
+    """Fetch params and metrics of many models with one aggregation.
+
+    Only requested values are projected server side, so documents
+    with hundreds of params cost a few bytes per model on the wire.
+    """
+
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+
+    def compare(self,
+                query: Dict,
+                params: List[str],
+                metrics: List[str],
+                order: Optional[List[ObjectId]] = None) -> ModelComparison:
+        if np is None:
+            raise ImportError("Comparison requires numpy, install it with `pip install numpy`")
+        names = ["_id", "name", "version", *params, *metrics]
+        if len(set(names)) != len(names):
+            raise ValueError("Params and metrics names must be unique and must not be `_id`, `name` or `version`")
+
+        projection = {"_id": 1, "name": 1, "version": 1}
+        projection.update({f"p{i}": _last_value("params", "parameter", el) for i, el in enumerate(params)})
+        projection.update({f"m{i}": _last_value("metrics", "metric", el) for i, el in enumerate(metrics)})
+        keys = list(projection)
+
+        with self.uow:
+            rows = [
+                [el.get(key) for key in keys]
+                for el in self.uow.models.aggregate([{"$match": query}, {"$project": projection}])
+            ]
+        if order is not None:
+            positions = {obj_id: i for i, obj_id in enumerate(order)}
+            rows.sort(key=lambda el: positions[el[0]])
+
+        values = list(zip(*rows, strict=True)) if rows else [() for _ in keys]
+        columns = {
+            name: np.array(column, dtype=object) if name in ["_id", "name"] else _column(list(column))
+            for name, column in zip(names, values, strict=True)
+        }
+        return ModelComparison(columns=columns, params=params, metrics=metrics)
@@ -1,55 +1,98 @@
-from typing import Any, Dict, Literal, Optional
+import warnings
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, List, Literal, Optional
 
 from bson import ObjectId
 from pymongo import MongoClient
 
-from mongomv.repository import UnitOfWork
-from mongomv.utils import not_none_return
+from mongomv.repository import ArtifactStore, UnitOfWork
+from mongomv.utils import RevisionConflictError, UnindexedQueryWarning, not_none_return
 
 Instance = Literal["experiments", "models"]
 
 
 class PymongoCRUDService:
 
-    def __init__(self, mongo_uri: str, **kwargs):
-        self.uow = UnitOfWork(MongoClient(mongo_uri, **kwargs))
+    def __init__(self,
+                 mongo_uri: str,
+                 materialize_facets: bool = False,
+                 artifact_stores: Optional[Dict[str, ArtifactStore]] = None,
+                 default_store: str = "gridfs",
+                 **kwargs):
+        self.uow = UnitOfWork(
+            MongoClient(mongo_uri, **kwargs),
+            artifact_stores=artifact_stores,
+            default_store=default_store
+        )
+        self.materialize_facets = materialize_facets
 
 
     @not_none_return
     def create(self, instance: Instance, data: Dict) -> bool:
         if instance == "experiments":
             with self.uow:
-                return self.uow.experiments.save_one(data)
+                result = self.uow.experiments.save_one(data)
         elif instance == "models":
             with self.uow:
-                return self.uow.models.save_one(data)
+                result = self.uow.models.save_one(data)
         else:
             raise ValueError("Instance must be `experiments` or `models`")
+        if result and self.materialize_facets:
+            self._increment_tags(instance, Counter(set(data.get("tags", []))))
+        return result
 
 
     @not_none_return
     def read(self,
              instance: Instance,
              find_by: Dict,
-             is_list: bool = False) -> Optional[Dict]:
+             is_list: bool = False,
+             sort: Optional[List] = None,
+             projection: Dict = {},
+             limit: int = 0) -> Optional[Dict]:
         if instance == "experiments":
             if is_list:
                 with self.uow:
-                    return list(self.uow.experiments.get_many(get_by=find_by))
+                    return list(self.uow.experiments.get_many(
+                        get_by=find_by, projection=projection, sort=sort, limit=limit
+                    ))
             else:
                 with self.uow:
-                    return self.uow.experiments.get_one(get_by=find_by)
+                    return self.uow.experiments.get_one(get_by=find_by, projection=projection, sort=sort)
         elif instance == "models":
             if is_list:
                 with self.uow:
-                    return list(self.uow.models.get_many(get_by=find_by))
+                    return list(self.uow.models.get_many(
+                        get_by=find_by, projection=projection, sort=sort, limit=limit
+                    ))
             else:
                 with self.uow:
-                    return self.uow.models.get_one(get_by=find_by)
+                    return self.uow.models.get_one(get_by=find_by, projection=projection, sort=sort)
         else:
             raise ValueError("Instance must be `experiments` or `models`")
 
 
+    def find(self,
+             instance: Instance,
+             query: Dict,
+             sort: Optional[List] = None,
+             projection: Dict = {},
+             limit: int = 0) -> List[Dict]:
+        """Return list of documents, warn with `UnindexedQueryWarning` if query can not use any index."""
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        with self.uow:
+            repository = self.uow.experiments if instance == "experiments" else self.uow.models
+            if not repository.uses_index(query, sort):
+                warnings.warn(
+                    f"Query {query} on {instance} can not use any index and scans the whole collection",
+                    UnindexedQueryWarning,
+                    stacklevel=3
+                )
+            return list(repository.get_many(get_by=query, projection=projection, sort=sort, limit=limit))
+
+
     @not_none_return
     def update(self,
                instance: Instance,
@@ -60,18 +103,247 @@ class PymongoCRUDService:
         if update not in ["$set", "$push", "$pull", "$addToSet"]:
             raise ValueError(f"Update must be `$set`, `$addToSet`, `$push` or `$pull`, not {update}")
 
+        if self.materialize_facets and update in ["$pull", "$addToSet"] and "tags" in value:
+            return self._update_tags(instance=instance, obj_id=obj_id, update=update, value=value)
+
         if instance == "experiments":
             with self.uow:
-                return self.uow.experiments.update_by_object_id(obj_id=obj_id, update_query={update: value})
+                return self.uow.experiments.update_by_object_id(
+                    obj_id=obj_id, update_query={update: value, "$inc": {"rev": 1}}
+                )
         elif instance == "models":
             with self.uow:
-                return self.uow.models.update_by_object_id(obj_id=obj_id, update_query={update: value})
+                return self.uow.models.update_by_object_id(
+                    obj_id=obj_id, update_query={update: value, "$inc": {"rev": 1}}
+                )
         else:
             raise ValueError("Instance must be `experiments` or `models`")
 
 
+    @not_none_return
+    def update_many(self,
+                    instance: Instance,
+                    query: Dict,
+                    update: Literal["$set", "$push", "$pull", "$addToSet"],
+                    value: Any) -> Optional[int]:
+
+        if update not in ["$set", "$push", "$pull", "$addToSet"]:
+            raise ValueError(f"Update must be `$set`, `$addToSet`, `$push` or `$pull`, not {update}")
+
+        if instance == "experiments":
+            with self.uow:
+                return self.uow.experiments.update_many(
+                    query=query, update_query={update: value, "$inc": {"rev": 1}}
+                )
+        elif instance == "models":
+            with self.uow:
+                return self.uow.models.update_many(
+                    query=query, update_query={update: value, "$inc": {"rev": 1}}
+                )
+        else:
+            raise ValueError("Instance must be `experiments` or `models`")
+
+
+    def save(self, instance: Instance, obj_id: ObjectId, rev: int, updates: List[Dict]) -> int:
+        """Apply compiled changes of an entity at revision `rev`, return its new revision."""
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        facets = self.materialize_facets and any("tags" in el for update in updates for el in update.values())
+        with self.uow:
+            repository = self.uow.experiments if instance == "experiments" else self.uow.models
+            if facets:
+                before = repository.get_one(get_by={"_id": obj_id}, projection={"tags": 1}) or {}
+            matched = repository.update_with_revision(obj_id=obj_id, rev=rev, update_queries=updates)
+            if matched != len(updates):
+                raise RevisionConflictError(f"Document {obj_id} was changed since revision {rev}, read it again")
+            if facets:
+                after = repository.get_one(get_by={"_id": obj_id}, projection={"tags": 1})
+                changed = Counter(set(after.get("tags", [])))
+                changed.subtract(set(before.get("tags", [])))
+                self.uow.tag_facets.increment(instance, {tag: count for tag, count in changed.items() if count})
+        return rev + len(updates)
+
+
+    def delete_models(self, query: Dict, batch_size: int = 1000) -> Dict[str, int]:
+        """Delete models matching `query` with their serialized models.
+
+        Every batch costs a few round trips: `$in` deletes of GridFS
+        files and chunks, one bulk release of deduplicated chunks
+        (other artifact stores delete their files one by one),
+        one `update_many` unlinking models from experiments
+        and one `delete_many` of model documents.
+        """
+        counts = {"models": 0, "artifacts": 0, "experiments_updated": 0}
+        projection = {
+            "tags": 1,
+            "serialized_model._id": 1,
+            "serialized_model.storage": 1,
+            "serialized_model.chunks": 1
+        }
+        with self.uow:
+            cursor = self.uow.models.get_many(get_by=query, projection=projection)
+            while batch := list(islice(cursor, batch_size)):
+                obj_ids = [el["_id"] for el in batch]
+                artifacts = {}
+                for el in batch:
+                    serialized = el.get("serialized_model")
+                    if not serialized:
+                        continue
+                    artifacts.setdefault(serialized.get("storage", "gridfs"), []).append(serialized)
+                    counts["artifacts"] += 1
+                for storage, serialized in artifacts.items():
+                    self.uow.store(storage).delete_many(serialized)
+                counts["experiments_updated"] += self.uow.experiments.update_many(
+                    query={"models": {"$in": obj_ids}},
+                    update_query={"$pull": {"models": {"$in": obj_ids}}, "$inc": {"rev": 1}}
+                )
+                counts["models"] += self.uow.models.delete_many({"_id": {"$in": obj_ids}})
+                if self.materialize_facets:
+                    tags = Counter(tag for el in batch for tag in set(el.get("tags", [])))
+                    self.uow.tag_facets.increment("models", {tag: -count for tag, count in tags.items()})
+        return counts
+
+
+    def delete_experiment(self, obj_id: ObjectId, cascade: bool = True) -> Dict[str, int]:
+        """Delete experiment. Its models are deleted if `cascade` is `True`, otherwise unlinked."""
+        if cascade:
+            counts = self.delete_models(query={"experiment_id": obj_id})
+        else:
+            with self.uow:
+                unlinked = self.uow.models.update_many(
+                    query={"experiment_id": obj_id},
+                    update_query={"$set": {"experiment_id": None}, "$inc": {"rev": 1}}
+                )
+            counts = {"unlinked_models": unlinked}
+        counts["experiments_deleted"] = self.delete(instance="experiments", obj_id=obj_id)
+        return counts
+
+
+    def read_by_ids(self, instance: Instance, obj_ids: List[ObjectId], chunk_size: int = 1000) -> Dict[ObjectId, Dict]:
+        """Fetch documents with one `$in` query per `chunk_size` unique ids, return found documents by id."""
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        unique = list(dict.fromkeys(obj_ids))
+        result = {}
+        with self.uow:
+            repository = self.uow.experiments if instance == "experiments" else self.uow.models
+            for start in range(0, len(unique), chunk_size):
+                for el in repository.get_many(get_by={"_id": {"$in": unique[start:start + chunk_size]}}):
+                    result[el["_id"]] = el
+        return result
+
+
+    def lineage(self,
+                obj_id: ObjectId,
+                direction: Literal["ancestors", "descendants"],
+                depth: Optional[int] = None) -> Optional[Dict]:
+        """Return the projected model with its ancestors or descendants in `lineage`."""
+        if direction not in ["ancestors", "descendants"]:
+            raise ValueError("Direction must be `ancestors` or `descendants`")
+        with self.uow:
+            return self.uow.models.lineage(obj_id=obj_id, direction=direction, max_depth=depth)
+
+
+    @not_none_return
+    def next_version(self, name: str) -> int:
+        """Atomically assign the next version number for a model name."""
+        with self.uow:
+            return self.uow.counters.next_value(key=f"models:{name}")
+
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Writes are not buffered, look `JournaledCRUDService.flush`."""
+        return True
+
+
+    def ensure_indexes(self) -> None:
+        with self.uow:
+            self.uow.experiments.ensure_indexes()
+            self.uow.models.ensure_indexes()
+            self.uow.tag_facets.ensure_indexes()
+            self.uow.tombstones.ensure_indexes()
+            self.uow.cold.ensure_indexes()
+            self.uow.gridfs.ensure_indexes()
+
+
+    def tag_facets(self, instance: Instance, query: Optional[Dict] = None) -> Dict[str, int]:
+        """Number of documents per tag, sorted by number.
+
+        Without `query` materialized facets are read if they are maintained,
+        otherwise facets are computed with a `$unwind`/`$group` aggregation.
+        """
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        if query is None and self.materialize_facets:
+            with self.uow:
+                return self.uow.tag_facets.get(instance)
+        with self.uow:
+            return self._aggregate_tags(instance, query or {})
+
+
+    def rebuild_tag_facets(self) -> None:
+        """Recompute materialized facets, e.g. after enabling them on an existing registry."""
+        with self.uow:
+            for instance in ["experiments", "models"]:
+                self.uow.tag_facets.replace(instance, self._aggregate_tags(instance, {}))
+
+
+    def _aggregate_tags(self, instance: Instance, query: Dict) -> Dict[str, int]:
+        repository = self.uow.experiments if instance == "experiments" else self.uow.models
+        return {
+            el["_id"]: el["count"]
+            for el in repository.aggregate([
+                {"$match": query},
+                {"$project": {"tags": {"$setUnion": [{"$ifNull": ["$tags", []]}, []]}}},
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ])
+        }
+
+
+    def _increment_tags(self, instance: Instance, tags: Dict[str, int]) -> None:
+        with self.uow:
+            self.uow.tag_facets.increment(instance, tags)
+
+
+    def _update_tags(self,
+                     instance: Instance,
+                     obj_id: ObjectId,
+                     update: Literal["$pull", "$addToSet"],
+                     value: Dict) -> int:
+        """Update tags and facets of exactly those tags, which were added or removed."""
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        with self.uow:
+            repository = self.uow.experiments if instance == "experiments" else self.uow.models
+            before = repository.find_one_and_update(
+                obj_id=obj_id,
+                update_query={update: value, "$inc": {"rev": 1}},
+                projection={"tags": 1}
+            )
+            if before is None:
+                return 0
+            tags = set(before.get("tags", []))
+            if update == "$addToSet":
+                changed = dict.fromkeys(set(value["tags"]["$each"]) - tags, 1)
+            else:
+                changed = dict.fromkeys(set(value["tags"]["$in"]) & tags, -1)
+            self.uow.tag_facets.increment(instance, changed)
+        return 1
+
+
     @not_none_return
     def delete(self, instance: Instance, obj_id: ObjectId) -> Optional[int]:
+        if self.materialize_facets and instance in ["experiments", "models"]:
+            with self.uow:
+                repository = self.uow.experiments if instance == "experiments" else self.uow.models
+                deleted = repository.find_one_and_delete(obj_id=obj_id, projection={"tags": 1})
+                if deleted is None:
+                    return 0
+                self.uow.tag_facets.increment(instance, dict.fromkeys(set(deleted.get("tags", [])), -1))
+            return 1
+
         if instance == "experiments":
             with self.uow:
                 return self.uow.experiments.delete(obj_id=obj_id)
@@ -0,0 +1,91 @@
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from bson import ObjectId
+
+from mongomv.repository import UnitOfWork
+
+
+def _batches(cursor: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    iterator = iter(cursor)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+class ArtifactGCService:
+    """Garbage collector of artifacts, which are not referenced by any model.
+
+    References of all models are merged into temporary collections
+    of the artifacts database, then GridFS files, deduplicated chunks
+    and cold tier frames are anti-joined with them by `$lookup`, server side.
+    Artifacts younger than the grace period are never touched,
+    so uploads in progress survive a sweep.
+    """
+
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+
+    def collect(self,
+                dry_run: bool = False,
+                batch_size: int = 1000,
+                pause: float = 0.1,
+                grace_period: timedelta = timedelta(hours=1)) -> Dict:
+        cutoff = datetime.now(timezone.utc) - grace_period
+        run_id = ObjectId()
+        artifacts_references = f"gc_artifact_references_{run_id}"
+        chunks_references = f"gc_chunk_references_{run_id}"
+        report = {
+            "dry_run": dry_run,
+            "files": 0,
+            "orphaned_chunks": 0,
+            "dedup_chunks": 0,
+            "cold_artifacts": 0,
+            "reclaimed_bytes": 0
+        }
+
+        with self.uow:
+            self.uow.models.merge_artifact_references(
+                database=self.uow.gridfs.database,
+                artifacts_references=artifacts_references,
+                chunks_references=chunks_references
+            )
+            try:
+                for batch in _batches(self.uow.gridfs.orphaned_files(artifacts_references, cutoff), batch_size):
+                    report["files"] += len(batch)
+                    report["reclaimed_bytes"] += sum(el["length"] for el in batch)
+                    if not dry_run:
+                        self.uow.gridfs.delete_many([el["_id"] for el in batch])
+                        time.sleep(pause)
+
+                for batch in _batches(self.uow.gridfs.orphaned_chunks(cutoff), batch_size):
+                    obj_ids = [el["_id"] for el in batch]
+                    report["orphaned_chunks"] += len(obj_ids)
+                    report["reclaimed_bytes"] += self.uow.gridfs.chunks_size(obj_ids)
+                    if not dry_run:
+                        self.uow.gridfs.delete_many(obj_ids)
+                        time.sleep(pause)
+
+                stale_uploads = [el["_id"] for el in self.uow.gridfs.stale_uploads(cutoff)]
+                if stale_uploads and not dry_run:
+                    self.uow.gridfs.delete_uploads(stale_uploads)
+
+                for batch in _batches(self.uow.dedup.orphaned_chunks(chunks_references, cutoff), batch_size):
+                    report["dedup_chunks"] += len(batch)
+                    report["reclaimed_bytes"] += sum(el["length"] for el in batch)
+                    if not dry_run:
+                        self.uow.dedup.delete_many([el["_id"] for el in batch], used_before=cutoff)
+                        time.sleep(pause)
+
+                for batch in _batches(self.uow.cold.orphaned_artifacts(artifacts_references, cutoff), batch_size):
+                    report["cold_artifacts"] += len(batch)
+                    report["reclaimed_bytes"] += sum(el["length"] for el in batch)
+                    if not dry_run:
+                        self.uow.cold.delete_many([el["_id"] for el in batch])
+                        time.sleep(pause)
+            finally:
+                self.uow.gridfs.db.drop_collection(artifacts_references, session=self.uow.session)
+                self.uow.gridfs.db.drop_collection(chunks_references, session=self.uow.session)
+        return report
@@ -0,0 +1,424 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+import uuid
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from bson import ObjectId, decode, encode
+from pymongo import DeleteOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .crud import Instance, PymongoCRUDService
+
+
+class WriteJournal:
+    """Append-only local log of write operations.
+
+    File is a header followed by BSON records, every record gets the next
+    sequence number. `append` returns when its records are on disk:
+    concurrent appends share one `fsync` (group commit), `commit_delay`
+    might hold the fsync a little to batch more records.
+    A torn record at the end (crash while writing) is truncated on open.
+    Sequence number of the last replayed record is kept in `<path>.checkpoint`.
+    A journal is used by a single writer: an exclusive `flock` of `<path>.lock`
+    is held until `close`, opening a locked journal raises `RuntimeError`.
+    """
+
+    def __init__(self, path: Path | str, commit_delay: float = 0.0, compact_size: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.checkpoint_path = Path(f"{path}.checkpoint")
+        self.rejected_path = Path(f"{path}.rejected")
+        self.commit_delay = commit_delay
+        self.compact_size = compact_size
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._changed = threading.Condition()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # compaction replaces the journal file, so a separate file is locked
+        self._lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"Journal {path} is already used by another writer") from None
+        try:
+            if not self.path.exists() or self.path.stat().st_size == 0:
+                self._write_header(uuid.uuid4().hex, first_seq=1)
+            header, records, end = self._scan()
+            self.journal_id = header["journal"]
+            with open(self.path, "r+b") as file:
+                file.truncate(end)
+            self.replayed_seq = int(self.checkpoint_path.read_text()) if self.checkpoint_path.exists() else 0
+            self.replayed_offset = self._header_end
+            for seq, offset in records:
+                if seq <= self.replayed_seq:
+                    self.replayed_offset = offset
+            self._next_seq = records[-1][0] + 1 if records else header["first_seq"]
+            self.replayed_seq = max(self.replayed_seq, header["first_seq"] - 1)
+            self._written = self._synced = end
+            self._file = open(self.path, "ab")
+        except BaseException:
+            os.close(self._lock_fd)
+            raise
+
+
+    def _write_header(self, journal_id: str, first_seq: int) -> None:
+        tmp = Path(f"{self.path}.tmp")
+        with open(tmp, "wb") as file:
+            file.write(encode({"journal": journal_id, "first_seq": first_seq}))
+            file.flush()
+            os.fsync(file.fileno())
+        tmp.replace(self.path)
+
+
+    def _scan(self) -> Tuple[Dict, List[Tuple[int, int]], int]:
+        """Return header, sequence number and end offset of every complete record, end of the last one."""
+        records = []
+        with open(self.path, "rb") as file:
+            data = file.read()
+        (length,) = struct.unpack("<i", data[:4])
+        header = decode(data[:length])
+        self._header_end = offset = length
+        while offset + 4 <= len(data):
+            (length,) = struct.unpack("<i", data[offset:offset + 4])
+            if length < 5 or offset + length > len(data):
+                break
+            offset += length
+            records.append((decode(data[offset - length:offset])["seq"], offset))
+        return header, records, offset
+
+
+    def append(self, records: List[Dict]) -> int:
+        """Append records atomically, return sequence number of the last one after it is synced."""
+        with self._lock:
+            for el in records:
+                el["seq"] = self._next_seq
+                self._next_seq += 1
+            data = b"".join(encode(el) for el in records)
+            self._file.write(data)
+            self._written += len(data)
+            end, last_seq = self._written, self._next_seq - 1
+        self._sync(end)
+        return last_seq
+
+
+    def _sync(self, end: int) -> None:
+        with self._sync_lock:
+            if self._synced >= end:
+                return
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+            with self._lock:
+                self._file.flush()
+                target = self._written
+                fd = self._file.fileno()
+            os.fsync(fd)
+            with self._changed:
+                self._synced = target
+                self._changed.notify_all()
+
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._next_seq - 1
+
+
+    def pending(self, limit: int = 1000) -> List[Tuple[Dict, int]]:
+        """Up to `limit` synced records, which are not replayed yet, with their end offsets."""
+        with self._changed:
+            start, end = self.replayed_offset, self._synced
+        if start >= end:
+            return []
+        result = []
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            offset = start
+            while offset < end and len(result) < limit:
+                (length,) = struct.unpack("<i", file.read(4))
+                file.seek(-4, os.SEEK_CUR)
+                offset += length
+                result.append((decode(file.read(length)), offset))
+        return result
+
+
+    def commit(self, seq: int, offset: int) -> None:
+        """Mark records up to `seq` (ending at `offset`) as replayed."""
+        tmp = Path(f"{self.checkpoint_path}.tmp")
+        tmp.write_text(str(seq))
+        tmp.replace(self.checkpoint_path)
+        with self._changed:
+            self.replayed_seq, self.replayed_offset = seq, offset
+            self._changed.notify_all()
+        if offset >= self.compact_size:
+            self._compact()
+
+
+    def _compact(self) -> None:
+        """Start an empty file if every record is replayed, sequence numbers continue."""
+        with self._sync_lock, self._lock, self._changed:
+            if self.replayed_offset != self._written:
+                return
+            self._file.close()
+            self._write_header(self.journal_id, first_seq=self._next_seq)
+            self._header_end = self._written = self._synced = self.replayed_offset = self.path.stat().st_size
+            self._file = open(self.path, "ab")
+
+
+    def reject(self, record: Dict, error: str) -> None:
+        """Keep a record, which MongoDB refused to apply, in `<path>.rejected`."""
+        with open(self.rejected_path, "ab") as file:
+            file.write(encode({"record": record, "error": error}))
+
+
+    def wait_appended(self, timeout: float) -> None:
+        with self._changed:
+            if self.replayed_offset >= self._synced:
+                self._changed.wait(timeout)
+
+
+    def wait_replayed(self, seq: int, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self.replayed_seq < seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+
+class JournaledCRUDService(PymongoCRUDService):
+    """CRUD service, which appends writes to a local `WriteJournal`.
+
+    `create`, `update`, `update_many`, `save` and `delete` return as soon
+    as the operation is on the local disk; a background thread replays
+    the journal to MongoDB with ordered `bulk_write` batches and retries
+    while MongoDB is unreachable, so unreplayed writes survive restarts.
+    Every record has an operation id (journal id and sequence number):
+    inserts are upserts, updates store the last applied sequence number
+    in `_journal.<journal id>` of the document and skip older ones,
+    so a batch replayed twice after a crash is applied once.
+    Reads go to MongoDB and see journaled writes only after they are
+    replayed (look `flush`). Model versions are assigned at replay.
+    Operations, which MongoDB rejects, are moved to `<journal>.rejected`.
+    """
+
+    def __init__(self,
+                 mongo_uri: str,
+                 journal_path: Path | str,
+                 batch_size: int = 1000,
+                 retry_interval: float = 1.0,
+                 commit_delay: float = 0.0,
+                 materialize_facets: bool = False,
+                 **kwargs):
+        if materialize_facets:
+            raise ValueError("Materialized facets are not supported in journal mode")
+        super().__init__(mongo_uri, **kwargs)
+        self.journal = WriteJournal(journal_path, commit_delay=commit_delay)
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.last_error: Optional[BaseException] = None
+        self._indexes_ensured = False
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._replay_forever, name="mongomv-journal", daemon=True)
+        self._worker.start()
+
+
+    @staticmethod
+    def _check(instance: Instance, update: Optional[str] = None) -> None:
+        if instance not in ["experiments", "models"]:
+            raise ValueError("Instance must be `experiments` or `models`")
+        if update is not None and update not in ["$set", "$push", "$pull", "$addToSet"]:
+            raise ValueError(f"Update must be `$set`, `$addToSet`, `$push` or `$pull`, not {update}")
+
+
+    def create(self, instance: Instance, data: Dict) -> bool:
+        self._check(instance)
+        self.journal.append([{
+            "op": "insert",
+            "instance": instance,
+            "doc": data,
+            "assign_version": instance == "models" and data.get("version") is None
+        }])
+        return True
+
+
+    def update(self,
+               instance: Instance,
+               obj_id: ObjectId,
+               update: Literal["$set", "$push", "$pull", "$addToSet"],
+               value: Any) -> int:
+        self._check(instance, update)
+        self.journal.append([
+            {"op": "update", "instance": instance, "query": {"_id": obj_id}, "update": {update: value}}
+        ])
+        return 1
+
+
+    def update_many(self,
+                    instance: Instance,
+                    query: Dict,
+                    update: Literal["$set", "$push", "$pull", "$addToSet"],
+                    value: Any) -> int:
+        """Journal an update of many documents, number of matched documents is unknown until replay, 0 is returned."""
+        self._check(instance, update)
+        self.journal.append([
+            {"op": "update", "instance": instance, "query": query, "update": {update: value}, "many": True}
+        ])
+        return 0
+
+
+    def save(self, instance: Instance, obj_id: ObjectId, rev: int, updates: List[Dict]) -> int:
+        """Journal changes of an entity. Revision is not checked at replay, the last writer wins."""
+        self._check(instance)
+        self.journal.append([
+            {"op": "update", "instance": instance, "query": {"_id": obj_id}, "update": el} for el in updates
+        ])
+        return rev + len(updates)
+
+
+    def delete(self, instance: Instance, obj_id: ObjectId) -> int:
+        self._check(instance)
+        self.journal.append([{"op": "delete", "instance": instance, "query": {"_id": obj_id}}])
+        return 1
+
+
+    def next_version(self, name: str) -> None:
+        """Versions are assigned when model inserts are replayed."""
+        return None
+
+
+    def ensure_indexes(self) -> None:
+        """Indexes are created by the replay worker, once MongoDB is reachable."""
+
+
+    def delete_models(self, query: Dict, batch_size: int = 1000) -> Dict[str, int]:
+        self.flush()
+        return super().delete_models(query=query, batch_size=batch_size)
+
+
+    def delete_experiment(self, obj_id: ObjectId, cascade: bool = True) -> Dict[str, int]:
+        self.flush()
+        return super().delete_experiment(obj_id=obj_id, cascade=cascade)
+
+
+    def tag_facets(self, instance: Instance, query: Optional[Dict] = None) -> Dict[str, int]:
+        self.flush()
+        return super().tag_facets(instance=instance, query=query)
+
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all journaled writes are replayed, return `False` on timeout.
+
+        Raise the last replay error (or `RuntimeError`) if the replay worker has stopped.
+        """
+        seq = self.journal.last_seq
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.retry_interval if deadline is None else min(self.retry_interval, deadline - time.monotonic())
+            if self.journal.wait_replayed(seq, timeout=max(wait, 0)):
+                return True
+            if not self._worker.is_alive():
+                raise self.last_error or RuntimeError("Journal replay worker is stopped")
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Stop the replay worker after flushing, unreplayed records are replayed on the next start."""
+        try:
+            return self.flush(timeout=timeout)
+        finally:
+            self._stopped.set()
+            self._worker.join()
+            self.journal.close()
+
+
+    def _request(self, record: Dict):
+        touch = {"$currentDate": {"updated_at": True}}
+        if record["op"] == "insert":
+            return UpdateOne({"_id": record["doc"]["_id"]}, {"$setOnInsert": record["doc"], **touch}, upsert=True)
+        if record["op"] == "delete":
+            return DeleteOne(record["query"])
+        guard = f"_journal.{self.journal.journal_id}"
+        query = {**record["query"], guard: {"$not": {"$gte": record["seq"]}}}
+        update = {**record["update"], "$inc": {"rev": 1}, "$max": {guard: record["seq"]}, **touch}
+        return UpdateMany(query, update) if record.get("many") else UpdateOne(query, update)
+
+
+    def _apply(self, records: List[Dict]) -> None:
+        """Apply records in order with one `bulk_write` per run of records of the same collection.
+
+        Raise `BulkWriteError` with `index` of the failed record in `records`,
+        without `index` if only the write concern has failed.
+        """
+        position = 0
+        with self.uow:
+            for instance, run in groupby(records, key=lambda el: el["instance"]):
+                run = list(run)
+                repository = self.uow.experiments if instance == "experiments" else self.uow.models
+                pending = [el["doc"] for el in run if el["op"] == "insert" and el.get("assign_version")]
+                if pending:
+                    ids = [el["_id"] for el in pending]
+                    existing = repository.get_many(get_by={"_id": {"$in": ids}}, projection={"_id": 1})
+                    existing = {el["_id"] for el in existing}
+                    for doc in pending:
+                        if doc["_id"] not in existing:
+                            doc["version"] = self.uow.counters.next_value(key=f"models:{doc['name']}")
+                try:
+                    repository.bulk_write([self._request(el) for el in run], ordered=True)
+                except BulkWriteError as exc:
+                    if exc.details.get("writeErrors"):
+                        exc.details["index"] = position + exc.details["writeErrors"][0]["index"]
+                    raise
+                deleted = [el["query"]["_id"] for el in run if el["op"] == "delete"]
+                if deleted:
+                    self.uow.tombstones.record(instance, deleted)
+                position += len(run)
+
+
+    def _replay(self) -> None:
+        """Replay a batch of pending records, a rejected record is moved to `<journal>.rejected`."""
+        pending = self.journal.pending(self.batch_size)
+        if not pending:
+            self.journal.wait_appended(timeout=self.retry_interval)
+            return
+        records = [el for el, _ in pending]
+        if not self._indexes_ensured:
+            super().ensure_indexes()
+            self._indexes_ensured = True
+        try:
+            self._apply(records)
+        except BulkWriteError as exc:
+            if "index" not in exc.details:
+                raise
+            index = exc.details["index"]
+            self.journal.reject(records[index], str(exc.details["writeErrors"][0].get("errmsg")))
+            self.journal.commit(records[index]["seq"], pending[index][1])
+            return
+        self.last_error = None
+        self.journal.commit(records[-1]["seq"], pending[-1][1])
+
+
+    def _replay_forever(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._replay()
+            except Exception as exc:
+                # unreachable MongoDB, write concern or local disk errors, the batch is retried
+                self.last_error = exc
+                self._stopped.wait(self.retry_interval)
@@ -0,0 +1,206 @@
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from .crud import PymongoCRUDService
+from .gc import _batches
+
+TIERED_STORES = ("gridfs", "dedup")
+
+
+class RetentionService:
+    """Applies retention policies (look `mongomv.schemas.RetentionPolicy`) in batches.
+
+    Models in the scope of a policy are read once in `name`, `version`
+    order (the `name_version` index), so the last versions of every name
+    are counted while streaming. A reference to an expired artifact
+    is removed before the artifact itself, so an interrupted run leaves
+    only orphans for `gc_artifacts`. An artifact moves to the cold tier
+    by streaming its bytes into compressed frames; the model is switched
+    to `cold` only if it still references the same artifact, then the old copy is deleted.
+    """
+
+    def __init__(self, crud: PymongoCRUDService):
+        self.crud = crud
+        self.uow = crud.uow
+
+
+    def _scan(self, policy: Dict, now: datetime) -> Tuple[List[Dict], List[Dict]]:
+        """Return models, whose artifacts expire, and models, whose artifacts move to the cold tier."""
+        expire_before = now - policy["expire_after"] if policy["expire_after"] is not None else None
+        cold_before = now - policy["cold_after"] if policy["cold_after"] is not None else None
+        expiring = policy["keep_last"] is not None or expire_before is not None
+        keep_tags = set(policy["keep_tags"])
+        expired, tiered = [], []
+        name, rank = None, 0
+        with self.uow:
+            cursor = self.uow.models.get_many(
+                get_by=policy["query"],
+                projection={"name": 1, "tags": 1, "aliases": 1, "serialized_model": 1},
+                sort=[("name", 1), ("version", -1)]
+            )
+            for doc in cursor:
+                if doc["name"] != name:
+                    name, rank = doc["name"], 0
+                rank += 1
+                serialized = doc.get("serialized_model")
+                if serialized is None:
+                    continue
+                if keep_tags & set(doc.get("tags", [])) or (policy["keep_aliased"] and doc.get("aliases")):
+                    continue
+                uploaded = serialized["uploadDate"]
+                if expiring \
+                        and (policy["keep_last"] is None or rank > policy["keep_last"]) \
+                        and (expire_before is None or uploaded < expire_before):
+                    expired.append(doc)
+                elif cold_before is not None and uploaded < cold_before and serialized["storage"] in TIERED_STORES:
+                    tiered.append(doc)
+        return expired, tiered
+
+
+    def _length(self, data: Dict) -> int:
+        with self.uow:
+            return self.uow.store(data["storage"]).length(data)
+
+
+    def _guard(self, doc: Dict, policy: Dict) -> Dict:
+        """Filter of a scanned model, which still references the same artifact and is not kept by the policy."""
+        query = {
+            "_id": doc["_id"],
+            "serialized_model._id": doc["serialized_model"]["_id"],
+            "tags": {"$nin": list(policy["keep_tags"])}
+        }
+        if policy["keep_aliased"]:
+            query["aliases.0"] = {"$exists": False}
+        return query
+
+
+    def _expire(self, batch: List[Dict], policy: Dict) -> Tuple[int, int, int]:
+        """Remove artifacts of a batch of models (or models too), return expired models, their bytes and deleted models.
+
+        A model is unlinked from its artifact only if it still matches the policy,
+        so artifacts of models tagged, aliased or dumped again since the scan are kept.
+        """
+        expired, deleted = [], 0
+        with self.uow:
+            for doc in batch:
+                unlinked = self.uow.models.update_many(
+                    query=self._guard(doc, policy),
+                    update_query={"$set": {"serialized_model": None}, "$inc": {"rev": 1}}
+                )
+                if unlinked:
+                    expired.append(doc)
+            artifacts = sorted((el["serialized_model"] for el in expired), key=lambda el: el["storage"])
+            length = sum(self.uow.store(el["storage"]).length(el) for el in artifacts)
+            for storage, items in groupby(artifacts, key=lambda el: el["storage"]):
+                self.uow.store(storage).delete_many(list(items))
+        if policy["delete_models"] and expired:
+            deleted = self.crud.delete_models(
+                query={"_id": {"$in": [el["_id"] for el in expired]}, "serialized_model": None}
+            )["models"]
+        return len(expired), length, deleted
+
+
+    def _move_to_cold(self, doc: Dict) -> Optional[int]:
+        """Compress an artifact into the cold tier, return compressed size, `None` if the model has changed."""
+        data = doc["serialized_model"]
+        with self.uow:
+            source, cold = self.uow.store(data["storage"]), self.uow.store("cold")
+            with source.open(data) as reader:
+                result = cold.put_stream(reader, data)
+            moved = self.uow.models.update_many(
+                query={
+                    "_id": doc["_id"],
+                    "serialized_model._id": data["_id"],
+                    "serialized_model.storage": data["storage"]
+                },
+                update_query={
+                    "$set": {
+                        "serialized_model.storage": "cold",
+                        **{f"serialized_model.{key}": value for key, value in result.items()}
+                    },
+                    "$unset": {"serialized_model.chunks": ""},
+                    "$inc": {"rev": 1}
+                }
+            )
+            if not moved:
+                cold.delete(data)
+                return None
+            source.delete(data)
+        return result["compressed_length"]
+
+
+    def apply(self, policy: Dict, dry_run: bool = False, batch_size: int = 100, pause: float = 0.1) -> Dict:
+        """Expire artifacts, then move old ones to the cold tier, sleeping `pause` seconds between batches."""
+        self.crud.flush()
+        report = {
+            "dry_run": dry_run,
+            "expired": 0,
+            "expired_bytes": 0,
+            "models_deleted": 0,
+            "tiered": 0,
+            "tiered_bytes": 0,
+            "cold_bytes": 0
+        }
+        expired, tiered = self._scan(policy, datetime.now())
+
+        for batch in _batches(expired, batch_size):
+            if dry_run:
+                report["expired"] += len(batch)
+                report["expired_bytes"] += sum(self._length(el["serialized_model"]) for el in batch)
+                continue
+            expired, length, deleted = self._expire(batch, policy)
+            report["expired"] += expired
+            report["expired_bytes"] += length
+            report["models_deleted"] += deleted
+            time.sleep(pause)
+
+        for batch in _batches(tiered, batch_size):
+            for doc in batch:
+                length = self._length(doc["serialized_model"])
+                if dry_run:
+                    report["tiered"] += 1
+                    report["tiered_bytes"] += length
+                    continue
+                compressed = self._move_to_cold(doc)
+                if compressed is not None:
+                    report["tiered"] += 1
+                    report["tiered_bytes"] += length
+                    report["cold_bytes"] += compressed
+            if not dry_run:
+                time.sleep(pause)
+        return report
+
+
+class RetentionJob(threading.Thread):
+    """Daemon thread, which applies a policy every `interval` seconds.
+
+    Errors of a run are kept in `last_error`, the next run starts on schedule.
+    """
+
+    def __init__(self, service: RetentionService, policy: Dict, interval: float, **kwargs):
+        super().__init__(name="mongomv-retention", daemon=True)
+        self.service = service
+        self.policy = policy
+        self.interval = interval
+        self.kwargs = kwargs
+        self.last_report: Optional[Dict] = None
+        self.last_error: Optional[BaseException] = None
+        self._stopped = threading.Event()
+
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.last_report = self.service.apply(self.policy, **self.kwargs)
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = exc
+            self._stopped.wait(self.interval)
+
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self.join(timeout)
@@ -0,0 +1,193 @@
+import os
+import struct
+import threading
+import warnings
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from bson import decode, encode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
+
+from mongomv.repository import UnitOfWork
+from mongomv.repository.repo import (
+    ColdRepository,
+    CountersRepository,
+    DedupRepository,
+    ExperimentsRepository,
+    GridFSRepository,
+    ModelsRepository,
+    TagFacetsRepository,
+)
+
+MAGIC = b"MONGOMV1"
+RAW_CODEC = CodecOptions(document_class=RawBSONDocument)
+
+METADATA_SECTIONS = [
+    (ExperimentsRepository.database_name, ExperimentsRepository.collection),
+    (ModelsRepository.database_name, ModelsRepository.collection),
+    (CountersRepository.database_name, CountersRepository.collection),
+    (TagFacetsRepository.database_name, TagFacetsRepository.collection),
+]
+# `updated_at` of imported documents of these sections is set to the import time
+TRACKED_SECTIONS = [
+    (ExperimentsRepository.database_name, ExperimentsRepository.collection),
+    (ModelsRepository.database_name, ModelsRepository.collection),
+]
+ARTIFACT_SECTIONS = [
+    (GridFSRepository.database, f"{GridFSRepository.collection}.files"),
+    (GridFSRepository.database, f"{GridFSRepository.collection}.chunks"),
+    (DedupRepository.database, DedupRepository.collection),
+    (ColdRepository.database, ColdRepository.collection),
+]
+
+
+def _read_records(file: BinaryIO) -> Iterator[Tuple[int, bytes, int]]:
+    """Yield section index, raw BSON document and offset after the record."""
+    while tag := file.read(1):
+        size = file.read(4)
+        (length,) = struct.unpack("<i", size)
+        yield tag[0], size + file.read(length - 4), file.tell()
+
+
+class RegistryTransferService:
+    """Streaming export and import of the whole registry.
+
+    Archive is a header followed by records: one byte of section index
+    and a raw BSON document. Documents are never decoded into entities,
+    raw BSON is passed through in both directions.
+    Import inserts batches with `insert_many` from parallel workers and
+    writes a progress file, so an interrupted import resumes from the last
+    offset committed by all workers. Already imported documents are skipped
+    by their `_id`, so replayed batches are harmless. Imported experiments
+    and models get the current `updated_at`, so mirrors copy them.
+    """
+
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+
+    def _collection(self, database: str, collection: str):
+        return self.uow.client.get_database(database, codec_options=RAW_CODEC).get_collection(collection)
+
+
+    def external_artifacts(self) -> Dict[str, int]:
+        """Number of serialized models per store, which keeps bytes outside of MongoDB (e.g. `FileSystemStore`)."""
+        with self.uow:
+            cursor = self.uow.models.aggregate([
+                {"$match": {"serialized_model.storage": {"$exists": True, "$nin": list(UnitOfWork.builtin_stores)}}},
+                {"$group": {"_id": "$serialized_model.storage", "count": {"$sum": 1}}},
+            ])
+            return {el["_id"]: el["count"] for el in cursor}
+
+
+    def export(self,
+               path: Path,
+               include_artifacts: bool = True,
+               batch_size: int = 1000,
+               skip_external: bool = False) -> Dict[str, int]:
+        """Raises `ValueError` if there are artifacts outside of MongoDB, unless `skip_external` is set."""
+        if include_artifacts:
+            external = self.external_artifacts()
+            message = f"Artifacts of {external} models are kept outside of MongoDB and are not exported"
+            if external and not skip_external:
+                raise ValueError(f"{message}, copy them separately and set `skip_external`")
+            if external:
+                warnings.warn(message, stacklevel=3)
+        sections = METADATA_SECTIONS + (ARTIFACT_SECTIONS if include_artifacts else [])
+        counts = {}
+        with open(path, "wb", buffering=1024 * 1024) as file:
+            file.write(MAGIC)
+            file.write(encode({"sections": [list(el) for el in sections]}))
+            for index, (database, collection) in enumerate(sections):
+                tag = bytes([index])
+                count = 0
+                for doc in self._collection(database, collection).find({}, batch_size=batch_size):
+                    file.write(tag)
+                    file.write(doc.raw)
+                    count += 1
+                counts[f"{database}.{collection}"] = count
+        return counts
+
+
+    def import_(self,
+                path: Path,
+                workers: int = 4,
+                batch_size: int = 1000,
+                batch_bytes: int = 8 * 1024 * 1024,
+                resume: bool = True) -> Dict[str, int]:
+        progress_path = Path(f"{path}.progress")
+        counts: Dict[str, int] = {}
+        lock = threading.Lock()
+
+        with open(path, "rb", buffering=1024 * 1024) as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a mongomv archive")
+            (length,) = struct.unpack("<i", file.read(4))
+            file.seek(-4, os.SEEK_CUR)
+            sections = [tuple(el) for el in decode(file.read(length))["sections"]]
+            if resume and progress_path.exists():
+                file.seek(int(progress_path.read_text()))
+
+            # (start offset, end offset) of batches in flight, watermark is committed offset
+            pending: Dict[Future, Tuple[int, int]] = {}
+            done: Dict[int, int] = {}
+            watermark = file.tell()
+
+            def insert(index: int, docs: List[RawBSONDocument]) -> None:
+                database, collection = sections[index]
+                try:
+                    result = self._collection(database, collection).insert_many(docs, ordered=False)
+                    inserted = len(result.inserted_ids)
+                except BulkWriteError as exc:
+                    if any(el["code"] != 11000 for el in exc.details["writeErrors"]):
+                        raise
+                    inserted = exc.details["nInserted"]
+                if (database, collection) in TRACKED_SECTIONS:
+                    self._collection(database, collection).update_many(
+                        {"_id": {"$in": [el["_id"] for el in docs]}},
+                        {"$currentDate": {"updated_at": True}}
+                    )
+                with lock:
+                    key = f"{database}.{collection}"
+                    counts[key] = counts.get(key, 0) + inserted
+
+            def commit(futures) -> None:
+                nonlocal watermark
+                for future in futures:
+                    start, end = pending.pop(future)
+                    future.result()
+                    done[start] = end
+                advanced = False
+                while watermark in done:
+                    watermark = done.pop(watermark)
+                    advanced = True
+                if advanced:
+                    tmp = progress_path.with_suffix(".tmp")
+                    tmp.write_text(str(watermark))
+                    tmp.replace(progress_path)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                batch: List[RawBSONDocument] = []
+                batch_index: Optional[int] = None
+                batch_start = batch_end = file.tell()
+                size = 0
+                for index, raw, offset in _read_records(file):
+                    if batch and (index != batch_index or len(batch) >= batch_size or size >= batch_bytes):
+                        pending[executor.submit(insert, batch_index, batch)] = (batch_start, batch_end)
+                        batch, size, batch_start = [], 0, batch_end
+                        if len(pending) >= workers * 2:
+                            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            commit(finished)
+                    batch.append(RawBSONDocument(raw))
+                    batch_index, batch_end = index, offset
+                    size += len(raw)
+                if batch:
+                    pending[executor.submit(insert, batch_index, batch)] = (batch_start, batch_end)
+                finished, _ = wait(pending)
+                commit(finished)
+
+        progress_path.unlink(missing_ok=True)
+        return counts
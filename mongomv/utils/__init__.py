@@ -1 +1,6 @@
+from .chunking import ContentDefinedChunker
 from .deco import not_none_return
+from .digest import path_digest
+from .exceptions import MissingIdsError, RevisionConflictError, TransferCancelled, UnindexedQueryWarning
+from .progress import ObservedReader, ObservedWriter, observe_transfer, report_transfer
+from .updates import merge_updates
@@ -0,0 +1,21 @@
+import hashlib
+from pathlib import Path
+
+
+def _file_digest(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(1024 * 1024):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def path_digest(path: Path) -> str:
+    """sha256 of a file, or of sorted relative paths and digests of all files of a directory."""
+    path = Path(path)
+    if not path.is_dir():
+        return _file_digest(path)
+    sha256 = hashlib.sha256()
+    for el in sorted(el for el in path.rglob("*") if el.is_file()):
+        sha256.update(f"{el.relative_to(path).as_posix()}\0{_file_digest(el)}\n".encode())
+    return sha256.hexdigest()
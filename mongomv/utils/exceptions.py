@@ -0,0 +1,18 @@
+class RevisionConflictError(RuntimeError):
+    """Document was changed by another writer since the entity was loaded."""
+
+
+class TransferCancelled(Exception):
+    """Background transfer was cancelled while running."""
+
+
+class UnindexedQueryWarning(UserWarning):
+    """Query can not use any of the declared indexes and scans the whole collection."""
+
+
+class MissingIdsError(KeyError):
+    """Some of requested documents do not exist, their ids are in `missing`."""
+
+    def __init__(self, missing: list):
+        super().__init__(f"There are no documents with ids {missing}")
+        self.missing = missing
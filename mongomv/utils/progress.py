@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+_observer: ContextVar[Optional[Callable[[int], None]]] = ContextVar("transfer_observer", default=None)
+
+
+def report_transfer(size: int) -> None:
+    """Report bytes uploaded or downloaded by repositories to the observer of the current context."""
+    observer = _observer.get()
+    if observer is not None:
+        observer(size)
+
+
+@contextmanager
+def observe_transfer(observer: Callable[[int], None]) -> Iterator[None]:
+    """Call `observer` with number of bytes of every transferred block inside the block.
+
+    Observer might sleep to limit bandwidth or raise to interrupt the transfer.
+    """
+    token = _observer.set(observer)
+    try:
+        yield
+    finally:
+        _observer.reset(token)
+
+
+class ObservedReader:
+    """Readable file object proxy, which reports every read block."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        report_transfer(len(data))
+        return data
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def seekable(self) -> bool:
+        return self._fileobj.seekable()
+
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._fileobj.seek(offset, whence)
+
+
+    def tell(self) -> int:
+        return self._fileobj.tell()
+
+
+class ObservedWriter:
+    """Writable file object proxy, which reports every written block."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+
+    def write(self, data: bytes) -> int:
+        report_transfer(len(data))
+        return self._fileobj.write(data)
@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional
+
+
+def _merge(old: Any, new: Any) -> Optional[Any]:
+    """Merge two values of the same field and operator, return `None` if they conflict."""
+    if not (isinstance(old, dict) and isinstance(new, dict)) or old.keys() != new.keys() or len(old) != 1:
+        return None
+    (key,) = old
+    if key in ["$each", "$in"]:
+        return {key: [*old[key], *new[key]]}
+    merged = _merge(old[key], new[key])
+    return None if merged is None else {key: merged}
+
+
+def merge_updates(changes: List[Dict]) -> List[Dict]:
+    """Compile recorded single-operator updates into as few update documents as possible.
+
+    `$set` of the same field keeps the last value, `$push`, `$addToSet`
+    and `$pull` of the same field are merged with `$each`/`$in`.
+    A change, which touches a field already updated by another operator
+    (e.g. `$push` then `$pull` of `params`), starts a new update document,
+    so the order of changes is preserved.
+
+    Example:
+    >>> merge_updates([{"$addToSet": {"tags": {"$each": ["a"]}}}, {"$addToSet": {"tags": {"$each": ["b"]}}}])
+    ... [{"$addToSet": {"tags": {"$each": ["a", "b"]}}}]
+    """
+    groups: List[Dict] = []
+    group: Dict = {}
+    operators: Dict[str, str] = {}
+    for change in changes:
+        ((operator, value),) = change.items()
+        if operator == "$push":
+            value = {
+                field: el if isinstance(el, dict) and "$each" in el else {"$each": [el]}
+                for field, el in value.items()
+            }
+
+        merged = {}
+        for field, el in value.items():
+            if field not in operators:
+                merged[field] = el
+            elif operators[field] != operator:
+                break
+            elif operator == "$set":
+                merged[field] = el
+            elif (result := _merge(group[operator][field], el)) is not None:
+                merged[field] = result
+            else:
+                break
+        else:
+            group.setdefault(operator, {}).update(merged)
+            operators.update(dict.fromkeys(value, operator))
+            continue
+
+        groups.append(group)
+        group = {operator: dict(value)}
+        operators = dict.fromkeys(value, operator)
+    if group:
+        groups.append(group)
+    return groups
@@ -0,0 +1,53 @@
+"""Testing `MongoMVClient.delete_models` and `MongoMVClient.delete_experiment`."""
+
+import os
+from pathlib import Path
+
+from mongomv import MongoMVClient
+from mongomv.schemas import DeleteReport
+
+
+class TestBulkDelete:
+
+
+    def test_delete_models_by_query(self, mongomv_client: MongoMVClient):
+        path = Path(os.getcwd()).joinpath("bulk.bin")
+        path.write_bytes(b"bulk" * 1000)
+        exp = mongomv_client.create_experiment(name="bulk_experiment", tags=["testing"])
+        mds = [mongomv_client.create_model(name="bulk_model", tags=["abandoned"]) for _ in range(3)]
+        for md in mds:
+            exp.add_model(model=md)
+        mds[0].dump_model(model_path=path, filename="bulk.bin")
+        mds[1].dump_model(model_path=path, filename="bulk.bin", dedup=True)
+        os.remove(path=path)
+
+        report = mongomv_client.delete_models(query={"tags": {"$in": ["abandoned"]}})
+        assert isinstance(report, DeleteReport)
+        assert report.models == 3
+        assert report.artifacts == 2
+        assert report.experiments_updated == 1
+        assert mongomv_client.find_experiment_by(find_by="name", value="bulk_experiment").models == []
+        assert mongomv_client.find_model_by(find_by="name", value="bulk_model", is_list=True) == []
+        exp.delete()
+
+
+    def test_delete_experiment_cascade(self, mongomv_client: MongoMVClient):
+        exp = mongomv_client.create_experiment(name="cascade_experiment", tags=["testing"])
+        for _ in range(2):
+            exp.add_model(model=mongomv_client.create_model(name="cascade_model", tags=["testing"]))
+
+        report = mongomv_client.delete_experiment(experiment_id=exp.id)
+        assert report.models == 2
+        assert report.experiments_deleted == 1
+        assert mongomv_client.find_model_by(find_by="name", value="cascade_model", is_list=True) == []
+
+
+    def test_delete_experiment_without_cascade(self, mongomv_client: MongoMVClient):
+        exp = mongomv_client.create_experiment(name="unlink_experiment", tags=["testing"])
+        md = mongomv_client.create_model(name="unlinked_model", tags=["testing"])
+        exp.add_model(model=md)
+
+        report = mongomv_client.delete_experiment(experiment_id=exp.id, cascade=False)
+        assert report.unlinked_models == 1
+        assert mongomv_client.find_model_by(find_by="name", value="unlinked_model").experiment_id is None
+        md.delete()
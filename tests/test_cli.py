@@ -0,0 +1,92 @@
+"""Testing `mongomv` command-line tool:
+    - `push`
+    - `pull`
+    - `ls`
+    - `rm`
+    - `sync`
+    - `indexes`."""
+
+import os
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.cli import EXIT_NOT_FOUND, EXIT_OK, EXIT_USAGE, main, parse_ref
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture
+def checkpoints(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    for el in range(3):
+        (source / f"cli_model_{el}.bin").write_bytes(os.urandom(100_000))
+    yield source
+    MongoMVClient(uri=TEST_MONGO_URI).delete_models({"name": {"$regex": "^cli_model_"}})
+
+
+def test_parse_ref():
+    assert parse_ref("keras") == ("keras", "latest")
+    assert parse_ref("keras:3") == ("keras", 3)
+    assert parse_ref("keras:production") == ("keras", "production")
+
+
+def test_uri_is_required(monkeypatch):
+    monkeypatch.delenv("MONGOMV_URI", raising=False)
+    assert main(["ls"]) == EXIT_USAGE
+
+
+@pytest.mark.usefixtures("mongomv_client")
+class TestCLI:
+
+
+    def test_push_skips_unchanged(self, checkpoints, mongomv_client: MongoMVClient):
+        assert main(["--uri", TEST_MONGO_URI, "-q", "sync", str(checkpoints), "-w", "3"]) == EXIT_OK
+        assert main(["--uri", TEST_MONGO_URI, "-q", "sync", str(checkpoints), "-w", "3"]) == EXIT_OK
+        assert len(mongomv_client.crud.read(
+            instance="models", find_by={"name": {"$regex": "^cli_model_"}}, is_list=True
+        )) == 3
+
+        (checkpoints / "cli_model_0.bin").write_bytes(os.urandom(1000))
+        assert main(["--uri", TEST_MONGO_URI, "-q", "push", str(checkpoints / "cli_model_0.bin")]) == EXIT_OK
+        assert len(mongomv_client.crud.read(instance="models", find_by={"name": "cli_model_0"}, is_list=True)) == 2
+
+
+    def test_pull_and_rm(self, checkpoints, tmp_path, mongomv_client: MongoMVClient):
+        path = checkpoints / "cli_model_1.bin"
+        assert main(["--uri", TEST_MONGO_URI, "-q", "push", str(path), "--alias", "production"]) == EXIT_OK
+
+        dest = tmp_path / "dest"
+        assert main(["--uri", TEST_MONGO_URI, "-q", "pull", "cli_model_1:production", "-d", str(dest)]) == EXIT_OK
+        assert (dest / "cli_model_1.bin").read_bytes() == path.read_bytes()
+        assert main(["--uri", TEST_MONGO_URI, "-q", "pull", "cli_model_404", "-d", str(dest)]) == EXIT_NOT_FOUND
+
+        assert main(["--uri", TEST_MONGO_URI, "ls", "cli_model_1"]) == EXIT_OK
+        assert main(["--uri", TEST_MONGO_URI, "-q", "rm", "cli_model_1", "--all-versions"]) == EXIT_OK
+        assert main(["--uri", TEST_MONGO_URI, "ls", "cli_model_1"]) == EXIT_NOT_FOUND
+
+
+    def test_pull_replaces_stale_files(self, checkpoints, tmp_path):
+        path = checkpoints / "cli_model_2.bin"
+        assert main(["--uri", TEST_MONGO_URI, "-q", "push", str(path), "--dedup"]) == EXIT_OK
+
+        dest = tmp_path / "dest"
+        pulled = dest / "cli_model_2.bin"
+        for args in [[], [], ["--force"]]:
+            assert main(["--uri", TEST_MONGO_URI, "-q", "pull", "cli_model_2", "-d", str(dest), *args]) == EXIT_OK
+            assert pulled.read_bytes() == path.read_bytes()
+            pulled.write_bytes(b"stale")
+        pulled.unlink()
+        pulled.mkdir()
+        assert main(["--uri", TEST_MONGO_URI, "-q", "pull", "cli_model_2", "-d", str(dest)]) == EXIT_OK
+        assert pulled.read_bytes() == path.read_bytes()
+        assert os.listdir(dest) == ["cli_model_2.bin"]
+
+
+    def test_indexes(self, mongomv_client: MongoMVClient):
+        with mongomv_client.crud.uow as uow:
+            uow.models.collection.drop_index("name_version")
+        with MongoMVClient(uri=TEST_MONGO_URI).crud.uow as uow:
+            assert "name_version" not in uow.models.collection.index_information()
+        assert main(["--uri", TEST_MONGO_URI, "-q", "indexes"]) == EXIT_OK
+        with mongomv_client.crud.uow as uow:
+            assert uow.models.collection.index_information()["name_version"]["unique"]
@@ -0,0 +1,58 @@
+"""Testing columnar comparison of models:
+    - `compare`
+    - `rank`
+    - `correlation`
+    - `pareto_front`."""
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity, ModelMetrics, ModelParams
+from tests.conftest import TEST_MONGO_URI
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture(scope="module")
+def sweep():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    mds = []
+    for lr, accuracy, latency in [(0.1, 0.7, 10.0), (0.2, 0.8, 20.0), (0.3, 0.9, 30.0), (0.4, 0.6, 40.0)]:
+        md = client.create_model(name="compare_sweep", tags=["testing"])
+        with md.deferred():
+            md.add_param(ModelParams(parameter="lr", value=lr))
+            md.add_param(ModelParams(parameter="optimizer", value="adam"))
+            md.add_metric(ModelMetrics(metric="accuracy", value=accuracy))
+            md.add_metric(ModelMetrics(metric="latency", value=latency))
+        mds.append(md)
+    md = client.create_model(name="compare_sweep", tags=["testing"])
+    mds.append(md)
+    yield mds
+    for md in mds:
+        md.delete()
+
+
+@pytest.mark.usefixtures("mongomv_client")
+class TestCompare:
+
+
+    def test_columns(self, sweep: list[ModelEntity], mongomv_client: MongoMVClient):
+        cmp = mongomv_client.compare(
+            sweep[::-1], params=["lr", "optimizer"], metrics=["accuracy", "latency"]
+        )
+        assert len(cmp) == 5
+        assert list(cmp["_id"]) == [el.id for el in sweep[::-1]]
+        assert np.isnan(cmp["lr"][0])
+        assert list(cmp["lr"][1:]) == [0.4, 0.3, 0.2, 0.1]
+        assert cmp["optimizer"].dtype == object
+
+
+    def test_query(self, sweep: list[ModelEntity], mongomv_client: MongoMVClient):
+        cmp = mongomv_client.compare({"name": "compare_sweep"}, params=["lr"], metrics=["accuracy"])
+        assert len(cmp) == len(sweep)
+
+
+    def test_helpers(self, sweep: list[ModelEntity], mongomv_client: MongoMVClient):
+        cmp = mongomv_client.compare(sweep, params=["lr"], metrics=["accuracy", "latency"])
+        assert list(cmp.rank("accuracy")) == [2, 1, 0, 3, 4]
+        assert cmp.correlation()["lr"]["latency"] == pytest.approx(1.0)
+        assert list(cmp.pareto_front({"accuracy": "max", "latency": "min"})) == [0, 1, 2]
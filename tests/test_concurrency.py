@@ -0,0 +1,53 @@
+"""Testing concurrent use of a single client:
+    - sessions of threads do not interfere
+    - concurrent writes of threads are not lost."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from mongomv import MongoMVClient
+from pymongo.client_session import ClientSession
+from tests.conftest import TEST_MONGO_URI
+
+OPERATIONS = 200
+
+
+@pytest.fixture(scope="module")
+def shared_client():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    yield client
+    client.delete_models({"name": {"$regex": "^stress_model_"}})
+
+
+def workload(client: MongoMVClient, worker: int) -> List[ClientSession]:
+    md = client.create_model(name=f"stress_model_{worker}", tags=["testing"])
+    sessions = []
+    for el in range(OPERATIONS):
+        md.add_tag([f"tag_{el}"])
+        assert client.get_model(name=f"stress_model_{worker}").id == md.id
+        with client.crud.uow as uow:
+            sessions.append(uow.session)
+    return sessions
+
+
+def test_nested_units_of_work(shared_client: MongoMVClient):
+    uow = shared_client.crud.uow
+    with uow:
+        outer = uow.session
+        with uow:
+            assert uow.session is not outer
+        assert uow.session is outer
+    with pytest.raises(RuntimeError):
+        uow.session
+
+
+def test_threads_share_client(shared_client: MongoMVClient):
+    threads = 8
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        sessions = list(executor.map(lambda worker: workload(shared_client, worker), range(threads)))
+    for worker in range(threads):
+        md = shared_client.get_model(name=f"stress_model_{worker}")
+        assert sorted(md.tags) == sorted(["testing", *(f"tag_{el}" for el in range(OPERATIONS))])
+    # every unit of work gets its own session, none is shared between threads
+    assert len({id(el) for worker in sessions for el in worker}) == threads * OPERATIONS
@@ -0,0 +1,48 @@
+"""Testing `MongoMVClient.tag_facets`, computed and materialized."""
+
+import pytest
+from mongomv import MongoMVClient
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture(scope="module")
+def facets_client():
+    client = MongoMVClient(uri=TEST_MONGO_URI, materialize_facets=True)
+    client.rebuild_tag_facets()
+    yield client
+
+
+class TestTagFacets:
+
+
+    def test_aggregated_facets(self, mongomv_client: MongoMVClient):
+        mds = [
+            mongomv_client.create_model(name="facet_model", tags=["facet_a", "facet_b"]),
+            mongomv_client.create_model(name="facet_model", tags=["facet_a"]),
+        ]
+        facets = mongomv_client.tag_facets("models", query={"name": "facet_model"})
+        assert facets == {"facet_a": 2, "facet_b": 1}
+        for md in mds:
+            md.delete()
+
+
+    def test_materialized_facets(self, facets_client: MongoMVClient):
+        md = facets_client.create_model(name="facet_model", tags=["facet_c"])
+        assert facets_client.tag_facets("models")["facet_c"] == 1
+
+        md.add_tag(tags=["facet_d", "facet_c"])
+        facets = facets_client.tag_facets("models")
+        assert facets["facet_c"] == 1
+        assert facets["facet_d"] == 1
+
+        md.remove_tag(tags=["facet_c"])
+        assert "facet_c" not in facets_client.tag_facets("models")
+
+        md.delete()
+        assert "facet_d" not in facets_client.tag_facets("models")
+
+
+    def test_materialized_facets_match_aggregation(self, facets_client: MongoMVClient):
+        exp = facets_client.create_experiment(name="facet_experiment", tags=["facet_e"])
+        assert facets_client.tag_facets("experiments") == facets_client.tag_facets("experiments", query={})
+        exp.delete()
@@ -0,0 +1,90 @@
+"""Testing `MongoMVClient.gc_artifacts`:
+    - orphaned GridFS files, young artifacts are kept
+    - deduplicated chunks referenced again are kept
+    - orphaned cold tier frames."""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from mongomv import MongoMVClient
+from mongomv.schemas import GCReport
+
+
+class TestArtifactsGC:
+
+
+    def test_gc_orphaned_artifact(self, mongomv_client: MongoMVClient):
+        path = Path(os.getcwd()).joinpath("orphan.bin")
+        path.write_bytes(b"orphan" * 1000)
+        md = mongomv_client.create_model(name="orphan_model", tags=["testing"])
+        md.dump_model(model_path=path, filename="orphan.bin")
+        os.remove(path=path)
+        md.delete()
+
+        report = mongomv_client.gc_artifacts(dry_run=True, grace_period=timedelta(0), pause=0)
+        assert isinstance(report, GCReport)
+        assert report.files >= 1
+        assert report.reclaimed_bytes >= 6000
+
+        report = mongomv_client.gc_artifacts(grace_period=timedelta(0), pause=0)
+        assert report.files >= 1
+        report = mongomv_client.gc_artifacts(dry_run=True, grace_period=timedelta(0), pause=0)
+        assert report.files == 0
+
+
+    def test_gc_keeps_young_artifacts(self, mongomv_client: MongoMVClient):
+        path = Path(os.getcwd()).joinpath("young.bin")
+        path.write_bytes(b"young" * 1000)
+        md = mongomv_client.create_model(name="young_model", tags=["testing"])
+        md.dump_model(model_path=path, filename="young.bin")
+        os.remove(path=path)
+        md.delete()
+
+        report = mongomv_client.gc_artifacts(dry_run=True, pause=0)
+        assert report.files == 0
+        mongomv_client.gc_artifacts(grace_period=timedelta(0), pause=0)
+
+
+    def test_gc_keeps_chunks_referenced_again(self, mongomv_client: MongoMVClient):
+        now = datetime.now(timezone.utc)
+        with mongomv_client.crud.uow as uow:
+            uow.dedup.chunks_collection.insert_many([
+                {"_id": "gc_stale", "data": b"stale", "length": 5, "refs": 0, "last_used": now - timedelta(hours=2)},
+                {"_id": "gc_reused", "data": b"reused", "length": 6, "refs": 1, "last_used": now},
+            ])
+            assert uow.dedup.delete_many(["gc_stale", "gc_reused"], used_before=now - timedelta(hours=1)) == 1
+            assert [el["_id"] for el in uow.dedup.chunks_collection.find({"_id": {"$regex": "^gc_"}})] == ["gc_reused"]
+            tombstones = uow.tombstones.collection.find({"collection": "dedup", "key": {"$regex": "^gc_"}})
+            assert [el["key"] for el in tombstones] == ["gc_stale"]
+            uow.dedup.delete_many(["gc_reused"])
+            uow.tombstones.collection.delete_many({"collection": "dedup", "key": {"$regex": "^gc_"}})
+
+
+    def test_gc_cold_frames(self, mongomv_client: MongoMVClient, tmp_path):
+        path = tmp_path / "cold.bin"
+        path.write_bytes(b"cold" * 1000)
+        orphan = mongomv_client.create_model(name="cold_gc_model", tags=["testing"])
+        orphan.dump_model(model_path=path, filename="cold.bin", store="cold")
+        orphan.delete()
+        moving = mongomv_client.create_model(name="cold_gc_model", tags=["testing"])
+        moving.dump_model(model_path=path, filename="cold.bin")
+        with mongomv_client.crud.uow as uow:
+            uow.cold.put(path, moving.serialized_model.id)
+        # ids of frames are compared with the cutoff by their second precision time
+        time.sleep(1)
+
+        try:
+            report = mongomv_client.gc_artifacts(dry_run=True, grace_period=timedelta(0), pause=0)
+            assert report.cold_artifacts >= 1
+            assert report.reclaimed_bytes >= 4000
+
+            mongomv_client.gc_artifacts(grace_period=timedelta(0), pause=0)
+            with mongomv_client.crud.uow as uow:
+                assert uow.cold.frames_collection.count_documents({"artifact": orphan.serialized_model.id}) == 0
+                assert uow.cold.frames_collection.count_documents({"artifact": moving.serialized_model.id}) == 1
+                uow.cold.delete(moving.serialized_model.id)
+            assert moving.load_bytes() == b"cold" * 1000
+        finally:
+            mongomv_client.delete_models({"name": "cold_gc_model"})
@@ -0,0 +1,120 @@
+"""Testing batched lookups by ids:
+    - `get_models`, `get_experiments` order, duplicates and missing ids
+    - `ExperimentEntity.get_models`
+    - coalescing of concurrent lookups by `BatchLoader`."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from bson import ObjectId
+from mongomv import MongoMVClient
+from mongomv.client import BatchLoader
+from mongomv.utils import MissingIdsError
+
+
+@pytest.fixture
+def batch_models(mongomv_client: MongoMVClient):
+    models = [mongomv_client.create_model(name="batch_model", tags=["testing"]) for _ in range(5)]
+    yield models
+    mongomv_client.delete_models({"name": "batch_model"})
+
+
+class TestGetByIds:
+
+
+    def test_order_and_duplicates(self, mongomv_client: MongoMVClient, batch_models):
+        ids = [batch_models[3].id, str(batch_models[0].id), batch_models[3].id, batch_models[1].id]
+        result = mongomv_client.get_models(ids, chunk_size=2)
+        assert [el.id for el in result] == [ObjectId(el) for el in ids]
+        assert result[0].name == "batch_model"
+
+
+    def test_missing(self, mongomv_client: MongoMVClient, batch_models):
+        missing = ObjectId()
+        with pytest.raises(MissingIdsError) as exc:
+            mongomv_client.get_models([batch_models[0].id, missing, missing])
+        assert exc.value.missing == [missing]
+
+        result = mongomv_client.get_models([missing, batch_models[0].id], strict=False)
+        assert result[0] is None
+        assert result[1].id == batch_models[0].id
+
+
+    def test_experiments(self, mongomv_client: MongoMVClient, batch_models):
+        exp = mongomv_client.create_experiment(name="batch_experiment", tags=["testing"])
+        try:
+            for md in batch_models[:3][::-1]:
+                exp.add_model(md)
+            assert [el.id for el in mongomv_client.get_experiments([exp.id])] == [exp.id]
+            assert [el.id for el in exp.get_models()] == [el.id for el in batch_models[:3][::-1]]
+        finally:
+            mongomv_client.delete_experiment(exp.id, cascade=False)
+
+
+class TestBatchLoader:
+
+
+    @staticmethod
+    def make_loader(**kwargs):
+        calls = []
+
+        def fetch(keys):
+            calls.append(keys)
+            return {el: el * 10 for el in keys if el >= 0}
+
+        return BatchLoader(fetch, **kwargs), calls
+
+
+    def test_threads(self):
+        loader, calls = self.make_loader(window=0.05)
+        barrier = threading.Barrier(16)
+
+        def load(key):
+            barrier.wait()
+            return loader.load(key)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            result = list(pool.map(load, [i % 8 for i in range(16)]))
+        assert result == [(i % 8) * 10 for i in range(16)]
+        assert loader.batches == len(calls) < 4
+        assert all(len(el) == len(set(el)) for el in calls)
+
+
+    def test_max_batch_size(self):
+        loader, calls = self.make_loader(max_batch_size=3)
+        assert loader.load_many(range(7)) == [i * 10 for i in range(7)]
+        assert [len(el) for el in calls] == [3, 3, 1]
+
+
+    def test_async(self):
+        loader, calls = self.make_loader()
+
+        async def main():
+            return await asyncio.gather(*(loader.aload(i % 5) for i in range(20)))
+
+        assert asyncio.run(main()) == [(i % 5) * 10 for i in range(20)]
+        assert calls == [[0, 1, 2, 3, 4]]
+
+
+    def test_errors(self):
+        loader, _ = self.make_loader()
+        with pytest.raises(MissingIdsError):
+            loader.load(-1)
+
+        def fail(keys):
+            raise RuntimeError("fetch failed")
+
+        with pytest.raises(RuntimeError):
+            BatchLoader(fail).load(1)
+
+
+    def test_client_loader(self, mongomv_client: MongoMVClient, batch_models):
+        loader = mongomv_client.loader("models", window=0.05)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            result = list(pool.map(loader.load, [str(el.id) for el in batch_models]))
+        assert [el.id for el in result] == [el.id for el in batch_models]
+        assert loader.batches < 5
+        with pytest.raises(MissingIdsError):
+            loader.load(ObjectId())
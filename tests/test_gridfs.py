@@ -1,10 +1,17 @@
+import io
 import os
+import shutil
+import tarfile
 from pathlib import Path
+from mongomv import MongoMVClient
+from mongomv.repository.packing import unpack_directory
 from mongomv.schemas import ModelEntity
+from mongomv.utils import chunking
+from mongomv.utils.chunking import ContentDefinedChunker
 import pytest
 
 
-@pytest.mark.usefixtures("model")
+@pytest.mark.usefixtures("model", "mongomv_client")
 class TestGridFS:
 
     def test_dump_model(self, model: ModelEntity):
@@ -17,6 +24,25 @@ class TestGridFS:
         os.remove(path=path)
 
 
+    def test_open_artifact(self, model: ModelEntity):
+        with model.open_artifact() as artifact:
+            assert artifact.seekable()
+            assert artifact.read(7) == b"This is"
+            artifact.seek(-6, io.SEEK_END)
+            assert artifact.read() == b"GridFS"
+            assert artifact.tell() == len("This is test case for GridFS")
+
+
+    def test_load_bytes(self, model: ModelEntity):
+        assert model.load_bytes() == b"This is test case for GridFS"
+        mapped = model.load_bytes(use_mmap=True)
+        assert mapped[:] == b"This is test case for GridFS"
+        buffer = bytearray(64)
+        assert model.load_into(buffer) == len(b"This is test case for GridFS")
+        with pytest.raises(ValueError):
+            model.load_into(bytearray(4))
+
+
     def test_load_model(self, model: ModelEntity):
         path = Path(os.getcwd()).joinpath("text.txt")
         result = model.load_model(model_path=path)
@@ -28,3 +54,129 @@ class TestGridFS:
     def test_delete_serialized_model(self, model: ModelEntity):
         result = model.delete_model()
         assert type(result) == str
+
+
+    def test_dump_directory_model(self, model: ModelEntity):
+        path = Path(os.getcwd()).joinpath("saved_model")
+        path.joinpath("variables").mkdir(parents=True)
+        path.joinpath("saved_model.pb").write_bytes(b"graph" * 1000)
+        path.joinpath("variables", "variables.index").write_text("index")
+        result = model.dump_model(model_path=path, filename="saved_model")
+        assert type(result) == str
+        assert [el.path for el in model.serialized_model.manifest] == ["saved_model.pb", "variables/variables.index"]
+        shutil.rmtree(path)
+
+
+    def test_load_directory_model(self, model: ModelEntity):
+        path = Path(os.getcwd()).joinpath("saved_model")
+        result = model.load_model(model_path=path)
+        assert type(result) == str
+        assert path.joinpath("saved_model.pb").read_bytes() == b"graph" * 1000
+        assert path.joinpath("variables", "variables.index").read_text() == "index"
+        shutil.rmtree(path)
+
+
+    def test_load_selected_files(self, model: ModelEntity):
+        path = Path(os.getcwd()).joinpath("saved_model")
+        result = model.load_model(model_path=path, files=["variables/variables.index"])
+        assert type(result) == str
+        assert not path.joinpath("saved_model.pb").exists()
+        assert path.joinpath("variables", "variables.index").read_text() == "index"
+        shutil.rmtree(path)
+        with pytest.raises(KeyError):
+            model.load_model(model_path=path, files=["missing.bin"])
+
+
+    def test_open_artifact_file_from_directory(self, model: ModelEntity):
+        with model.open_artifact(path="variables/variables.index") as artifact:
+            assert artifact.read() == b"index"
+            artifact.seek(2)
+            assert artifact.read(2) == b"de"
+
+
+    def test_delete_directory_model(self, model: ModelEntity):
+        result = model.delete_model()
+        assert type(result) == str
+
+
+    def test_dump_deduplicated_checkpoints(self, model: ModelEntity, mongomv_client: MongoMVClient):
+        path = Path(os.getcwd()).joinpath("checkpoint.bin")
+        data = os.urandom(2 * 1024 * 1024)
+        path.write_bytes(data)
+        result = model.dump_model(model_path=path, filename="checkpoint.bin", dedup=True)
+        assert type(result) == str
+        assert model.serialized_model.stats.uploaded_bytes == len(data)
+
+        next_checkpoint = mongomv_client.create_model(name="test_model", tags=["testing"])
+        path.write_bytes(data[:1024 * 1024] + b"fine-tuned" + data[1024 * 1024:])
+        next_checkpoint.dump_model(model_path=path, filename="checkpoint.bin", dedup=True)
+        stats = next_checkpoint.serialized_model.stats
+        assert stats.total_bytes == len(data) + len(b"fine-tuned")
+        assert stats.uploaded_chunks < stats.total_chunks
+        assert stats.uploaded_bytes < len(data) // 4
+        os.remove(path=path)
+
+        next_checkpoint.load_model(model_path=path)
+        assert path.read_bytes() == data[:1024 * 1024] + b"fine-tuned" + data[1024 * 1024:]
+        os.remove(path=path)
+        assert type(next_checkpoint.delete_model()) == str
+        next_checkpoint.delete()
+
+
+    def test_delete_deduplicated_model(self, model: ModelEntity, mongomv_client: MongoMVClient):
+        stale = mongomv_client.find_model_by(find_by="id", value=model.id)
+        chunks = [el.hash for el in model.serialized_model.chunks]
+        result = model.delete_model()
+        assert type(result) == str
+        with pytest.raises(KeyError):
+            stale.delete_model()
+        with mongomv_client.crud.uow as uow:
+            assert uow.dedup.chunks_collection.count_documents({"_id": {"$in": chunks}}) == 0
+
+
+    def test_ensure_indexes(self, mongomv_client: MongoMVClient):
+        mongomv_client.crud.ensure_indexes()
+        with mongomv_client.crud.uow as uow:
+            chunks = uow.gridfs.root_collection.chunks.index_information()
+            files = uow.gridfs.root_collection.files.index_information()
+        assert chunks["files_id_1_n_1"]["unique"]
+        assert files["filename_1_uploadDate_1"]["key"] == [("filename", 1), ("uploadDate", 1)]
+
+
+class TestContentDefinedChunker:
+
+
+    def test_numpy_fallback(self, monkeypatch: pytest.MonkeyPatch):
+        pytest.importorskip("numpy")
+        data = os.urandom(1024 * 1024) + bytes(600 * 1024) + os.urandom(100 * 1024)
+
+        def split():
+            chunker = ContentDefinedChunker()
+            chunks = []
+            for start in range(0, len(data), 300_000):
+                chunks += chunker.update(data[start:start + 300_000])
+            return chunks + chunker.flush()
+
+        vectorized = split()
+        monkeypatch.setattr(chunking, "_GEAR_ARRAY", None)
+        assert split() == vectorized
+        assert b"".join(vectorized) == data
+        assert max(len(el) for el in vectorized) == 256 * 1024
+
+
+class TestUnpackDirectory:
+
+
+    @pytest.mark.parametrize(argnames="name", argvalues=["../escaped.txt", "/tmp/escaped.txt", "sub/../../escaped.txt"])
+    def test_rejects_paths_outside(self, tmp_path: Path, name: str):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            info = tarfile.TarInfo(name)
+            info.size = 4
+            tar.addfile(info, io.BytesIO(b"evil"))
+        with pytest.raises(ValueError):
+            unpack_directory(io.BytesIO(archive.getvalue()), tmp_path / "out")
+        with pytest.raises(ValueError):
+            manifest = [{"path": name, "size": 4, "offset": 512}]
+            unpack_directory(io.BytesIO(archive.getvalue()), tmp_path / "out", manifest)
+        assert not (tmp_path / "escaped.txt").exists()
@@ -0,0 +1,140 @@
+"""Testing journal mode:
+    - appended records survive reopening, torn tails are truncated
+    - a journal is locked by a single writer
+    - journaled writes are replayed to MongoDB
+    - replaying the same records twice applies them once
+    - the replay worker survives errors, `flush` raises once it has stopped."""
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelParams
+from mongomv.services import WriteJournal
+from pymongo.errors import BulkWriteError
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture
+def journal_client(tmp_path):
+    client = MongoMVClient(uri=TEST_MONGO_URI, journal=tmp_path / "writes.journal")
+    yield client
+    client.delete_models({"name": "journal_model"})
+    client.crud.close(timeout=10)
+
+
+class TestWriteJournal:
+
+
+    def test_reopen(self, tmp_path):
+        journal = WriteJournal(tmp_path / "test.journal")
+        assert journal.append([{"op": "delete", "n": 1}, {"op": "delete", "n": 2}]) == 2
+        journal.close()
+
+        journal = WriteJournal(tmp_path / "test.journal")
+        assert [el["n"] for el, _ in journal.pending()] == [1, 2]
+        seq, offset = journal.pending()[0][0]["seq"], journal.pending()[0][1]
+        journal.commit(seq, offset)
+        journal.close()
+
+        journal = WriteJournal(tmp_path / "test.journal")
+        assert [el["n"] for el, _ in journal.pending()] == [2]
+        assert journal.append([{"op": "delete", "n": 3}]) == 3
+        journal.close()
+
+
+    def test_torn_tail(self, tmp_path):
+        journal = WriteJournal(tmp_path / "test.journal")
+        journal.append([{"op": "delete", "n": 1}, {"op": "delete", "n": 2}])
+        journal.close()
+        with open(tmp_path / "test.journal", "r+b") as file:
+            file.truncate(file.seek(0, 2) - 3)
+
+        journal = WriteJournal(tmp_path / "test.journal")
+        assert [el["n"] for el, _ in journal.pending()] == [1]
+        assert journal.append([{"op": "delete", "n": 3}]) == 2
+        assert [el["n"] for el, _ in journal.pending()] == [1, 3]
+        journal.close()
+
+
+    def test_single_writer(self, tmp_path):
+        journal = WriteJournal(tmp_path / "test.journal")
+        journal.append([{"op": "delete", "n": 1}])
+        with pytest.raises(RuntimeError):
+            WriteJournal(tmp_path / "test.journal")
+        journal.close()
+        journal.close()
+
+        journal = WriteJournal(tmp_path / "test.journal")
+        assert [el["n"] for el, _ in journal.pending()] == [1]
+        journal.close()
+
+
+class TestJournaledClient:
+
+
+    def test_replay(self, journal_client: MongoMVClient):
+        md = journal_client.create_model(name="journal_model", tags=["testing"])
+        md.add_tag(["journal"])
+        md.add_param(ModelParams(parameter="lr", value=0.1))
+        assert journal_client.flush(timeout=10)
+
+        stored = journal_client.get_model(name="journal_model")
+        assert stored.id == md.id
+        assert stored.version is not None
+        assert stored.tags == ["testing", "journal"]
+        assert stored.params == [ModelParams(parameter="lr", value=0.1)]
+
+
+    def test_idempotent_replay(self, journal_client: MongoMVClient, tmp_path):
+        md = journal_client.create_model(name="journal_model", tags=["testing"])
+        md.add_tag(["journal"])
+        md.add_param(ModelParams(parameter="lr", value=0.1))
+        assert journal_client.flush(timeout=10)
+        before = journal_client.find_model_by(find_by="id", value=md.id)
+        journal_client.crud.close()
+
+        tmp_path.joinpath("writes.journal.checkpoint").write_text("0")
+        replayed = MongoMVClient(uri=TEST_MONGO_URI, journal=tmp_path / "writes.journal")
+        assert replayed.flush(timeout=10)
+        replayed.crud.close()
+        after = journal_client.find_model_by(find_by="id", value=md.id)
+        assert (after.rev, after.version, after.tags, after.params) == \
+            (before.rev, before.version, before.tags, before.params)
+
+
+    def test_replay_errors(self, journal_client: MongoMVClient, monkeypatch):
+        crud = journal_client.crud
+        apply, commit = crud._apply, crud.journal.commit
+        errors = [
+            BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "replication timeout"}]}),
+            OSError("disk is full"),
+        ]
+
+        def failing_apply(records):
+            if errors and isinstance(errors[0], BulkWriteError):
+                raise errors.pop(0)
+            apply(records)
+
+        def failing_commit(*args):
+            if errors:
+                raise errors.pop(0)
+            commit(*args)
+
+        monkeypatch.setattr(crud, "_apply", failing_apply)
+        monkeypatch.setattr(crud.journal, "commit", failing_commit)
+        md = journal_client.create_model(name="journal_model", tags=["testing"])
+        assert journal_client.flush(timeout=10)
+        assert errors == []
+        assert crud.last_error is None
+        assert crud._worker.is_alive()
+        assert journal_client.get_model(name="journal_model").id == md.id
+
+
+    def test_flush_stopped_worker(self, tmp_path):
+        client = MongoMVClient(uri=TEST_MONGO_URI, journal=tmp_path / "stopped.journal", retry_interval=0.1)
+        client.crud._stopped.set()
+        client.crud._worker.join()
+        client.create_model(name="journal_model", tags=["testing"])
+        with pytest.raises(RuntimeError):
+            client.flush()
+        with pytest.raises(RuntimeError):
+            client.crud.close()
@@ -0,0 +1,72 @@
+"""Testing model lineage:
+    - parent links with artifact provenance
+    - `ancestors`, `descendants` with depth limits
+    - cycle protection."""
+
+import pytest
+from mongomv import MongoMVClient
+
+
+@pytest.fixture
+def lineage_models(mongomv_client: MongoMVClient, tmp_path):
+    """base -> tuned -> distilled <- teacher"""
+    artifact = tmp_path / "model.bin"
+    artifact.write_bytes(b"weights")
+    base = mongomv_client.create_model(name="lineage_base", tags=["testing"])
+    base.dump_model(model_path=artifact, filename="model.bin")
+    tuned = mongomv_client.create_model(
+        name="lineage_tuned", tags=["testing"], parents=[base], relation="fine-tuned"
+    )
+    teacher = mongomv_client.create_model(name="lineage_teacher", tags=["testing"])
+    distilled = mongomv_client.create_model(name="lineage_distilled", tags=["testing"])
+    distilled.add_parent(tuned, relation="distilled")
+    distilled.add_parent(teacher, relation="distilled")
+    yield base, tuned, teacher, distilled
+    mongomv_client.delete_models({"name": {"$regex": "^lineage_"}})
+
+
+class TestLineage:
+
+
+    def test_provenance(self, mongomv_client: MongoMVClient, lineage_models):
+        base, tuned, _, _ = lineage_models
+        stored = mongomv_client.find_model_by(find_by="id", value=tuned.id)
+        assert [(el.model_id, el.relation) for el in stored.parents] == [(base.id, "fine-tuned")]
+        assert stored.parents[0].artifact_id == base.serialized_model.id
+
+
+    def test_ancestors(self, lineage_models):
+        base, tuned, teacher, distilled = lineage_models
+        lineage = distilled.ancestors()
+        assert lineage.root.id == distilled.id
+        assert {(el.id, el.depth) for el in lineage.nodes[1:]} == {(tuned.id, 1), (teacher.id, 1), (base.id, 2)}
+        assert lineage.nodes[-1].artifact_id == base.serialized_model.id
+        assert set(lineage.edges) == {
+            (base.id, tuned.id, "fine-tuned"),
+            (tuned.id, distilled.id, "distilled"),
+            (teacher.id, distilled.id, "distilled"),
+        }
+        assert {el.id for el in distilled.ancestors(depth=1).nodes[1:]} == {tuned.id, teacher.id}
+
+
+    def test_descendants(self, lineage_models):
+        base, tuned, _, distilled = lineage_models
+        nodes = base.descendants().nodes
+        assert [(el.id, el.depth) for el in nodes] == [(base.id, 0), (tuned.id, 1), (distilled.id, 2)]
+        assert [el.id for el in base.descendants(depth=1).nodes] == [base.id, tuned.id]
+        assert distilled.descendants().nodes[1:] == []
+        with pytest.raises(ValueError):
+            base.descendants(depth=0)
+
+
+    def test_links(self, lineage_models):
+        base, tuned, teacher, distilled = lineage_models
+        with pytest.raises(ValueError):
+            base.add_parent(distilled)
+        with pytest.raises(ValueError):
+            tuned.add_parent(base)
+
+        distilled.remove_parent(teacher.id)
+        assert {el.id for el in distilled.ancestors().nodes[1:]} == {tuned.id, base.id}
+        with pytest.raises(KeyError):
+            distilled.remove_parent(teacher.id)
@@ -0,0 +1,53 @@
+"""Testing the load generator:
+    - scenario validation
+    - a short run of writer and reader processes."""
+
+import io
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.loadtest import load_scenario, run_scenario
+from tests.conftest import TEST_MONGO_URI
+
+SCENARIO = {
+    "duration": 2,
+    "interval": 1,
+    "seed_models": 2,
+    "artifact_size": 4096,
+    "populations": [
+        {"name": "trainers", "processes": 2, "rate": 20, "mix": {"log_metric": 4, "add_tag": 2, "dump_checkpoint": 1}},
+        {"name": "readers", "processes": 2, "rate": 20, "mix": {"get_model": 2, "load_bytes": 1, "find_models": 1}},
+    ]
+}
+
+
+class TestLoadTest:
+
+
+    @pytest.mark.parametrize(
+        argnames="scenario",
+        argvalues=[
+            {"populations": []},
+            {"populations": [{"name": "a", "mix": {"fly": 1}}]},
+            {"populations": [{"name": "a", "mix": {"get_model": 1}}, {"name": "a", "mix": {"get_model": 1}}]},
+            {"duration": 0, "populations": [{"name": "a", "mix": {"get_model": 1}}]},
+        ]
+    )
+    def test_invalid_scenario(self, scenario):
+        with pytest.raises(ValueError):
+            load_scenario(scenario)
+
+
+    def test_run(self, mongomv_client: MongoMVClient, tmp_path):
+        out = io.StringIO()
+        report = run_scenario(SCENARIO, TEST_MONGO_URI, output=tmp_path / "report.json", out=out)
+        assert set(report["summary"]) == {
+            "trainers.log_metric", "trainers.add_tag", "trainers.dump_checkpoint",
+            "readers.get_model", "readers.load_bytes", "readers.find_models"
+        }
+        assert sum(el["count"] for el in report["summary"].values()) > 100
+        assert all(el["errors"] == 0 for el in report["summary"].values())
+        assert len(report["intervals"]) >= 2
+        assert "summary" in out.getvalue()
+        assert (tmp_path / "report.json").exists()
+        assert mongomv_client.find("models", {"name": {"$regex": f"^{report['prefix']}"}}) == []
@@ -0,0 +1,114 @@
+"""Testing incremental mirroring:
+    - `updated_at` and tombstones of write paths
+    - copying changed models with their artifacts to a second cluster
+    - propagating deletes
+    - copying models restored by `import_`."""
+
+import os
+from datetime import timedelta
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.mirror import RegistryMirror
+from mongomv.schemas import ModelEntity
+from tests.conftest import TEST_MIRROR_URI, TEST_MONGO_URI
+
+CONTENT = os.urandom(300 * 1024)
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(CONTENT)
+    return path
+
+
+@pytest.fixture
+def mirror():
+    mirror = RegistryMirror(TEST_MONGO_URI, TEST_MIRROR_URI, name="test", overlap=timedelta(0), chunks_per_task=1)
+    mirror.reset()
+    yield mirror
+    mirror.target.drop_database("mongomv")
+    mirror.target.drop_database("serialized")
+
+
+def raw(client: MongoMVClient, md: ModelEntity) -> dict:
+    return client.crud.read(instance="models", find_by={"_id": md.id})
+
+
+class TestChangeTracking:
+
+
+    def test_updated_at(self, mongomv_client: MongoMVClient):
+        md = mongomv_client.create_model(name="mirror_tracked", tags=["testing"])
+        try:
+            created = raw(mongomv_client, md)["updated_at"]
+            md.add_tag(["tracked"])
+            assert raw(mongomv_client, md)["updated_at"] >= created
+            with md.deferred():
+                md.set_description("tracked")
+            assert raw(mongomv_client, md)["updated_at"] >= created
+        finally:
+            mongomv_client.delete_models({"name": "mirror_tracked"})
+        with mongomv_client.crud.uow as uow:
+            assert uow.tombstones.get_one(get_by={"collection": "models", "key": md.id}) is not None
+
+
+class TestMirror:
+
+
+    def test_sync(self, mongomv_client: MongoMVClient, mirror: RegistryMirror, artifact, tmp_path):
+        target = MongoMVClient(uri=TEST_MIRROR_URI)
+        plain = mongomv_client.create_model(name="mirror_model", tags=["testing"])
+        plain.dump_model(model_path=artifact, filename="model.bin")
+        dedup = mongomv_client.create_model(name="mirror_model", tags=["testing"])
+        dedup.dump_model(model_path=artifact, filename="model.bin", dedup=True)
+        try:
+            report = mirror.sync()
+            assert report["artifacts"] >= 2
+            assert report["artifact_bytes"] >= 2 * len(CONTENT)
+            for md in [plain, dedup]:
+                assert target.find_model_by(find_by="id", value=md.id).load_bytes() == CONTENT
+
+            report = mirror.sync()
+            assert (report["models"], report["artifacts"]) == (0, 0)
+
+            plain.add_tag(["mirrored"])
+            mongomv_client.delete_models({"_id": dedup.id})
+            report = mirror.sync()
+            assert (report["models"], report["artifacts"]) == (1, 0)
+            assert report["deleted"] >= 2
+            assert "mirrored" in target.find_model_by(find_by="id", value=plain.id).tags
+            assert target.find("models", {"_id": dedup.id}) == []
+            with target.crud.uow as uow:
+                chunks = [el.hash for el in dedup.serialized_model.chunks]
+                assert uow.dedup.chunks_collection.count_documents({"_id": {"$in": chunks}}) == 0
+
+            old = plain.serialized_model.id
+            plain.delete_model()
+            plain.dump_model(model_path=artifact, filename="model.bin")
+            report = mirror.sync()
+            assert report["artifacts"] == 1
+            with target.crud.uow as uow:
+                assert uow.gridfs.root_collection.files.find_one({"_id": old}) is None
+            assert target.find_model_by(find_by="id", value=plain.id).load_bytes() == CONTENT
+        finally:
+            mongomv_client.delete_models({"name": "mirror_model"})
+
+
+    def test_sync_imported(self, mongomv_client: MongoMVClient, mirror: RegistryMirror, artifact, tmp_path):
+        target = MongoMVClient(uri=TEST_MIRROR_URI)
+        md = mongomv_client.create_model(name="mirror_imported", tags=["testing"])
+        md.dump_model(model_path=artifact, filename="model.bin")
+        try:
+            mongomv_client.export(tmp_path / "registry.mmv")
+            md.delete()
+            mirror.sync()
+            assert target.find("models", {"_id": md.id}) == []
+
+            mongomv_client.import_(tmp_path / "registry.mmv")
+            report = mirror.sync()
+            assert report["models"] >= 1
+            assert target.find_model_by(find_by="id", value=md.id).load_bytes() == CONTENT
+        finally:
+            mongomv_client.delete_models({"name": "mirror_imported"})
@@ -0,0 +1,95 @@
+"""Testing the query builder:
+    - compilation and schema validation
+    - `find`, `find_models` with sort, limit and projection
+    - unindexed query warnings
+    - `find_model_by` id lookup."""
+
+import warnings
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity, ModelMetrics, Q
+from mongomv.utils import UnindexedQueryWarning
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture(scope="module")
+def query_models():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    models = []
+    for i in range(4):
+        md = client.create_model(name="query_model", tags=["testing", "prod" if i % 2 else "dev"])
+        md.add_metric(ModelMetrics(metric="accuracy", value=0.5 + i / 10))
+        models.append(md)
+    yield models
+    client.delete_models({"name": "query_model"})
+
+
+class TestQueryBuilder:
+
+
+    def test_compile(self):
+        start, end = datetime(2024, 1, 1), datetime(2025, 1, 1)
+        query = (Q.name == "bert") & Q.tags.contains("prod") & Q.date.between("2024-01-01", end)
+        assert query.compile(ModelEntity) == {
+            "name": "bert",
+            "tags": "prod",
+            "date": {"$gte": start, "$lte": end}
+        }
+        obj_id = ObjectId()
+        assert ((Q.id == str(obj_id)) | ~(Q.version >= "2")).compile(ModelEntity) == {
+            "$or": [{"_id": obj_id}, {"$nor": [{"version": {"$gte": 2}}]}]
+        }
+        assert Q.metrics.matches((Q.metric == "accuracy") & (Q.value > 0.9)).compile(ModelEntity) == {
+            "metrics": {"$elemMatch": {"metric": "accuracy", "value": {"$gt": 0.9}}}
+        }
+
+
+    @pytest.mark.parametrize(
+        argnames="query",
+        argvalues=[Q.weights == 1, Q.version == "latest", Q.service == 1, Q.metrics.score > 1]
+    )
+    def test_validation(self, query):
+        with pytest.raises(ValueError):
+            query.compile(ModelEntity)
+
+
+    def test_combining_with_and_raises(self):
+        with pytest.raises(TypeError):
+            (Q.name == "bert") and (Q.version == 1)
+
+
+    def test_find(self, query_models, mongomv_client: MongoMVClient):
+        query = (Q.name == "query_model") & Q.tags.contains("prod")
+        models = mongomv_client.find_models(query.order_by(Q.version.desc()))
+        assert [el.id for el in models] == [query_models[3].id, query_models[1].id]
+
+        docs = mongomv_client.find("models", (Q.name == "query_model").order_by("version").limit(2).only("version"))
+        assert [set(el) for el in docs] == [{"_id", "version"}] * 2
+        assert docs[0]["version"] < docs[1]["version"]
+
+        best = mongomv_client.find_models(
+            (Q.name == "query_model") & Q.metrics.matches((Q.metric == "accuracy") & (Q.value > 0.65))
+        )
+        assert {el.id for el in best} == {query_models[2].id, query_models[3].id}
+        with pytest.raises(ValueError):
+            mongomv_client.find_models((Q.name == "query_model").only("name"))
+
+
+    def test_unindexed_warning(self, query_models, mongomv_client: MongoMVClient):
+        with pytest.warns(UnindexedQueryWarning):
+            mongomv_client.find("models", Q.description == "nothing")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnindexedQueryWarning)
+            mongomv_client.find("models", (Q.name == "query_model") & (Q.description == "nothing"))
+            mongomv_client.find("models", (Q.name == "query_model") | (Q.id == ObjectId()))
+            mongomv_client.find("models", Q.name.startswith("query_"))
+
+
+    def test_find_model_by_id(self, query_models, mongomv_client: MongoMVClient):
+        md = mongomv_client.find_model_by(find_by="id", value=query_models[0].id)
+        assert md.id == query_models[0].id
+        with pytest.raises(ValueError):
+            mongomv_client.find_model_by(find_by="name", value="query_model", query={"name": "query_model"})
@@ -0,0 +1,74 @@
+"""Testing resumable GridFS uploads:
+    - interrupted upload is not linked to model
+    - `dump_model` continues from the last committed chunk
+    - changed source restarts upload."""
+
+import os
+import shutil
+
+import pytest
+from bson import ObjectId
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity
+from tests.conftest import TEST_MONGO_URI
+
+CHUNK_SIZE = 255 * 1024
+
+
+@pytest.fixture
+def large_model():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    md = client.create_model(name="resumable_model", tags=["testing"])
+    yield md
+    if md.serialized_model is not None:
+        md.delete_model()
+    md.delete()
+
+
+def interrupted_upload(md: ModelEntity, path, after: int) -> None:
+    def write(writer):
+        with open(path, "rb") as file:
+            while block := file.read(CHUNK_SIZE):
+                writer.write(block)
+                if file.tell() >= after:
+                    raise ConnectionError("Upload interrupted")
+
+    data = {"_id": ObjectId(), "entity_id": md.id, "filename": path.name, "chunkSize": CHUNK_SIZE}
+    with md.service.uow as uow:
+        with pytest.raises(ConnectionError):
+            uow.gridfs.put_resumable(upload_id=md.id, data=data, write=write)
+
+
+class TestResumableUpload:
+
+
+    def test_resume(self, large_model: ModelEntity, tmp_path):
+        path = tmp_path / "weights.bin"
+        content = os.urandom(CHUNK_SIZE * 40 + 123)
+        path.write_bytes(content)
+
+        interrupted_upload(large_model, path, after=CHUNK_SIZE * 20)
+        with large_model.service.uow as uow:
+            upload = uow.gridfs.uploads.find_one({"_id": large_model.id})
+            assert upload["chunks"] == 16
+            assert uow.gridfs.root_collection.files.find_one({"_id": upload["files_id"]}) is None
+        assert large_model.serialized_model is None
+
+        large_model.dump_model(model_path=path, filename="weights.bin")
+        assert large_model.serialized_model.id == upload["files_id"]
+        assert large_model.load_bytes() == content
+        with large_model.service.uow as uow:
+            assert uow.gridfs.uploads.find_one({"_id": large_model.id}) is None
+
+
+    def test_changed_source_restarts(self, large_model: ModelEntity, tmp_path):
+        path = tmp_path / "weights.bin"
+        path.write_bytes(os.urandom(CHUNK_SIZE * 40))
+        interrupted_upload(large_model, path, after=CHUNK_SIZE * 20)
+
+        changed = tmp_path / "changed.bin"
+        content = os.urandom(CHUNK_SIZE * 30)
+        changed.write_bytes(content)
+        shutil.move(changed, path)
+        large_model.dump_model(model_path=path, filename="weights.bin")
+        assert large_model.load_bytes() == content
@@ -0,0 +1,122 @@
+"""Testing retention policies and the cold tier:
+    - `cold` store dump, load and random access
+    - expiring old versions, keeping tagged ones
+    - keeping artifacts of models changed since the scan
+    - moving artifacts to the cold tier."""
+
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity, RetentionPolicy
+
+CONTENT = os.urandom(1024) * 4700
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(CONTENT)
+    return path
+
+
+@pytest.fixture
+def retention_models(mongomv_client: MongoMVClient, artifact):
+    models = []
+    for i in range(4):
+        tags = ["testing", "production"] if i == 0 else ["testing"]
+        md = mongomv_client.create_model(name="retention_model", tags=tags)
+        md.dump_model(model_path=artifact, filename="model.bin")
+        models.append(md)
+    yield models
+    mongomv_client.delete_models({"name": "retention_model"})
+
+
+def stored(client: MongoMVClient, md: ModelEntity) -> ModelEntity:
+    return client.find_model_by(find_by="id", value=md.id)
+
+
+class TestColdStore:
+
+
+    def test_dump_and_load(self, mongomv_client: MongoMVClient, artifact, tmp_path):
+        md = mongomv_client.create_model(name="cold_model", tags=["testing"])
+        try:
+            md.dump_model(model_path=artifact, filename="model.bin", store="cold")
+            assert md.serialized_model.storage == "cold"
+            assert md.serialized_model.length == len(CONTENT)
+            assert md.serialized_model.compressed_length < len(CONTENT) // 10
+            assert md.load_bytes() == CONTENT
+            md.load_model(model_path=tmp_path / "loaded.bin")
+            assert (tmp_path / "loaded.bin").read_bytes() == CONTENT
+            with md.open_artifact() as reader:
+                reader.seek(-100, io.SEEK_END)
+                assert reader.read() == CONTENT[-100:]
+        finally:
+            mongomv_client.delete_models({"name": "cold_model"})
+
+
+class TestRetention:
+
+
+    def test_policy_requires_rules(self):
+        with pytest.raises(ValueError):
+            RetentionPolicy()
+
+
+    def test_keep_last(self, mongomv_client: MongoMVClient, retention_models):
+        policy = RetentionPolicy(keep_last=2, query={"name": "retention_model"})
+        report = mongomv_client.apply_retention(policy, dry_run=True, pause=0)
+        assert (report.expired, report.expired_bytes) == (1, len(CONTENT))
+        assert stored(mongomv_client, retention_models[1]).serialized_model is not None
+
+        report = mongomv_client.apply_retention(policy, pause=0)
+        assert report.expired == 1
+        assert stored(mongomv_client, retention_models[1]).serialized_model is None
+        for md in [retention_models[0], *retention_models[2:]]:
+            assert stored(mongomv_client, md).serialized_model is not None
+
+
+    def test_changed_since_scan(self, mongomv_client: MongoMVClient, retention_models, artifact, monkeypatch):
+        scan = mongomv_client.retention._scan
+
+        def changing_scan(*args, **kwargs):
+            result = scan(*args, **kwargs)
+            retention_models[1].add_tag(["production"])
+            retention_models[2].delete_model()
+            retention_models[2].dump_model(model_path=artifact, filename="model.bin")
+            return result
+
+        policy = RetentionPolicy(keep_last=1, delete_models=True, query={"name": "retention_model"})
+        monkeypatch.setattr(mongomv_client.retention, "_scan", changing_scan)
+        report = mongomv_client.apply_retention(policy, pause=0)
+        assert (report.expired, report.models_deleted) == (0, 0)
+        for md in retention_models:
+            assert stored(mongomv_client, md).load_bytes() == CONTENT
+
+        monkeypatch.undo()
+        report = mongomv_client.apply_retention(policy, pause=0)
+        assert (report.expired, report.models_deleted) == (1, 1)
+        assert mongomv_client.find("models", {"_id": retention_models[2].id}) == []
+        assert stored(mongomv_client, retention_models[1]).load_bytes() == CONTENT
+
+
+    def test_cold_tier(self, mongomv_client: MongoMVClient, retention_models, tmp_path):
+        policy = RetentionPolicy(keep_last=3, cold_after=timedelta(0), query={"name": "retention_model"})
+        report = mongomv_client.apply_retention(policy, pause=0)
+        assert report.tiered == 3
+        assert report.tiered_bytes == 3 * len(CONTENT)
+        assert 0 < report.cold_bytes < report.tiered_bytes
+
+        assert stored(mongomv_client, retention_models[0]).serialized_model.storage == "gridfs"
+        cold = stored(mongomv_client, retention_models[3])
+        assert cold.serialized_model.storage == "cold"
+        assert cold.load_bytes() == CONTENT
+        cold.load_model(model_path=tmp_path / "loaded.bin")
+        assert (tmp_path / "loaded.bin").read_bytes() == CONTENT
+        with mongomv_client.crud.uow as uow:
+            assert uow.gridfs.root_collection.files.find_one({"_id": cold.serialized_model.id}) is None
+
+        assert mongomv_client.apply_retention(policy, pause=0).tiered == 0
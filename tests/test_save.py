@@ -0,0 +1,108 @@
+"""Testing deferred mode of entities:
+    - `deferred`
+    - `save`
+    - revision conflicts."""
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity, ModelMetrics, ModelParams
+from mongomv.utils import RevisionConflictError, merge_updates
+from tests.conftest import TEST_MONGO_URI
+
+
+def read_model(client: MongoMVClient, obj_id) -> ModelEntity:
+    return ModelEntity(service=client.crud, **client.crud.read(instance="models", find_by={"_id": obj_id}))
+
+
+@pytest.fixture(scope="module")
+def deferred_model():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    md = client.create_model(name="deferred_model", tags=["testing"])
+    yield md
+    md.delete()
+
+
+def test_merge_updates():
+    updates = merge_updates([
+        {"$set": {"name": "first"}},
+        {"$addToSet": {"tags": {"$each": ["a"]}}},
+        {"$push": {"params": {"parameter": "x", "value": 1}}},
+        {"$set": {"name": "second"}},
+        {"$addToSet": {"tags": {"$each": ["b"]}}},
+        {"$pull": {"params": {"parameter": {"$in": ["x"]}}}},
+    ])
+    assert updates == [
+        {
+            "$set": {"name": "second"},
+            "$addToSet": {"tags": {"$each": ["a", "b"]}},
+            "$push": {"params": {"$each": [{"parameter": "x", "value": 1}]}}
+        },
+        {"$pull": {"params": {"parameter": {"$in": ["x"]}}}},
+    ]
+
+
+@pytest.mark.usefixtures("mongomv_client")
+class TestDeferredSave:
+
+
+    def test_deferred_changes(self, deferred_model: ModelEntity, mongomv_client: MongoMVClient):
+        rev = deferred_model.rev
+        with deferred_model.deferred():
+            deferred_model.add_tag(["deferred"])
+            for el in range(20):
+                deferred_model.add_param(ModelParams(parameter=f"param_{el}", value=el))
+                deferred_model.add_metric(ModelMetrics(metric=f"metric_{el}", value=el))
+            deferred_model.set_description("deferred description")
+            assert deferred_model.is_dirty
+            md = read_model(mongomv_client, deferred_model.id)
+            assert md.params == []
+
+        assert not deferred_model.is_dirty
+        assert deferred_model.rev == rev + 1
+        md = read_model(mongomv_client, deferred_model.id)
+        assert md.rev == deferred_model.rev
+        assert len(md.params) == 20
+        assert len(md.metrics) == 20
+        assert "deferred" in md.tags
+        assert md.description == "deferred description"
+
+
+    def test_conflicting_operators(self, deferred_model: ModelEntity, mongomv_client: MongoMVClient):
+        rev = deferred_model.rev
+        with deferred_model.deferred():
+            deferred_model.remove_param("param_0")
+            deferred_model.add_param(ModelParams(parameter="param_0", value="new"))
+
+        assert deferred_model.rev == rev + 2
+        md = read_model(mongomv_client, deferred_model.id)
+        assert md.rev == deferred_model.rev
+        assert md.params[-1] == ModelParams(parameter="param_0", value="new")
+        assert "_save_token" not in mongomv_client.crud.read(instance="models", find_by={"_id": md.id})
+
+
+    def test_revision_conflict(self, deferred_model: ModelEntity, mongomv_client: MongoMVClient):
+        other = read_model(mongomv_client, deferred_model.id)
+        other.rename("renamed_by_other")
+
+        with pytest.raises(RevisionConflictError):
+            with deferred_model.deferred():
+                deferred_model.set_description("stale description")
+
+        md = read_model(mongomv_client, deferred_model.id)
+        assert md.description == "deferred description"
+        assert md.name == "renamed_by_other"
+        assert not deferred_model.is_dirty
+        assert deferred_model.description == "deferred description"
+
+
+    def test_discard_on_error(self, deferred_model: ModelEntity):
+        tags = list(deferred_model.tags)
+        params = list(deferred_model.params)
+        with pytest.raises(RuntimeError):
+            with deferred_model.deferred():
+                deferred_model.add_tag(["discarded"])
+                deferred_model.add_param(ModelParams(parameter="discarded", value=1))
+                raise RuntimeError("failed inside the block")
+        assert deferred_model.tags == tags
+        assert deferred_model.params == params
+        assert not deferred_model.is_dirty
@@ -0,0 +1,44 @@
+"""Testing `MongoMVClient.search_models`."""
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelSearchResult
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture(scope="module")
+def searchable_models():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    mds = [
+        client.create_model(name="search_keras_cv", tags=["vision"], description="image classifier"),
+        client.create_model(name="search_keras_nlp", tags=["text"], description="sentiment classifier"),
+        client.create_model(name="search_xgb", tags=["tabular"], description="churn regressor"),
+    ]
+    yield mds
+    for md in mds:
+        md.delete()
+
+
+@pytest.mark.usefixtures("searchable_models")
+class TestSearchModels:
+
+
+    def test_text_search(self, mongomv_client: MongoMVClient):
+        result = mongomv_client.search_models("classifier")
+        assert {el.name for el in result} == {"search_keras_cv", "search_keras_nlp"}
+        assert all(isinstance(el, ModelSearchResult) and el.score > 0 for el in result)
+
+
+    def test_text_search_by_tag(self, mongomv_client: MongoMVClient):
+        result = mongomv_client.search_models("tabular")
+        assert [el.name for el in result] == ["search_xgb"]
+
+
+    def test_prefix_search(self, mongomv_client: MongoMVClient):
+        result = mongomv_client.search_models("search_keras", prefix=True)
+        assert [el.name for el in result] == ["search_keras_cv", "search_keras_nlp"]
+        assert mongomv_client.search_models("search_keras", prefix=True, limit=1)[0].name == "search_keras_cv"
+
+
+    def test_prefix_search_escapes_regex(self, mongomv_client: MongoMVClient):
+        assert mongomv_client.search_models("search.", prefix=True) == []
@@ -0,0 +1,115 @@
+"""Testing artifact server:
+    - `parse_range`
+    - eviction of cached artifacts, which are being sent
+    - full, range and conditional requests
+    - coalescing of concurrent requests."""
+
+import asyncio
+import os
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.server import ArtifactCache, ArtifactServer, HTTPError, parse_range
+from tests.conftest import TEST_MONGO_URI
+
+CONTENT = os.urandom(1024 * 1024 + 123)
+
+
+@pytest.fixture(scope="module")
+def served_model(tmp_path_factory):
+    path = tmp_path_factory.mktemp("server") / "served.bin"
+    path.write_bytes(CONTENT)
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    md = client.create_model(name="served_model", tags=["testing"])
+    md.dump_model(model_path=path, filename="served.bin")
+    yield md
+    md.delete_model()
+    md.delete()
+
+
+async def request(port: int, method: str, target: str, headers: dict = {}) -> tuple[int, dict, bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost", "Connection: close"]
+    lines += [f"{key}: {value}" for key, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    head = (await reader.readuntil(b"\r\n\r\n")).decode().split("\r\n")
+    response_headers = dict(el.split(": ", 1) for el in head[1:] if el)
+    body = await reader.read()
+    writer.close()
+    return int(head[0].split(" ")[1]), response_headers, body
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1000", 100) == (0, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(HTTPError):
+        parse_range("bytes=100-", 100)
+
+
+async def test_cache_eviction(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=150)
+    content = {"first": b"a" * 100, "second": b"b" * 100}
+
+    def fetch(key):
+        return lambda path: path.write_bytes(content[key])
+
+    first, waiter = await asyncio.gather(
+        cache.get("first", 100, fetch("first")), cache.get("first", 100, fetch("first"))
+    )
+    second = await cache.get("second", 100, fetch("second"))
+    assert "first" not in cache
+    assert not (tmp_path / "first").exists()
+    for file, key in [(first, "first"), (waiter, "first"), (second, "second")]:
+        with file:
+            assert file.read() == content[key]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+class TestArtifactServer:
+
+
+    async def test_requests(self, served_model, tmp_path):
+        server = ArtifactServer(MongoMVClient(uri=TEST_MONGO_URI), cache_dir=tmp_path)
+        http = await server.start("127.0.0.1", 0)
+        port = http.sockets[0].getsockname()[1]
+        try:
+            status, headers, body = await request(port, "GET", f"/models/{served_model.id}")
+            assert status == 200
+            assert body == CONTENT
+            etag = headers["ETag"]
+
+            status, headers, body = await request(
+                port, "GET", f"/models/served_model/{served_model.version}", {"Range": "bytes=100-199"}
+            )
+            assert status == 206
+            assert headers["Content-Range"] == f"bytes 100-199/{len(CONTENT)}"
+            assert body == CONTENT[100:200]
+
+            status, _, body = await request(port, "GET", "/models/served_model/latest", {"If-None-Match": etag})
+            assert status == 304
+            assert body == b""
+
+            status, _, _ = await request(port, "GET", "/models/unknown_model/latest")
+            assert status == 404
+            status, _, _ = await request(port, "GET", f"/models/{served_model.id}", {"Range": "bytes=999999999-"})
+            assert status == 416
+        finally:
+            http.close()
+            await http.wait_closed()
+
+
+    async def test_coalescing(self, served_model, tmp_path):
+        server = ArtifactServer(MongoMVClient(uri=TEST_MONGO_URI), cache_dir=tmp_path)
+        http = await server.start("127.0.0.1", 0)
+        port = http.sockets[0].getsockname()[1]
+        try:
+            results = await asyncio.gather(*(request(port, "GET", f"/models/{served_model.id}") for _ in range(10)))
+            assert all(body == CONTENT for _, _, body in results)
+            assert server.cache.misses == 1
+        finally:
+            http.close()
+            await http.wait_closed()
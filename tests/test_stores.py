@@ -0,0 +1,112 @@
+"""Testing artifact stores:
+    - `FileSystemStore` dump, load and delete
+    - directory models in a filesystem store
+    - store registration and abstract interfaces
+    - export of artifacts kept outside of MongoDB."""
+
+import io
+import os
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.repository import ArtifactReader, ArtifactStore, FileSystemStore
+from mongomv.schemas import ModelEntity
+from tests.conftest import TEST_MONGO_URI
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 17)
+
+
+@pytest.fixture(scope="module")
+def fs_store(tmp_path_factory):
+    return FileSystemStore(tmp_path_factory.mktemp("store"))
+
+
+@pytest.fixture(scope="module")
+def fs_client(fs_store):
+    return MongoMVClient(uri=TEST_MONGO_URI, artifact_stores={"shared": fs_store}, default_store="shared")
+
+
+@pytest.fixture
+def fs_model(fs_client: MongoMVClient):
+    md = fs_client.create_model(name="fs_model", tags=["testing"])
+    yield md
+    if md.serialized_model is not None:
+        md.delete_model()
+    md.delete()
+
+
+class TestFileSystemStore:
+
+
+    def test_dump_and_load(self, fs_model: ModelEntity, fs_store: FileSystemStore, tmp_path):
+        source = tmp_path / "model.bin"
+        source.write_bytes(CONTENT)
+        assert fs_model.dump_model(model_path=source, filename="model.bin") == "Model successfully serialized"
+        assert fs_model.serialized_model.storage == "shared"
+        assert fs_model.serialized_model.length == len(CONTENT)
+        stored = fs_store.path(fs_model.serialized_model.model_dump(by_alias=True))
+        assert stored.read_bytes() == CONTENT
+
+        assert fs_model.load_model(model_path=tmp_path / "loaded.bin") == "Model successfully loaded"
+        assert (tmp_path / "loaded.bin").read_bytes() == CONTENT
+        assert fs_model.load_bytes() == CONTENT
+        with fs_model.open_artifact() as artifact:
+            artifact.seek(-17, io.SEEK_END)
+            assert artifact.read() == CONTENT[-17:]
+
+        fs_model.delete_model()
+        assert fs_model.serialized_model is None
+        assert not stored.exists()
+
+
+    def test_directory_model(self, fs_model: ModelEntity, tmp_path):
+        source = tmp_path / "saved_model"
+        source.joinpath("variables").mkdir(parents=True)
+        source.joinpath("saved_model.pb").write_bytes(b"graph" * 1000)
+        source.joinpath("variables", "variables.index").write_text("index")
+        fs_model.dump_model(model_path=source, filename="saved_model")
+        assert len(fs_model.serialized_model.manifest) == 2
+
+        dest = tmp_path / "loaded"
+        fs_model.load_model(model_path=dest, files=["variables/variables.index"])
+        assert dest.joinpath("variables", "variables.index").read_text() == "index"
+        assert not dest.joinpath("saved_model.pb").exists()
+        with fs_model.open_artifact(path="saved_model.pb") as artifact:
+            assert artifact.read() == b"graph" * 1000
+
+
+    def test_delete_models(self, fs_client: MongoMVClient, fs_store: FileSystemStore, tmp_path):
+        source = tmp_path / "model.bin"
+        source.write_bytes(CONTENT[:1024])
+        md = fs_client.create_model(name="fs_model_delete", tags=["testing"])
+        md.dump_model(model_path=source, filename="model.bin")
+        stored = fs_store.path(md.serialized_model.model_dump(by_alias=True))
+        report = fs_client.delete_models({"name": "fs_model_delete"})
+        assert report.artifacts == 1
+        assert not stored.exists()
+
+
+    def test_store_registration(self, fs_store: FileSystemStore):
+        with pytest.raises(ValueError):
+            MongoMVClient(uri=TEST_MONGO_URI, artifact_stores={"gridfs": fs_store})
+        with pytest.raises(ValueError):
+            MongoMVClient(uri=TEST_MONGO_URI, default_store="shared")
+
+
+    def test_abstract_interfaces(self):
+        with pytest.raises(TypeError):
+            ArtifactStore()
+        with pytest.raises(TypeError):
+            ArtifactReader(length=0)
+
+
+    def test_export_external_artifacts(self, fs_client: MongoMVClient, fs_model: ModelEntity, tmp_path):
+        source = tmp_path / "model.bin"
+        source.write_bytes(CONTENT)
+        fs_model.dump_model(model_path=source, filename="model.bin")
+        assert fs_client.transfer.external_artifacts()["shared"] >= 1
+        with pytest.raises(ValueError):
+            fs_client.export(tmp_path / "registry.mmv")
+        assert not (tmp_path / "registry.mmv").exists()
+        with pytest.warns(UserWarning):
+            fs_client.export(tmp_path / "registry.mmv", skip_external=True)
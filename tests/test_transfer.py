@@ -0,0 +1,35 @@
+"""Testing `MongoMVClient.export` and `MongoMVClient.import_`."""
+
+import os
+from pathlib import Path
+
+from mongomv import MongoMVClient
+
+
+class TestRegistryTransfer:
+
+
+    def test_export_import_restores_deleted_model(self, mongomv_client: MongoMVClient):
+        path = Path(os.getcwd()).joinpath("registry.mmv")
+        artifact = Path(os.getcwd()).joinpath("exported.bin")
+        artifact.write_bytes(b"exported" * 1000)
+        md = mongomv_client.create_model(name="exported_model", tags=["testing"])
+        md.dump_model(model_path=artifact, filename="exported.bin")
+        os.remove(path=artifact)
+
+        counts = mongomv_client.export(path)
+        assert counts["mongomv.models"] >= 1
+        assert counts["serialized.models.files"] >= 1
+
+        md.delete()
+        counts = mongomv_client.import_(path, workers=2, batch_size=2)
+        assert counts["mongomv.models"] == 1
+        assert not Path(f"{path}.progress").exists()
+
+        restored = mongomv_client.get_model(name="exported_model")
+        assert restored.id == md.id
+        assert restored.load_bytes() == b"exported" * 1000
+
+        restored.delete_model()
+        restored.delete()
+        os.remove(path=path)
@@ -0,0 +1,62 @@
+"""Testing background transfers:
+    - `dump_model_async` and `load_model_async`
+    - progress callbacks and bandwidth limit
+    - cancellation."""
+
+import os
+import threading
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity
+from mongomv.utils import TransferCancelled
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.bin"
+    path.write_bytes(os.urandom(2 * 1024 * 1024))
+    return path
+
+
+@pytest.fixture
+def async_model():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    md = client.create_model(name="async_model", tags=["testing"])
+    yield md
+    if md.serialized_model is not None:
+        md.delete_model()
+    md.delete()
+
+
+class TestTransferManager:
+
+
+    def test_dump_and_load(self, async_model: ModelEntity, checkpoint, tmp_path):
+        progress = []
+        with MongoMVClient(uri=TEST_MONGO_URI) as client:
+            future = client.dump_model_async(
+                async_model, checkpoint, "checkpoint.bin", progress=lambda *args: progress.append(args)
+            )
+        assert future.done()
+        assert future.result() == "Model successfully serialized"
+        assert progress[-1] == (checkpoint.stat().st_size, checkpoint.stat().st_size)
+
+        client = MongoMVClient(uri=TEST_MONGO_URI)
+        future = client.load_model_async(async_model, tmp_path / "loaded.bin")
+        assert future.result(timeout=60) == "Model successfully loaded"
+        assert (tmp_path / "loaded.bin").read_bytes() == checkpoint.read_bytes()
+
+
+    def test_bandwidth_limit_and_cancel(self, async_model: ModelEntity, checkpoint):
+        client = MongoMVClient(uri=TEST_MONGO_URI, bandwidth_limit=512 * 1024)
+        started = threading.Event()
+        future = client.dump_model_async(async_model, checkpoint, "checkpoint.bin", progress=lambda *_: started.set())
+        assert started.wait(timeout=10)
+        assert future.running()
+        future.cancel()
+        with pytest.raises(TransferCancelled):
+            future.result(timeout=10)
+        assert async_model.serialized_model is None
+        assert client.wait_all(timeout=10)
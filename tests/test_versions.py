@@ -0,0 +1,109 @@
+"""Testing model versions and aliases:
+    - `create_model` version numbers
+    - `get_model`, latest version by the `name_version` index
+    - `set_alias`, concurrent `set_alias`
+    - `rename` into an existing name
+    - `remove_alias`."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mongomv import MongoMVClient
+from mongomv.schemas import ModelEntity
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from tests.conftest import TEST_MONGO_URI
+
+
+@pytest.fixture(scope="module")
+def versions():
+    client = MongoMVClient(uri=TEST_MONGO_URI)
+    mds = [client.create_model(name="versioned_model", tags=["testing"]) for _ in range(3)]
+    yield mds
+    for md in mds:
+        md.delete()
+
+
+@pytest.mark.usefixtures("mongomv_client")
+class TestModelVersions:
+
+
+    def test_versions_are_sequential(self, versions: list[ModelEntity]):
+        numbers = [md.version for md in versions]
+        assert numbers == list(range(numbers[0], numbers[0] + 3))
+
+
+    def test_get_latest_model(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        md = mongomv_client.get_model(name="versioned_model")
+        assert md.id == versions[-1].id
+
+
+    def test_latest_uses_index(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        def stages(plan):
+            yield plan
+            for el in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+                if el:
+                    yield from stages(el)
+
+        with mongomv_client.crud.uow as uow:
+            plan = uow.models.collection.find(
+                {"name": "versioned_model", "version": {"$type": "number"}},
+                sort=[("version", DESCENDING)]
+            ).limit(1).explain()["queryPlanner"]["winningPlan"]
+        plan = plan.get("queryPlan", plan)
+        assert [el.get("indexName") for el in stages(plan) if el["stage"] == "IXSCAN"] == ["name_version"]
+        assert "SORT" not in [el["stage"] for el in stages(plan)]
+
+
+    def test_get_model_by_version(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        md = mongomv_client.get_model(name="versioned_model", version=versions[0].version)
+        assert md.id == versions[0].id
+
+
+    def test_move_alias(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        assert type(versions[0].set_alias("production")) == str
+        assert mongomv_client.get_model(name="versioned_model", version="production").id == versions[0].id
+        assert type(versions[1].set_alias("production")) == str
+        md = mongomv_client.get_model(name="versioned_model", version="production")
+        assert md.id == versions[1].id
+        assert mongomv_client.get_model(name="versioned_model", version=versions[0].version).aliases == []
+
+
+    def test_remove_alias(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        assert type(versions[1].remove_alias("production")) == str
+        with pytest.raises(TypeError):
+            mongomv_client.get_model(name="versioned_model", version="production")
+        with pytest.raises(ValueError):
+            versions[1].set_alias("latest")
+        with pytest.raises(ValueError):
+            mongomv_client.get_model(name="versioned_model", version=True)
+
+
+    def test_concurrent_aliases(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        mongomv_client.crud.ensure_indexes()
+        with ThreadPoolExecutor(max_workers=len(versions)) as pool:
+            list(pool.map(lambda md: md.set_alias("staging"), versions * 2))
+        assert len(mongomv_client.find("models", {"name": "versioned_model", "aliases": "staging"})) == 1
+        md = mongomv_client.get_model(name="versioned_model", version="staging")
+        other = next(el for el in versions if el.id != md.id)
+        with pytest.raises(DuplicateKeyError):
+            mongomv_client.crud.update(
+                instance="models", obj_id=other.id, update="$addToSet", value={"aliases": "staging"}
+            )
+        md.remove_alias("staging")
+
+
+    def test_rename_into_existing_name(self, versions: list[ModelEntity], mongomv_client: MongoMVClient):
+        md = mongomv_client.create_model(name="renamed_model", tags=["testing"])
+        try:
+            md.set_alias("production")
+            assert md.version == 1
+            md.rename("versioned_model")
+            assert (md.version, md.aliases) == (versions[-1].version + 1, [])
+            assert mongomv_client.get_model(name="versioned_model").id == md.id
+
+            created = mongomv_client.create_model(name="versioned_model", tags=["testing"])
+            assert created.version == md.version + 1
+            created.delete()
+        finally:
+            md.delete()